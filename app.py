@@ -1,22 +1,14 @@
+import sys
+
 import streamlit as st
 from streamlit_option_menu import option_menu
 
-# Importing page functions from different modules
-from data_visualisation.bowel_cancer.temporal import temporal_page_bc as bowel_temporal_app
-from data_visualisation.breast_cancer.temporal import temporal_page_brc as breast_temporal_app
-from data_visualisation.cervical_cancer.temporal import temporal_page_cc as cervical_temporal_app
-
-from data_visualisation.bowel_cancer.geographic import geographical_tab_bc  
-from data_visualisation.breast_cancer.geographic import geographical_tab_brc  
-from data_visualisation.cervical_cancer.geographic import geographical_tab_cc  
-
-from data_visualisation.bowel_cancer.demographic import demographic_page_bc  
-from data_visualisation.breast_cancer.demographic import demographic_page_brc  
-from data_visualisation.cervical_cancer.demographic import demographic_page_cc
-
-from machine_learning.models.cervical_cancer import cervical_cancer
-from machine_learning.models.breast_cancer import breast_cancer
-from machine_learning.models.bowel_cancer import bowel_cancer 
+# Page modules are imported on first navigation through the registry, so Home renders
+# without paying for the plotting and machine learning libraries
+from page_registry import render_page
+from common.datasets import cache_stats
+from common.disk_cache import disk_cache_stats
+from machine_learning import inference_pool, model_registry
 
 def show_home():
     st.write("""
@@ -48,13 +40,47 @@ def show_home():
     We hope this tool empowers you with the information needed to improve cancer screening outcomes and reduce the burden of cancer across communities. Your feedback is invaluable in helping us enhance this tool further.
     """)
 
-
-import streamlit as st
-from streamlit_option_menu import option_menu
+# Process-wide cache counters, shared by every session connected to this server
+# Stats of a module some page has imported: Home does not load plotly or pandas only to report that
+# their caches are empty
+def loaded_stats(module_name, function_name):
+    module = sys.modules.get(module_name)
+    return getattr(module, function_name)() if module else None
+
+def show_diagnostics():
+    with st.sidebar.expander("Diagnostics"):
+        st.write("#### Dataset cache")
+        stats = cache_stats()
+        st.write({name: stats[name] for name in ['hits', 'misses', 'invalidations', 'snapshot_reads', 'csv_reads', 'entries']})
+        # As JSON: st.dataframe would import pandas and pyarrow on Home
+        st.json(stats['files'], expanded=False)
+        st.write("Concurrent loads", stats['single_flight'])
+        st.write("#### Figure cache")
+        st.write(loaded_stats('common.figure_cache', 'figure_cache_stats') or "no chart page opened yet")
+        st.write("#### Disk cache")
+        st.write(disk_cache_stats())
+        st.write("#### Models")
+        st.json(model_registry.registry_report(), expanded=False)
+        st.write(model_registry.model_stats())
+        st.write("Batch predictions")
+        batches = loaded_stats('machine_learning.batch_prediction', 'batch_stats')
+        if batches is None:
+            st.write("no prediction page opened yet")
+        else:
+            st.dataframe(batches)
+        st.write("Forecast grids", loaded_stats('machine_learning.forecast_grid', 'forecast_stats') or "no prediction page opened yet")
+        st.write("Inference pool", inference_pool.inference_stats())
+        # Read once a prediction page has loaded the module, which imports folium
+        st.write("Prediction maps", loaded_stats('machine_learning.prediction_maps', 'map_stats') or "no prediction page opened yet")
 
 def main():
     st.set_page_config(page_title="Cancer Screening App", layout="wide")
 
+    # Once per server process: report missing model artifacts and preload the others in the background,
+    # in the inference pool's workers when scoring happens there
+    model_registry.start(warm=not inference_pool.enabled())
+    inference_pool.start()
+
     # Top-level horizontal menu
     top_level_selection = option_menu(None, ["Home", "Data Visualisation", "Machine Learning Prediction"],
                                       icons=['house', 'bar-chart-line', 'cpu'],
@@ -70,38 +96,10 @@ def main():
                                   menu_icon="cast", default_index=0, orientation="horizontal")
         
         # Third-level horizontal menu for analysis types
-        if cancer_type == "Bowel Cancer":
-            analysis_type = option_menu(None, ["Temporal", "Demographic", "Geographic"],
-                                        icons=['clock-history', 'people', 'geo-alt'], 
-                                        menu_icon="cast", default_index=0, orientation="horizontal")
-            if analysis_type == "Temporal":
-                bowel_temporal_app()
-            elif analysis_type == "Demographic":
-                demographic_page_bc()
-            elif analysis_type == "Geographic":
-                geographical_tab_bc()
-
-        elif cancer_type == "Breast Cancer":
-            analysis_type = option_menu(None, ["Temporal", "Demographic", "Geographic"],
-                                        icons=['clock-history', 'people', 'geo-alt'], 
-                                        menu_icon="cast", default_index=0, orientation="horizontal")
-            if analysis_type == "Temporal":
-                breast_temporal_app()
-            elif analysis_type == "Demographic":
-                demographic_page_brc()
-            elif analysis_type == "Geographic":
-                geographical_tab_brc()
-
-        elif cancer_type == "Cervical Cancer":
-            analysis_type = option_menu(None, ["Temporal", "Demographic", "Geographic"],
-                                        icons=['clock-history', 'people', 'geo-alt'], 
-                                        menu_icon="cast", default_index=0, orientation="horizontal")
-            if analysis_type == "Temporal":
-                cervical_temporal_app()
-            elif analysis_type == "Demographic":
-                demographic_page_cc()
-            elif analysis_type == "Geographic":
-                geographical_tab_cc()
+        analysis_type = option_menu(None, ["Temporal", "Demographic", "Geographic"],
+                                    icons=['clock-history', 'people', 'geo-alt'], 
+                                    menu_icon="cast", default_index=0, orientation="horizontal")
+        render_page(top_level_selection, cancer_type, analysis_type)
 
     elif top_level_selection == "Machine Learning Prediction":
             # Placeholder for machine learning prediction page
@@ -110,11 +108,9 @@ def main():
          predictive_model_type = option_menu(None, ["Cervical Cancer", "Breast Cancer", "Bowel Cancer" ],
                                   icons=['clipboard2-pulse', 'clipboard2-plus', 'clipboard2-pulse-fill'],
                                   menu_icon="cast", default_index=0, orientation="horizontal")
-         if predictive_model_type == "Cervical Cancer":
-           cervical_cancer()
-         elif predictive_model_type == "Breast Cancer":
-            breast_cancer()
-         elif predictive_model_type == "Bowel Cancer":
-            bowel_cancer()
+         render_page(top_level_selection, predictive_model_type)
+
+    show_diagnostics()
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,52 @@
+import time
+
+import numpy as np
+
+from machine_learning.batch_prediction import PROGRAMS, predict_batch, scenario_grid
+from machine_learning.model_registry import get_model, model_available
+
+# Latency of the one-row predict call the prediction pages used to make per click, against the
+# batch each page now scores (every location x ten future years for one age group), and a check
+# that the batch predicts exactly what one-row calls predict.
+#
+#     python -m benchmarks.batch_prediction
+
+REPEATS = 20
+CHECKED_ROWS = 25
+
+
+def best_of(function):
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    print(f"{'program':>9} {'rows':>6} {'one row (ms)':>13} {'batch (ms)':>11} {'per row (us)':>13}")
+    for program, spec in PROGRAMS.items():
+        if not model_available(spec['model']):
+            print(f"{program:>9}  model artifact missing, skipped")
+            continue
+        model = get_model(spec['model'])
+        age_groups = None if spec['age'] is None else [scenario_grid(program)[spec['age']].iloc[0]]
+        grid = scenario_grid(program, age_groups=age_groups)
+        one_row = grid.iloc[:1].reset_index(drop=True)
+
+        single_time = best_of(lambda: model.predict(one_row))
+        batch_time = min(predict_batch(program, age_groups=age_groups)[1] for _ in range(REPEATS))
+
+        predictions, _ = predict_batch(program, age_groups=age_groups)
+        rows = np.random.default_rng(0).choice(len(grid), size=min(CHECKED_ROWS, len(grid)), replace=False)
+        for row in rows:
+            expected = model.predict(grid.iloc[[row]].reset_index(drop=True))[0]
+            assert predictions['Prediction'].iloc[row] == expected
+
+        print(f"{program:>9} {len(grid):>6} {single_time * 1000:>13.2f} {batch_time * 1000:>11.2f} "
+              f"{batch_time / len(grid) * 1e6:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+from machine_learning.batch_prediction import PROGRAMS, scenario_grid
+from machine_learning.fast_inference import FastPipeline
+from machine_learning.model_registry import get_model, model_available
+
+# Latency of the breast cancer model's fast path (machine_learning/fast_inference.py, XGBoost's
+# in-place prediction) under concurrent sessions: each session thread alternates single-row scores
+# and one-state batches, for XGBoost thread counts (XGBOOST_NTHREAD) from 1 to one per core (0),
+# and the pipeline's own predict for comparison. Every scorer is given the same DataFrame rows, so
+# the fast path's times include converting them. Also checks that the fast path predicts what the
+# pipeline predicts.
+#
+#     python -m benchmarks.breast_scorer
+
+MODEL = 'breast'
+SESSIONS = [1, 4, 8]
+NTHREADS = [1, 2, 0]
+CALLS = 40
+
+
+def run_sessions(sessions, single, batch):
+    latencies = {'single': [], 'batch': []}
+    lock = threading.Lock()
+    barrier = threading.Barrier(sessions)
+
+    def session():
+        timings = {'single': [], 'batch': []}
+        barrier.wait()
+        for call in range(CALLS):
+            kind, function = ('batch', batch) if call % 4 == 3 else ('single', single)
+            start = time.perf_counter()
+            function()
+            timings[kind].append(time.perf_counter() - start)
+        with lock:
+            for kind, values in timings.items():
+                latencies[kind].extend(values)
+
+    threads = [threading.Thread(target=session) for _ in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, time.perf_counter() - start
+
+
+def main():
+    if not model_available(MODEL):
+        print("breast cancer model artifact missing, skipped")
+        return
+    spec = PROGRAMS['breast']
+    pipeline = get_model(MODEL)
+    grid = scenario_grid('breast', years=[2019, 2021, 2025])
+    state = grid[spec['state']].iloc[0]
+    batch_rows = grid[grid[spec['state']] == state].reset_index(drop=True)
+
+    expected = pipeline.predict(grid)
+    fast_pipelines = {nthread: FastPipeline(pipeline, nthread) for nthread in NTHREADS}
+    for fast in fast_pipelines.values():
+        assert np.array_equal(fast.predict(grid), expected)
+
+    print(f"{os.cpu_count()} cores, batches of {len(batch_rows)} rows")
+    print(f"{'scorer':>16} {'sessions':>9} {'single p50':>11} {'single p95':>11} {'batch p50':>10} "
+          f"{'batch p95':>10} {'calls/s':>8}")
+    one = batch_rows.iloc[:1]
+    scorers = [('pipeline', lambda: pipeline.predict(one), lambda: pipeline.predict(batch_rows))]
+    for nthread, fast in fast_pipelines.items():
+        scorers.append((f'nthread={nthread}', lambda fast=fast: fast.predict(one),
+                        lambda fast=fast: fast.predict(batch_rows)))
+    for name, single, batch in scorers:
+        for sessions in SESSIONS:
+            latencies, seconds = run_sessions(sessions, single, batch)
+            single_ms = np.percentile(latencies['single'], [50, 95]) * 1000
+            batch_ms = np.percentile(latencies['batch'], [50, 95]) * 1000
+            print(f"{name:>16} {sessions:>9} {single_ms[0]:>11.2f} {single_ms[1]:>11.2f} {batch_ms[0]:>10.2f} "
+                  f"{batch_ms[1]:>10.2f} {sessions * CALLS / seconds:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import threading
+import time
+
+from common.datasets import cache_stats, clear_cache
+from data_visualisation.breast_cancer.geographic import load_and_prepare_data as load_breast_geo
+from data_visualisation.cervical_cancer.geographic import load_and_prepare_data as load_cervical_geo
+from machine_learning.model_registry import clear_models, load_model, model_stats
+
+# Cold-start burst: many session threads ask for the same datasets and models at the same moment.
+# Checks that every dataset is read and every model unpickled exactly once, and that the other
+# threads got the very same objects, then prints how long they waited.
+#
+#     python -m benchmarks.concurrent_loads
+
+THREADS = 32
+ROUNDS = 5
+
+MODELS = [
+    'machine_learning/models_joblib/cervical_RandomForestR_pipeline.joblib',
+    'machine_learning/models_joblib/Breast_Cancer_Participants_XGBRegressor.joblib',
+]
+LOADERS = [load_breast_geo, load_cervical_geo] + [lambda path=path: load_model(path) for path in MODELS]
+
+
+def burst():
+    barrier = threading.Barrier(THREADS)
+    results = [[] for _ in LOADERS]
+    errors = []
+
+    def session(offset):
+        barrier.wait()
+        try:
+            # Every thread asks for everything, starting at a different loader
+            for i in range(len(LOADERS)):
+                position = (offset + i) % len(LOADERS)
+                results[position].append(LOADERS[position]())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=session, args=(offset,)) for offset in range(THREADS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    assert not errors, errors
+    for loaded in results:
+        assert len(loaded) == THREADS and all(value is loaded[0] for value in loaded)
+    return elapsed
+
+
+def main():
+    for round_number in range(ROUNDS):
+        clear_cache()
+        clear_models()
+        elapsed = burst()
+
+        datasets, models = cache_stats(), model_stats()
+        reads = datasets['csv_reads'] + datasets['snapshot_reads']
+        assert reads == 2, f"{reads} dataset reads for 2 datasets"
+        assert models['loads'] == len(MODELS), f"{models['loads']} model loads for {len(MODELS)} models"
+
+        flights = [datasets['single_flight'], models['single_flight']]
+        waiters = sum(flight['waiters'] for flight in flights)
+        waited = sum(flight['wait_seconds'] for flight in flights)
+        longest = max(flight['max_wait_seconds'] for flight in flights)
+        print(f"round {round_number}: {THREADS} threads in {elapsed:.2f}s, {reads} dataset reads, "
+              f"{models['loads']} model loads, {waiters} waiters, {waited:.2f}s waited in total, "
+              f"longest wait {longest * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
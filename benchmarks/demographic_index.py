@@ -0,0 +1,56 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_visualisation.bowel_cancer.demographic import load_index
+from data_visualisation.demographic_index import DemographicIndex
+
+# Demographic page filter latency, boolean mask vs DemographicIndex, as rows are added
+# (the scaled tables stand in for SA2-level rows and extra census years).
+#
+#     python -m benchmarks.demographic_index
+
+SCALES = [1, 10, 100]
+REPEATS = 200
+
+
+def scaled_frame(df, scale, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = pd.concat([df] * scale, ignore_index=True)
+    frame['Participation (%)'] = (frame['Participation (%)'] + rng.normal(0, 2, len(frame))).clip(0, 100)
+    return frame
+
+
+def mask_filter(df, state, year, low, high):
+    return df[(df['State/territory'] == state) & (df['Year'] == year) &
+              (df['Participation (%)'] >= low) & (df['Participation (%)'] <= high)]
+
+
+def best_of(function, *args):
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    base = load_index().frame
+    args = ('NSW', 2015, 30, 50)
+    print(f"{'rows':>9} {'mask (ms)':>10} {'index (ms)':>11} {'build (ms)':>11}")
+    for scale in SCALES:
+        df = scaled_frame(base, scale)
+        start = time.perf_counter()
+        index = DemographicIndex(df)
+        build_time = time.perf_counter() - start
+
+        mask_time, expected = best_of(mask_filter, df, *args)
+        index_time, actual = best_of(index.select, *args)
+        assert len(expected) == len(actual)
+        print(f"{len(df):>9} {mask_time * 1000:>10.3f} {index_time * 1000:>11.3f} {build_time * 1000:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
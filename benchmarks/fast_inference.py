@@ -0,0 +1,66 @@
+import time
+
+import numpy as np
+
+from machine_learning.batch_prediction import PROGRAMS
+from machine_learning.fast_inference import fast_pipeline
+from machine_learning.forecast_grid import ForecastGrid, vocabulary
+from machine_learning.model_registry import get_model, model_available
+
+# Latency of pipeline.predict against the inference fast path (machine_learning/fast_inference.py)
+# at batch sizes from one row to ten thousand, on scenarios drawn from each program's vocabulary
+# with past years mixed in, and a check that both give bit-identical predictions.
+#
+#     python -m benchmarks.fast_inference
+
+BATCH_SIZES = [1, 10, 100, 10_000]
+REPEATS = 20
+
+
+def best_of(function, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def sample_rows(program, size, rng):
+    spec = PROGRAMS[program]
+    dimensions = [(column, list(values) + ([2018, 2019, 2020] if column == spec['year'] else []))
+                  for column, values in vocabulary(program)]
+    scenarios = ForecastGrid.scenarios(dimensions)
+    return scenarios.iloc[rng.choice(len(scenarios), size=size, replace=True)].reset_index(drop=True)
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'program':>9} {'rows':>7} {'pipeline (ms)':>14} {'fast (ms)':>10} {'speed-up':>9}")
+    for program, spec in PROGRAMS.items():
+        if not model_available(spec['model']):
+            print(f"{program:>9}  model artifact missing, skipped")
+            continue
+        model = get_model(spec['model'])
+        fast = fast_pipeline(spec['model'])
+        if fast is None:
+            print(f"{program:>9}  no fast path for this pipeline, skipped")
+            continue
+        for size in BATCH_SIZES:
+            rows = sample_rows(program, size, rng)
+            expected = model.predict(rows)
+            actual = fast.predict(rows)
+            assert actual.dtype == expected.dtype and np.array_equal(actual, expected)
+            if size == 1:
+                values = rows.iloc[0].to_dict()
+                assert fast.predict_one(**values) == expected[0]
+
+            repeats = REPEATS if size < 10_000 else 3
+            pipeline_time = best_of(lambda: model.predict(rows), repeats)
+            fast_time = best_of(lambda: fast.predict(rows), repeats)
+            print(f"{program:>9} {size:>7,} {pipeline_time * 1000:>14.2f} {fast_time * 1000:>10.2f} "
+                  f"{pipeline_time / fast_time:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import json
+import time
+
+import plotly.io as pio
+
+from common.figure_cache import clear_figure_cache, figure_cache_stats
+from data_visualisation.bowel_cancer.temporal import (create_sex_partition_plot, create_state_participation_plot,
+                                                      create_temporal_plot, load_data)
+from data_visualisation.participation_cube import load_cube
+
+# Switching back and forth between two states on the bowel temporal page, with every figure
+# built from scratch (the undecorated builders) and served from the figure cache.
+#
+#     python -m benchmarks.figure_cache
+
+STATES = ['NSW', 'Vic']
+SWITCHES = 10
+
+
+def build_page(cube, builders, state, years, age_groups):
+    return [
+        builders[0](cube, 'Persons', state, age_groups),
+        builders[1](cube, years, state),
+        builders[2](cube, years),
+    ]
+
+
+def spec(figure):
+    return json.loads(pio.to_json(figure, validate=False))
+
+
+def main():
+    data = load_data()
+    cube = load_cube('bowel')
+    years = sorted(data['Start Year'].unique())
+    age_groups = sorted(data['Age group'].unique())
+    cached = [create_temporal_plot, create_sex_partition_plot, create_state_participation_plot]
+    uncached = [builder.__wrapped__ for builder in cached]
+
+    # Warm up plotly express before timing anything
+    build_page(cube, uncached, STATES[0], years, age_groups)
+    clear_figure_cache()
+
+    for name, builders in [('rebuild', uncached), ('cached', cached)]:
+        start = time.perf_counter()
+        for i in range(SWITCHES):
+            figures = build_page(cube, builders, STATES[i % 2], years, age_groups)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>8}: {elapsed / SWITCHES * 1000:8.1f} ms per page")
+
+    for state in STATES:
+        expected = build_page(cube, uncached, state, years, age_groups)
+        actual = build_page(cube, cached, state, years, age_groups)
+        assert all(spec(a) == spec(b) for a, b in zip(expected, actual))
+
+    stats = figure_cache_stats()
+    print(f"hit rate {stats['hit_rate']:.0%}, {stats['entries']} figures, {stats['bytes']:,} bytes held")
+
+
+if __name__ == "__main__":
+    main()
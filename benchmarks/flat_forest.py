@@ -0,0 +1,69 @@
+import time
+import tracemalloc
+
+import numpy as np
+from scipy import sparse
+
+from machine_learning.flat_forest import flatten, load_flat_forest
+from machine_learning.model_registry import MODELS, get_model, model_available
+
+# Throughput and peak memory of the models' own predict (RandomForestRegressor.predict, XGBoost's
+# inplace_predict) against their flattened trees (machine_learning/flat_forest.py), in memory and
+# memory-mapped from disk, on batches of random one-hot feature rows, and a check that all three
+# give bit-identical predictions (also, for forests, on rows with missing values against
+# scikit-learn's own tree walk).
+#
+#     python -m benchmarks.flat_forest
+
+BATCH_SIZES = [1, 100, 10_000, 100_000]
+REPEATS = 5
+
+
+def measure(function, repeats):
+    function()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(timings), peak
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'model':>9} {'rows':>8} {'evaluator':>10} {'ms':>9} {'rows/s':>12} {'peak MiB':>9}")
+    for name in MODELS:
+        if not model_available(name):
+            print(f"{name:>9}  model artifact missing, skipped")
+            continue
+        model = get_model(name).steps[-1][1]
+        flat = flatten(model)
+        if type(model).__name__ == 'RandomForestRegressor':
+            # scikit-learn is given the sparse matrix the pipeline's encoders produce
+            own, absent = ('sklearn', lambda X: model.predict(sparse.csr_matrix(X))), 0.0
+            X = (rng.random((1000, flat.n_features)) < 0.3).astype(np.float32)
+            X[rng.random(X.shape) < 0.1] = np.nan
+            tree_walk = sum(estimator.tree_.predict(X)[:, 0] for estimator in model.estimators_) / model.n_estimators
+            assert np.array_equal(flat.predict(X), tree_walk)
+        else:
+            # Features a row does not switch on are missing to XGBoost, as in the pipeline's sparse output
+            booster = model.get_booster()
+            own, absent = ('xgboost', lambda X: booster.inplace_predict(X, missing=np.nan)), np.nan
+        evaluators = dict([own, ('flat', flat.predict), ('flat mmap', load_flat_forest(name).predict)])
+
+        for size in BATCH_SIZES:
+            X = np.where(rng.random((size, flat.n_features)) < 0.3, 1.0, absent).astype(np.float32)
+            expected = evaluators[own[0]](X)
+            for evaluator, predict in evaluators.items():
+                assert np.array_equal(predict(X), expected), (name, size, evaluator)
+                seconds, peak = measure(lambda: predict(X), REPEATS if size < 100_000 else 2)
+                print(f"{name:>9} {size:>8,} {evaluator:>10} {seconds * 1000:>9.2f} {size / seconds:>12,.0f} "
+                      f"{peak / 2 ** 20:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import time
+
+from common.datasets import load_dataset
+from common.geo_index import geo_index
+from machine_learning.models import bowel_cancer, breast_cancer, cervical_cancer
+
+# Coordinate lookup of the prediction pages, the filtered CSV they used to scan on every Predict
+# click against the shared GeoIndex (common/geo_index.py). Both are timed over every key of the
+# file plus one it does not have, and must agree on all of them.
+#
+#     python -m benchmarks.geo_index
+
+REPEATS = 20
+SOURCES = [
+    ('cervical', cervical_cancer.STATE_COORDINATES, 'States_and_territories'),
+    ('breast', breast_cancer.SA3_COORDINATES, 'SA3_name'),
+    ('bowel', bowel_cancer.SA3_COORDINATES, 'SA3_name'),
+]
+
+
+# What the pages' nested get_coordinates_for_sa3 did
+def scan(key, path, column):
+    data = load_dataset(path).drop_duplicates(subset=[column, 'Latitude', 'Longitude'])
+    row = data[data[column] == key]
+    if row.empty:
+        return None, None
+    return row['Latitude'].values[0], row['Longitude'].values[0]
+
+
+# Equal coordinates, NaNs (an SA3 the file has no position for) included
+def same(expected, actual):
+    return all(e == a or (e != e and a != a) for e, a in zip(expected, actual))
+
+
+def index_lookup(key, path, column):
+    return geo_index(path, column).coordinates(key)
+
+
+def per_lookup(function, keys, path, column):
+    best = float('inf')
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        for key in keys:
+            function(key, path, column)
+        best = min(best, (time.perf_counter() - start) / len(keys))
+    return best
+
+
+def main():
+    print(f"{'program':>9} {'rows':>7} {'keys':>6} {'scan (us)':>10} {'index (us)':>11} {'build (ms)':>11}")
+    for program, path, column in SOURCES:
+        data = load_dataset(path)
+        keys = list(data[column].unique()) + ['Nowhere']
+        start = time.perf_counter()
+        index = geo_index(path, column)
+        build = time.perf_counter() - start
+        assert all(same(scan(key, path, column), index.coordinates(key)) for key in keys)
+        print(f"{program:>9} {len(data):>7,} {len(index):>6} {per_lookup(scan, keys, path, column) * 1e6:>10.0f} "
+              f"{per_lookup(index_lookup, keys, path, column) * 1e6:>11.1f} {build * 1000:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
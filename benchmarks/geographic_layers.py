@@ -0,0 +1,134 @@
+import importlib
+import os
+import time
+
+import numpy as np
+import pydeck as pdk
+
+from data_visualisation.density_grids import GRID_ZOOMS, DensityGrids
+from data_visualisation.sa3_layers import clear_sa3_maps, sa3_map
+
+# Maps of the geographic pages with every state and year selected.
+# Per layer: the layer fed every SA3 x year x age group row with all of its columns, as the pages
+# did, against one record per SA3 with only its position and value (data_visualisation/sa3_layers.py);
+# the totals drawn must agree.
+# Per page: the three maps the pages drew, each building its own per-SA3 table and view, against the
+# one map they open with and the two maps side by side, which share them.
+# Per zoom: the participation percentage as the density raster of data_visualisation/density_grids.py
+# against the heatmap the browser computes from the points, which the raster replaces; * marks the
+# zoom the map of every state and year opens at, whose raster it is sent.
+# All report the JSON st.pydeck_chart sends and the time to build and serialise it, uncached.
+#
+#     python -m benchmarks.geographic_layers
+
+REPEATS = 5
+PAGES = ['breast', 'cervical', 'bowel']
+COLOR = '[0, 116, 217, 160]'
+
+
+# The layer the pages built before, on the selected rows themselves
+def per_row_deck(page, facets, selections, column):
+    rows = facets.match(selections)
+    data = facets.rows(rows)
+    if column == 'Participation_perc':
+        layer = pdk.Layer("HeatmapLayer", data=data, get_position='[Long_precise, Lat_precise]',
+                          get_weight=column, radius=200, threshold=0.05, opacity=0.6)
+    else:
+        layer = pdk.Layer('ScatterplotLayer', data, get_position='[Long_precise, Lat_precise]', get_color=COLOR,
+                          get_radius=f"{column} * 0.5", pickable=True, opacity=0.8)
+    latitude, longitude = page.load_geo_index().center(facets.counts('SA3 code', rows))
+    view_state = pdk.ViewState(latitude=latitude, longitude=longitude, zoom=6, pitch=0)
+    return pdk.Deck(layers=[layer], initial_view_state=view_state, map_style='mapbox://styles/mapbox/light-v9')
+
+
+# JSON of the maps showing each of `panels` (lists of layer names), starting from an empty table
+# cache; `shared` False builds each map's table again, as a page of one map per layer did
+def page_payload(page, facets, selections, panels, shared=True):
+    clear_sa3_maps()
+    payload = []
+    for layers in panels:
+        if not shared:
+            clear_sa3_maps()
+        payload.append(page.create_geographical_map.__wrapped__(facets, selections, layers).to_json())
+    return payload
+
+
+def timed(function, *args):
+    best = float('inf')
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = function(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def per_layer_payload(page, facets, selections, column):
+    deck = per_row_deck(page, facets, selections, column)
+    return deck, deck.to_json()
+
+
+def per_sa3_payload(page, facets, selections, name):
+    clear_sa3_maps()
+    deck = page.create_geographical_map.__wrapped__(facets, selections, [name])
+    return deck, deck.to_json()
+
+
+# Total of `column` over the layer's records (pydeck keeps a frame as a list of them), and their number
+def total(deck, column):
+    records = deck.layers[0].data
+    return np.nansum(np.array([record[column] for record in records], dtype=float)), len(records)
+
+
+def main():
+    pages = []
+    for program in PAGES:
+        if not os.path.exists(f'data_visualisation/{program}_cancer/data/geo_sa3_data.csv'):
+            print(f"{program}: no geo_sa3_data.csv, skipped")
+            continue
+        page = importlib.import_module(f'data_visualisation.{program}_cancer.geographic')
+        facets = page.load_facet_index()
+        selections = {'State/territory': facets.options('State/territory', facets.all_rows),
+                      'Year': facets.options('Year', facets.all_rows)}
+        pages.append((program, page, facets, selections))
+
+    print(f"{'page':>9} {'layer':>19} {'records':>15} {'KB before':>10} {'KB after':>9} "
+          f"{'ms before':>10} {'ms after':>9}")
+    for program, page, facets, selections in pages:
+        for name, (column, style) in page.MAP_LAYERS.items():
+            if style == 'density':
+                continue
+            (before, before_json), before_seconds = timed(per_layer_payload, page, facets, selections, column)
+            (after, after_json), after_seconds = timed(per_sa3_payload, page, facets, selections, name)
+            before_total, before_records = total(before, column)
+            after_total, after_records = total(after, column)
+            assert abs(before_total - after_total) <= 0.01 * after_records
+            print(f"{program:>9} {column:>19} {before_records:>7,}->{after_records:<6,} "
+                  f"{len(before_json.encode()) / 1024:>10,.0f} {len(after_json.encode()) / 1024:>9,.0f} "
+                  f"{before_seconds * 1000:>10.1f} {after_seconds * 1000:>9.1f}")
+
+    print()
+    print(f"{'page':>9} {'maps':>26} {'KB':>6} {'ms':>7}")
+    for program, page, facets, selections in pages:
+        names = [name for name, (_, style) in page.MAP_LAYERS.items() if style != 'heatmap']
+        for label, panels, shared in [('a map per layer', [[name] for name in names], False),
+                                      ('one map', [names[:1]], True),
+                                      ('side by side', [names[:1], names[1:2]], True)]:
+            payload, seconds = timed(page_payload, page, facets, selections, panels, shared)
+            kilobytes = sum(len(spec.encode()) for spec in payload) / 1024
+            print(f"{program:>9} {label:>26} {kilobytes:>6,.0f} {seconds * 1000:>7.1f}")
+
+    print()
+    print(f"{'page':>9} {'zoom':>5} {'grids (ms)':>11} {'heatmap KB':>11} {'raster KB':>10} {'heatmap ms':>11} {'raster ms':>10}")
+    for program, page, facets, selections in pages:
+        grids, build_seconds = timed(DensityGrids, page.load_and_prepare_data(), 'Participation_perc')
+        sa3s = sa3_map(facets, page.load_geo_index(), facets.match(selections), ['Participation_perc'])
+        heatmap, heatmap_seconds = timed(lambda: sa3s.deck([sa3s.heatmap_layer('Participation_perc', 200)]).to_json())
+        for zoom in GRID_ZOOMS:
+            raster, raster_seconds = timed(lambda: sa3s.deck([grids.bitmap_layer(selections, zoom, 'density')]).to_json())
+            served = '*' if grids.level(sa3s.view_state.zoom) == zoom else ''
+            print(f"{program:>9} {served + str(zoom):>5} {build_seconds * 1000:>11.0f} {len(heatmap.encode()) / 1024:>11,.0f} "
+                  f"{len(raster.encode()) / 1024:>10,.0f} {heatmap_seconds * 1000:>11.1f} {raster_seconds * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
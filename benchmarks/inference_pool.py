@@ -0,0 +1,86 @@
+import threading
+import time
+
+import numpy as np
+
+from data_visualisation.cervical_cancer.temporal import create_age_partition_plot, create_temporal_plot, load_data
+from data_visualisation.participation_cube import load_cube
+from machine_learning import fast_inference, inference_pool
+from machine_learning.forecast_grid import ForecastGrid, vocabulary
+from machine_learning.model_registry import model_available
+
+# Rerun latency of a visualisation page while other sessions run predictions, with the predictions
+# scored inline in their session threads against scored in the inference pool
+# (machine_learning/inference_pool.py). A "rerun" builds and serialises the two figures of the
+# cervical temporal page without their cache; each prediction session keeps scoring a batch of
+# breast cancer scenarios.
+#
+#     INFERENCE_WORKERS=1 python -m benchmarks.inference_pool
+
+RERUNS = 60
+PREDICTION_SESSIONS = 2
+PREDICTION_ROWS = 50_000
+
+
+def rerun(data, cube):
+    state = data['State/territory'].iloc[0]
+    years = sorted(data['Start Year'].unique())
+    age_groups = sorted(data['Age group'].unique())
+    create_temporal_plot.__wrapped__(cube, state, age_groups).to_json()
+    create_age_partition_plot.__wrapped__(cube, years, state).to_json()
+
+
+def measure(data, cube, score):
+    stop = threading.Event()
+    predictions = []
+
+    def session():
+        while not stop.is_set():
+            start = time.perf_counter()
+            score()
+            predictions.append(time.perf_counter() - start)
+
+    sessions = [threading.Thread(target=session) for _ in range(PREDICTION_SESSIONS if score else 0)]
+    for thread in sessions:
+        thread.start()
+    timings = []
+    for _ in range(RERUNS):
+        start = time.perf_counter()
+        rerun(data, cube)
+        timings.append(time.perf_counter() - start)
+    stop.set()
+    for thread in sessions:
+        thread.join()
+    return np.percentile(timings, [50, 99]) * 1000, len(predictions), np.median(predictions) * 1000 if predictions else None
+
+
+def main():
+    if not model_available('breast'):
+        print("breast cancer model artifact missing, skipped")
+        return
+    if not inference_pool.enabled():
+        print("INFERENCE_WORKERS=0 (the default) scores inline, set it to 1 or more to compare")
+        return
+    data = load_data()
+    cube = load_cube('cervical')
+    rows = ForecastGrid.scenarios(vocabulary('breast')).head(PREDICTION_ROWS)
+    assert np.array_equal(inference_pool.predict('breast', rows), fast_inference.predict('breast', rows))
+    for _ in range(3):
+        rerun(data, cube)
+
+    print(f"{inference_pool.INFERENCE_WORKERS} worker(s), {PREDICTION_SESSIONS} prediction sessions of "
+          f"{PREDICTION_ROWS:,} rows")
+    print(f"{'predictions':>12} {'rerun p50 ms':>13} {'rerun p99 ms':>13} {'predictions':>12} {'predict p50 ms':>15}")
+    cases = [('none', None), ('inline', lambda: fast_inference.predict('breast', rows)),
+             ('pool', lambda: inference_pool.predict('breast', rows))]
+    for name, score in cases:
+        (p50, p99), count, predict_ms = measure(data, cube, score)
+        print(f"{name:>12} {p50:>13.1f} {p99:>13.1f} {count:>12} "
+              f"{'-' if predict_ms is None else f'{predict_ms:.0f}':>15}")
+    stats = inference_pool.inference_stats()
+    print(f"pool queue wait p50/p99 {stats['queue_wait']['p50_ms']:.1f}/{stats['queue_wait']['p99_ms']:.1f} ms, "
+          f"compute p50/p99 {stats['compute']['p50_ms']:.1f}/{stats['compute']['p99_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
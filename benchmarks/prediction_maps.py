@@ -0,0 +1,58 @@
+import re
+import time
+
+from common.datasets import load_dataset
+from common.geo_index import geo_index
+from machine_learning import prediction_maps
+from machine_learning.models import breast_cancer
+
+# Bytes and build time of the prediction pages' location map per rerun: the folium document the
+# pages built on every Predict click against the cached Leaflet-only one
+# (machine_learning/prediction_maps.py). A session clicks Predict for RERUNS SA3s, a few of them
+# over and over as someone comparing places would.
+#
+#     python -m benchmarks.prediction_maps
+
+RERUNS = 200
+PLACES = 20
+
+
+def external_assets(html):
+    return re.findall(r'<(?:script src|link rel="stylesheet" href)="([^"]+)"', html)
+
+
+def main():
+    index = geo_index(breast_cancer.SA3_COORDINATES, 'SA3_name')
+    data = load_dataset('machine_learning/data/Breast_Cancer_Participants.csv')
+    sa3s = [sa3 for sa3 in data['SA3_name'].unique() if sa3 in index and index.coordinates(sa3)[0] == index.coordinates(sa3)[0]]
+    clicks = [(sa3s[i % PLACES], 1000 + i % 7) for i in range(RERUNS)]
+
+    legacy_bytes = 0
+    start = time.perf_counter()
+    for sa3, value in clicks:
+        latitude, longitude = index.coordinates(sa3)
+        html = prediction_maps.build_legacy_map_html(latitude, longitude, 6, f'SA3 Name: {sa3}<br>Predicted Nos. participants: [{value}]')
+        legacy_bytes += len(html.encode())
+    legacy_seconds = time.perf_counter() - start
+    legacy_assets = external_assets(html)
+
+    prediction_maps.clear_map_cache()
+    start = time.perf_counter()
+    for sa3, value in clicks:
+        latitude, longitude = index.coordinates(sa3)
+        html = prediction_maps.prediction_map_html('breast', {'SA3 Name': sa3}, latitude, longitude, value)
+    cached_seconds = time.perf_counter() - start
+    stats = prediction_maps.map_stats()
+
+    print(f"{RERUNS} reruns over {PLACES} SA3s, {stats['misses']} distinct maps")
+    print(f"{'':>8} {'bytes/rerun':>12} {'build ms/rerun':>15} {'external files':>15}")
+    print(f"{'before':>8} {legacy_bytes / RERUNS:>12,.0f} {legacy_seconds / RERUNS * 1000:>15.2f} {len(legacy_assets):>15}")
+    print(f"{'after':>8} {stats['bytes_per_rerun']:>12,.0f} {cached_seconds / RERUNS * 1000:>15.2f} "
+          f"{len(external_assets(html)):>15}")
+    print(f"map_stats() estimate of the old bytes/rerun: {stats['legacy_bytes_per_rerun']:,.0f}")
+    for url in external_assets(html):
+        print(f"  after loads {url}")
+
+
+if __name__ == "__main__":
+    main()
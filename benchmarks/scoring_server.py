@@ -0,0 +1,147 @@
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from machine_learning import fast_inference
+from machine_learning.batch_prediction import PROGRAMS, scenario_grid
+from machine_learning.model_registry import model_available
+
+# Requests per second and latency of the scoring server (machine_learning/scoring_server.py) at
+# several batch windows. For each window a server is started, CLIENTS threads keep sending one-row
+# prediction requests over keep-alive connections for DURATION seconds, and the batch sizes the
+# server formed are read back from /metrics. Every answer is checked against the fast path, and a
+# valid request sent together with an invalid one must still be answered.
+#
+#     python -m benchmarks.scoring_server
+
+WINDOWS_MS = [0, 1, 5, 20]
+CLIENTS = 32
+DURATION = 5.0
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, window_ms):
+    environment = dict(os.environ, MODEL_WARM_UP='0',
+                       PYTHONPATH=os.pathsep.join(filter(None, [os.getcwd(), os.environ.get('PYTHONPATH')])))
+    process = subprocess.Popen([sys.executable, '-m', 'machine_learning.scoring_server', '--port', str(port),
+                                '--window-ms', str(window_ms)], env=environment,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        try:
+            get(port, '/health')
+            return process
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError(f"the scoring server exited with code {process.returncode}")
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("the scoring server did not come up")
+
+
+def get(port, path):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    try:
+        connection.request('GET', path)
+        return json.loads(connection.getresponse().read())
+    finally:
+        connection.close()
+
+
+def measure(port, name, rows, expected):
+    stop = threading.Event()
+    latencies = []
+    mismatches = []
+
+    def client(offset):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        i = offset
+        while not stop.is_set():
+            row = rows[i % len(rows)]
+            body = json.dumps({'rows': [row]})
+            start = time.perf_counter()
+            connection.request('POST', f'/predict/{name}', body, {'Content-Type': 'application/json'})
+            answer = json.loads(connection.getresponse().read())
+            latencies.append(time.perf_counter() - start)
+            if answer['predictions'] != [expected[i % len(rows)]]:
+                mismatches.append(row)
+            i += 97
+        connection.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(CLIENTS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(DURATION)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    assert not mismatches, f"{len(mismatches)} predictions differ from the fast path, e.g. {mismatches[0]}"
+    metrics = get(port, '/metrics')
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    return len(latencies) / elapsed, p50, p99, metrics['batch_rows']['mean']
+
+
+# Sends a valid and an invalid request at once, within one batch window: only the invalid one may fail
+def check_isolation(port, name, row, expected):
+    barrier = threading.Barrier(2)
+    answers = {}
+
+    def client(label, rows):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        barrier.wait()
+        connection.request('POST', f'/predict/{name}', json.dumps({'rows': rows}), {'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        answers[label] = (response.status, json.loads(response.read()))
+        connection.close()
+
+    bad = {column: [value] for column, value in row.items()}
+    threads = [threading.Thread(target=client, args=('valid', [row])),
+               threading.Thread(target=client, args=('invalid', [bad]))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert answers['valid'][0] == 200 and answers['valid'][1]['predictions'] == [expected], answers
+    assert answers['invalid'][0] == 400, answers
+
+
+def main():
+    print(f"{CLIENTS} clients sending one-row requests for {DURATION:g}s per window")
+    print(f"{'model':>9} {'window ms':>10} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'rows/batch':>11}")
+    for program, spec in PROGRAMS.items():
+        name = spec['model']
+        if not model_available(name):
+            print(f"{name:>9}: model artifact missing, skipped")
+            continue
+        grid = pd.DataFrame(scenario_grid(program))
+        rows = grid.to_dict('records')
+        expected = fast_inference.predict(name, grid).tolist()
+        for window_ms in WINDOWS_MS:
+            port = free_port()
+            server = start_server(port, window_ms)
+            try:
+                requests_per_s, p50, p99, batch_rows = measure(port, name, rows, expected)
+                check_isolation(port, name, rows[0], expected[0])
+            finally:
+                server.terminate()
+                server.wait()
+            print(f"{name:>9} {window_ms:>10g} {requests_per_s:>8,.0f} {p50:>8.2f} {p99:>8.2f} {batch_rows:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
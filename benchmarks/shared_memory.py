@@ -0,0 +1,110 @@
+import json
+import os
+import subprocess
+import sys
+
+from machine_learning.model_registry import MODELS, model_available
+
+# Resident and shared memory of 1, 4 and 8 server replicas holding the prediction models, each model
+# either unpickled into every process (the default) or opened from its memory-mapped flat form
+# (SHARED_MODELS=1, see machine_learning/flat_forest.py). Every replica loads the models and scores
+# a batch through them; while all of them are alive, their /proc/<pid>/smaps are read. Linux only.
+#
+#     python -m benchmarks.shared_memory
+#
+# Columns, averaged over the replicas:
+#   rss / shared / pss   the whole process (pss splits shared pages between the processes mapping them)
+#   models               how much the process's resident memory grew while it loaded the models
+#   files rss / pss      pages of the memory-mapped model files (shared mode only)
+
+REPLICAS = [1, 4, 8]
+MODES = {'pickle': '0', 'shared': '1'}
+
+
+def resident_kib():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+
+
+# Runs in each replica: loads and uses the models, reports, then waits until the parent is done
+def replica():
+    import numpy as np  # noqa: F401 imported before measuring, like the app's own imports
+    import pandas as pd
+
+    from machine_learning.batch_prediction import PROGRAMS, scenario_grid
+    from machine_learning.fast_inference import fast_pipeline
+
+    before = resident_kib()
+    for program, spec in PROGRAMS.items():
+        if model_available(spec['model']):
+            fast = fast_pipeline(spec['model'])
+            fast.predict(pd.DataFrame(scenario_grid(program)))
+    print(json.dumps({'models_kib': resident_kib() - before}), flush=True)
+    sys.stdin.read()
+
+
+def smaps(pid):
+    totals = {'rss': 0, 'shared': 0, 'pss': 0, 'files_rss': 0, 'files_pss': 0}
+    model_file = False
+    with open(f'/proc/{pid}/smaps') as f:
+        for line in f:
+            fields = line.split()
+            if not fields[0].endswith(':'):
+                # A mapping header: address range, permissions, offset, device, inode, path
+                model_file = len(fields) >= 6 and 'flat_models' in fields[5]
+                continue
+            if fields[0] in ('Rss:', 'Pss:', 'Shared_Clean:', 'Shared_Dirty:'):
+                kib = int(fields[1])
+                if fields[0] == 'Rss:':
+                    totals['rss'] += kib
+                    totals['files_rss'] += kib if model_file else 0
+                elif fields[0] == 'Pss:':
+                    totals['pss'] += kib
+                    totals['files_pss'] += kib if model_file else 0
+                else:
+                    totals['shared'] += kib
+    return totals
+
+
+def measure(mode, replicas):
+    environment = dict(os.environ, SHARED_MODELS=MODES[mode], MODEL_WARM_UP='0',
+                       PYTHONPATH=os.pathsep.join(filter(None, [os.getcwd(), os.environ.get('PYTHONPATH')])))
+    processes = [subprocess.Popen([sys.executable, '-m', 'benchmarks.shared_memory', '--replica'], env=environment,
+                                  stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+                 for _ in range(replicas)]
+    try:
+        reports = [json.loads(process.stdout.readline()) for process in processes]
+        usage = [smaps(process.pid) for process in processes]
+    finally:
+        for process in processes:
+            process.stdin.close()
+            process.wait()
+    row = {name: sum(process[name] for process in usage) / replicas for name in usage[0]}
+    row['models'] = sum(report['models_kib'] for report in reports) / replicas
+    return row
+
+
+def main():
+    if '--replica' in sys.argv:
+        replica()
+        return
+    from machine_learning.flat_forest import load_shared
+
+    # Exported once up front, so replicas in shared mode only open the files
+    for name in MODELS:
+        if model_available(name):
+            load_shared(name)
+    print(f"{'mode':>7} {'replicas':>9} {'rss MiB':>8} {'shared MiB':>11} {'pss MiB':>8} {'models KiB':>11} "
+          f"{'files rss KiB':>14} {'files pss KiB':>14}")
+    for mode in MODES:
+        for replicas in REPLICAS:
+            row = measure(mode, replicas)
+            print(f"{mode:>7} {replicas:>9} {row['rss'] / 1024:>8.1f} {row['shared'] / 1024:>11.1f} "
+                  f"{row['pss'] / 1024:>8.1f} {row['models']:>11,.0f} {row['files_rss']:>14,.0f} "
+                  f"{row['files_pss']:>14,.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from common.datasets import load_dataset
+from data_visualisation.participation_cube import PROGRAMS, ParticipationCube
+
+# Compares the temporal page aggregations answered from the participation cube with the pandas
+# filter + groupby path they replaced, as the number of raw rows grows.
+#
+#     python -m benchmarks.temporal_cube
+
+SCALES = [1, 10, 100, 1000]
+REPEATS = 20
+
+
+# The bowel table repeated `scale` times with jittered rates, i.e. more rows per cube cell
+def scaled_frame(df, scale, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = pd.concat([df] * scale, ignore_index=True)
+    frame['Participation (%)'] = frame['Participation (%)'] + rng.normal(0, 1, len(frame))
+    return frame
+
+
+def pandas_path(data, sex, state, age_groups, years):
+    filtered = data[(data['Sex'] == sex) & (data['State/territory'] == state) & (data['Age group'].isin(age_groups))]
+    temporal = filtered.groupby(['Start Year', 'Age group'], observed=True)['Participation (%)'].mean().reset_index()
+    filtered = data[(data['Start Year'].isin(years)) & (data['State/territory'] == state)]
+    by_sex = filtered.groupby(['Age group', 'Sex'], observed=True)['Participation (%)'].mean().reset_index()
+    by_state = data[data['Start Year'].isin(years)].groupby('State/territory', observed=True)['Participation (%)'].mean().reset_index()
+    return temporal, by_sex, by_state
+
+
+def cube_path(cube, sex, state, age_groups, years):
+    temporal = cube.query(['Start Year', 'Age group'], {'Sex': [sex], 'State/territory': [state], 'Age group': age_groups})
+    by_sex = cube.query(['Age group', 'Sex'], {'Start Year': years, 'State/territory': [state]})
+    by_state = cube.query(['State/territory'], {'Start Year': years})
+    return temporal, by_sex, by_state
+
+
+def best_of(function, *args):
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    path, participated_column, invited_column = PROGRAMS['bowel']
+    base = load_dataset(path)
+    age_groups = sorted(base['Age group'].unique())[:3]
+    years = sorted(base['Start Year'].unique())[1:5]
+    args = ('Males', 'NSW', age_groups, years)
+
+    print(f"{'rows':>10} {'pandas (ms)':>12} {'cube (ms)':>10} {'speed-up':>9} {'build (ms)':>11}")
+    for scale in SCALES:
+        data = scaled_frame(base, scale)
+        start = time.perf_counter()
+        cube = ParticipationCube.from_frame('bowel', None, data, participated_column, invited_column)
+        build_time = time.perf_counter() - start
+
+        pandas_time, expected = best_of(pandas_path, data, *args)
+        cube_time, actual = best_of(cube_path, cube, *args)
+        for want, got in zip(expected, actual):
+            assert np.allclose(want['Participation (%)'].to_numpy(), got['Participation (%)'].to_numpy())
+
+        print(f"{len(data):>10} {pandas_time * 1000:>12.2f} {cube_time * 1000:>10.2f} "
+              f"{pandas_time / cube_time:>8.1f}x {build_time * 1000:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import hashlib
+import os
+import pickle
+import threading
+
+from common import disk_cache
+from common.single_flight import SingleFlight
+
+# Process-wide dataset cache shared by every Streamlit session.
+# Each entry holds one parsed copy of a file, so the frames handed out are shared and must be
+# treated as read-only: filter or copy them, never assign columns onto them. Any derived columns
+# a page needs are added once by the `prepare` function passed to load_dataset.
+#
+# Datasets are named by their CSV path. When `python -m common.snapshot` has built a typed Parquet
+# snapshot of that CSV it is read instead; otherwise the CSV is parsed and typed the same way.
+# Concurrent misses on the same dataset are single-flighted: one thread reads it, the rest wait.
+#
+# pandas and pyarrow are imported by the functions that read files, so the app can version files
+# and report its caches (as Home and the model registry do) without loading them.
+
+SNAPSHOT_DIR = 'columnar'
+SOURCE_HASH_KEY = b'source_sha256'
+
+_lock = threading.Lock()
+_entries = {}
+_versions = {}
+_derived = {}
+_flights = SingleFlight()
+_stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'snapshot_reads': 0, 'csv_reads': 0}
+
+
+class _Entry:
+    def __init__(self, path, content_hash, frame):
+        self.path = path
+        self.content_hash = content_hash
+        self.frame = frame
+        self.hits = 0
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Content hash of the file currently on disk. The file is only re-hashed when its mtime or size
+# changes, so touching or re-copying an identical file keeps every frame parsed from it.
+def _current_version(path):
+    stat = os.stat(path)
+    known = _versions.get(path)
+    if known is not None and known[0] == stat.st_mtime_ns and known[1] == stat.st_size:
+        return known[2]
+    content_hash = file_hash(path)
+    _versions[path] = (stat.st_mtime_ns, stat.st_size, content_hash)
+    return content_hash
+
+
+def snapshot_path(csv_path):
+    folder, name = os.path.split(os.path.normpath(csv_path))
+    return os.path.join(folder, SNAPSHOT_DIR, os.path.splitext(name)[0] + '.parquet')
+
+
+# Read the Parquet snapshot of csv_path if one was built from this exact content, else None
+def _read_snapshot(csv_path, content_hash):
+    path = snapshot_path(csv_path)
+    if not os.path.exists(path):
+        return None
+    import pandas as pd
+    import pyarrow.parquet as pq
+    metadata = pq.read_schema(path).metadata or {}
+    if metadata.get(SOURCE_HASH_KEY, b'').decode() != content_hash:
+        return None
+    return pd.read_parquet(path)
+
+
+def _cache_key(path, prepare, read_kwargs):
+    prepare_name = None if prepare is None else f"{prepare.__module__}.{prepare.__qualname__}"
+    return (path, prepare_name, tuple(sorted(read_kwargs.items())))
+
+
+def load_dataset(path, prepare=None, **read_kwargs):
+    path = os.path.normpath(path)
+    key = _cache_key(path, prepare, read_kwargs)
+
+    with _lock:
+        content_hash = _current_version(path)
+        entry = _entries.get(key)
+        if entry is not None and entry.content_hash == content_hash:
+            entry.hits += 1
+            _stats['hits'] += 1
+            return entry.frame
+        if entry is not None:
+            del _entries[key]
+            _stats['invalidations'] += 1
+        _stats['misses'] += 1
+
+    return _flights.do(key + (content_hash,), lambda: _read_dataset(path, key, content_hash, prepare, read_kwargs))
+
+
+def _read_dataset(path, key, content_hash, prepare, read_kwargs):
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry.content_hash == content_hash:
+            return entry.frame
+
+    frame = _read_snapshot(path, content_hash)
+    from_snapshot = frame is not None
+    if not from_snapshot:
+        import pandas as pd
+        from common.schema import apply_types
+        frame = apply_types(pd.read_csv(path, **read_kwargs))
+    if prepare is not None:
+        frame = prepare(frame)
+
+    with _lock:
+        _stats['snapshot_reads' if from_snapshot else 'csv_reads'] += 1
+        _entries[key] = _Entry(path, content_hash, frame)
+    return frame
+
+
+# Content hash of the file as it is on disk now. Caches of results derived from a dataset use it
+# as part of their key, so they go stale at the same moment the parsed frame does.
+def dataset_version(path):
+    with _lock:
+        return _current_version(os.path.normpath(path))
+
+
+# Object built from a dataset (an index, an aggregate, ...) and shared like the frame itself.
+# `build` receives the loaded frame and is only called again once the file's content changes.
+# Built objects are also pickled to the disk cache, so after a restart they are read back instead
+# of loading the dataset and building them again.
+def load_derived(name, path, build, prepare=None, **read_kwargs):
+    path = os.path.normpath(path)
+    key = (name,) + _cache_key(path, prepare, read_kwargs)
+    version = dataset_version(path)
+    with _lock:
+        cached = _derived.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+    return _flights.do(key + (version,), lambda: _build_derived(key, version, path, build, prepare, read_kwargs))
+
+
+def _build_derived(key, version, path, build, prepare, read_kwargs):
+    with _lock:
+        cached = _derived.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+    stored_key = None
+    value = None
+    if disk_cache.enabled():
+        from common.schema import apply_types
+        stored_key = disk_cache.make_key('derived', key, version, disk_cache.code_version(build, prepare, apply_types))
+        stored = disk_cache.get(stored_key)
+        if stored is not None:
+            value = pickle.loads(stored)
+    if value is None:
+        value = build(load_dataset(path, prepare=prepare, **read_kwargs))
+        if stored_key is not None:
+            disk_cache.put(stored_key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    with _lock:
+        _derived[key] = (version, value)
+    return value
+
+
+def cache_stats():
+    with _lock:
+        files = []
+        for (path, prepare_name, _), entry in _entries.items():
+            files.append({
+                'path': path,
+                'prepare': prepare_name,
+                'hits': entry.hits,
+                'rows': len(entry.frame),
+                'bytes': int(entry.frame.memory_usage(deep=True).sum()),
+                'content_hash': entry.content_hash[:12],
+            })
+        return dict(_stats, entries=len(_entries), derived=len(_derived), files=files, single_flight=_flights.stats())
+
+
+def clear_cache():
+    with _lock:
+        _entries.clear()
+        _versions.clear()
+        _derived.clear()
+        for name in _stats:
+            _stats[name] = 0
+    _flights.reset_stats()
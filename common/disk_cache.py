@@ -0,0 +1,109 @@
+import hashlib
+import inspect
+import os
+import sqlite3
+import threading
+import time
+
+# Disk tier behind the in-process caches, so a restarted server starts warm.
+# Results are stored in one SQLite file under RESULT_CACHE_DIR (set it to an empty string to turn
+# the tier off). Every key includes the content hash of the datasets a result was computed from and
+# the code version of the functions that computed it, so editing either a CSV or the code behind a
+# result makes the old row unreachable instead of serving it stale.
+#
+# Values are bytes: callers choose the encoding (figure JSON, pickled aggregates, ...).
+
+RESULT_CACHE_DIR = os.environ.get('RESULT_CACHE_DIR', '.result_cache')
+DATABASE_NAME = 'results.sqlite'
+
+_local = threading.local()
+_lock = threading.Lock()
+_code_versions = {}
+_stats = {'hits': 0, 'misses': 0, 'writes': 0, 'bytes_read': 0, 'bytes_written': 0}
+
+
+def enabled():
+    return bool(RESULT_CACHE_DIR)
+
+
+def _connection():
+    # sqlite3 connections may not be shared between threads, so each thread opens its own
+    connection = getattr(_local, 'connection', None)
+    if connection is None:
+        os.makedirs(RESULT_CACHE_DIR, exist_ok=True)
+        connection = sqlite3.connect(os.path.join(RESULT_CACHE_DIR, DATABASE_NAME), timeout=30)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('CREATE TABLE IF NOT EXISTS results ('
+                           'key TEXT PRIMARY KEY, namespace TEXT, value BLOB, created REAL)')
+        _local.connection = connection
+    return connection
+
+
+# Hash of the source files defining `functions` (classes, functions or modules). Any edit to one of
+# those files gives its results a new key.
+def code_version(*functions):
+    files = []
+    for function in functions:
+        if function is None:
+            continue
+        try:
+            files.append(os.path.normpath(inspect.getsourcefile(function)))
+        except TypeError:
+            continue
+    digest = hashlib.sha256()
+    for path in sorted(set(files)):
+        if path not in _code_versions:
+            with open(path, 'rb') as f:
+                _code_versions[path] = hashlib.sha256(f.read()).hexdigest()
+        digest.update(_code_versions[path].encode())
+    return digest.hexdigest()
+
+
+def make_key(namespace, *parts):
+    return namespace + ':' + hashlib.sha256(repr(parts).encode()).hexdigest()
+
+
+def get(key):
+    if not enabled():
+        return None
+    row = _connection().execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+    with _lock:
+        if row is None:
+            _stats['misses'] += 1
+            return None
+        _stats['hits'] += 1
+        _stats['bytes_read'] += len(row[0])
+    return bytes(row[0])
+
+
+def put(key, value):
+    if not enabled():
+        return
+    connection = _connection()
+    with connection:
+        connection.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+                           (key, key.split(':', 1)[0], value, time.time()))
+    with _lock:
+        _stats['writes'] += 1
+        _stats['bytes_written'] += len(value)
+
+
+def disk_cache_stats():
+    with _lock:
+        stats = dict(_stats)
+    stats['directory'] = RESULT_CACHE_DIR if enabled() else None
+    if enabled():
+        stats['namespaces'] = {
+            namespace: {'entries': entries, 'bytes': size}
+            for namespace, entries, size in _connection().execute(
+                'SELECT namespace, COUNT(*), SUM(LENGTH(value)) FROM results GROUP BY namespace')
+        }
+    return stats
+
+
+def clear_disk_cache():
+    if enabled():
+        connection = _connection()
+        with connection:
+            connection.execute('DELETE FROM results')
+        connection.execute('VACUUM')
@@ -0,0 +1,140 @@
+import functools
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import plotly.graph_objects as go
+
+from common import disk_cache
+from common.datasets import dataset_version
+
+# Process-wide LRU cache of the charts the pages build.
+# A builder decorated with cached_figure(path, ...) takes the data it draws from (a cube, a facet
+# index, a frame) as its first argument and the user's filter choices after it. The source is
+# identified by the content hash of the dataset files it was built from rather than by value, so a
+# figure is keyed by (builder, dataset versions, normalized filters). Figures are held as their
+# JSON spec, which is what Streamlit sends to the browser anyway, and the least recently used ones
+# are dropped once the specs held exceed FIGURE_CACHE_MAX_BYTES. Specs are also written to the disk
+# cache, under the builder's code version as well, and read back from there after a restart. A
+# builder whose figure is computed elsewhere (a cube's query, a layer factory) names those classes
+# or functions in `depends`, so editing their modules also makes its stored specs unreachable.
+
+FIGURE_CACHE_MAX_BYTES = int(os.environ.get('FIGURE_CACHE_MAX_BYTES', 64 << 20))
+
+_lock = threading.Lock()
+_entries = OrderedDict()
+_versions = {}
+_stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0, 'bytes': 0}
+
+
+# A pydeck Deck restored from its spec. st.pydeck_chart only needs to_json() and the tooltip.
+class _DeckSpec:
+    def __init__(self, spec, tooltip):
+        self.spec = spec
+        self._tooltip = tooltip
+
+    def to_json(self):
+        return self.spec
+
+
+def _serialize(figure):
+    if hasattr(figure, 'to_plotly_json'):
+        return 'plotly', figure.to_json(), None
+    return 'pydeck', figure.to_json(), getattr(figure, '_tooltip', None)
+
+
+def _restore(kind, spec, tooltip):
+    if kind == 'plotly':
+        # The spec was validated when the figure was first built
+        return go.Figure(json.loads(spec), _validate=False)
+    return _DeckSpec(spec, tooltip)
+
+
+# Filter values as a hashable key. Multiselect choices are compared as sets, since every cached
+# builder filters by membership; None ("no filter") stays distinct from an empty selection.
+def _normalize(value):
+    if isinstance(value, dict):
+        return tuple(sorted((key, _normalize(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set, frozenset, np.ndarray)):
+        items = [_normalize(item) for item in value]
+        try:
+            return tuple(sorted(set(items)))
+        except TypeError:
+            return tuple(sorted(set(items), key=repr))
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _evict():
+    while _stats['bytes'] > FIGURE_CACHE_MAX_BYTES and _entries:
+        _, (_, spec, _) = _entries.popitem(last=False)
+        _stats['bytes'] -= len(spec)
+        _stats['evictions'] += 1
+
+
+# Drop every figure `name` built from older versions of its datasets
+def _invalidate(name, versions):
+    if _versions.get(name) == versions:
+        return
+    stale = [key for key in _entries if key[0] == name]
+    for key in stale:
+        _stats['bytes'] -= len(_entries.pop(key)[1])
+    _stats['invalidations'] += len(stale)
+    _versions[name] = versions
+
+
+def cached_figure(*paths, depends=()):
+    def decorate(build):
+        name = f"{build.__module__}.{build.__qualname__}"
+        version_of_code = disk_cache.code_version(build, *depends)
+
+        @functools.wraps(build)
+        def wrapper(source, *args, **kwargs):
+            versions = tuple(dataset_version(path) for path in paths)
+            key = (name, versions, _normalize(args), _normalize(kwargs))
+            with _lock:
+                _invalidate(name, versions)
+                entry = _entries.get(key)
+                if entry is not None:
+                    _entries.move_to_end(key)
+                    _stats['hits'] += 1
+                else:
+                    _stats['misses'] += 1
+            if entry is not None:
+                return _restore(*entry)
+
+            stored_key = disk_cache.make_key('figure', key, version_of_code)
+            stored = disk_cache.get(stored_key)
+            if stored is not None:
+                entry = tuple(json.loads(stored))
+                figure = _restore(*entry)
+            else:
+                figure = build(source, *args, **kwargs)
+                entry = _serialize(figure)
+                disk_cache.put(stored_key, json.dumps(entry).encode())
+            with _lock:
+                if key not in _entries:
+                    _entries[key] = entry
+                    _stats['bytes'] += len(entry[1])
+                    _evict()
+            return figure
+        return wrapper
+    return decorate
+
+
+def figure_cache_stats():
+    with _lock:
+        lookups = _stats['hits'] + _stats['misses']
+        return dict(_stats, entries=len(_entries), max_bytes=FIGURE_CACHE_MAX_BYTES,
+                    hit_rate=_stats['hits'] / lookups if lookups else 0.0)
+
+
+def clear_figure_cache():
+    with _lock:
+        _entries.clear()
+        _versions.clear()
+        for name in _stats:
+            _stats[name] = 0
@@ -0,0 +1,56 @@
+import numpy as np
+
+from common.datasets import load_derived
+
+# Coordinates of the states and SA3s the maps are centred on.
+# A GeoIndex is built once per (coordinate file, key column): the coordinates of every distinct key
+# go into two float64 arrays, and a dict maps each key (a state name, an SA3 name or an SA3 code) to
+# its position in them. The prediction pages used to read their coordinate CSV again, drop its
+# duplicates and filter it on every Predict click; a lookup is now a dict access into arrays kept
+# in memory. Like the frames of common/datasets.py, an index is rebuilt once its file changes.
+
+
+class GeoIndex:
+    def __init__(self, keys, latitudes, longitudes):
+        # The first row of each key wins, as the pages' drop_duplicates() and .values[0] did
+        self.positions = {}
+        for i, key in enumerate(keys):
+            self.positions.setdefault(key, i)
+        first = np.fromiter(self.positions.values(), dtype=np.int64, count=len(self.positions))
+        self.keys = list(self.positions)
+        self.positions = {key: i for i, key in enumerate(self.keys)}
+        self.latitude = np.ascontiguousarray(np.asarray(latitudes, dtype=np.float64)[first])
+        self.longitude = np.ascontiguousarray(np.asarray(longitudes, dtype=np.float64)[first])
+
+    def __contains__(self, key):
+        return key in self.positions
+
+    def __len__(self):
+        return len(self.keys)
+
+    # (latitude, longitude) of `key`, or (None, None) for a key the file does not have
+    def coordinates(self, key):
+        i = self.positions.get(key)
+        if i is None:
+            return None, None
+        return self.latitude[i], self.longitude[i]
+
+    # Mean position of the keys of `weights` ({key: number of rows}), weighted like the mean over
+    # the rows they stand for; NaNs when none of them is known, as for the mean of no rows
+    def center(self, weights):
+        known = [(self.positions[key], weight) for key, weight in weights.items() if weight and key in self.positions]
+        if not known:
+            return np.nan, np.nan
+        positions, counts = np.array(known, dtype=np.int64).T
+        return (float(np.average(self.latitude[positions], weights=counts)),
+                float(np.average(self.longitude[positions], weights=counts)))
+
+
+# Index of the coordinates in `path`, keyed by `key`
+def geo_index(path, key, latitude='Latitude', longitude='Longitude', prepare=None):
+    def build(data):
+        # Keys without coordinates stay in, with NaNs, as the pages had them
+        rows = data.dropna(subset=[key])
+        return GeoIndex(rows[key].tolist(), rows[latitude].to_numpy(), rows[longitude].to_numpy())
+
+    return load_derived(f'geo_index:{key}:{latitude}:{longitude}', path, build, prepare=prepare)
@@ -0,0 +1,53 @@
+import argparse
+import importlib
+import sys
+import time
+
+from common import disk_cache
+from page_registry import PAGES
+
+# Fills the disk cache ahead of a release, so the first visitor of each page after a deploy or
+# restart is served from disk instead of paying for the load, parse and aggregate steps.
+# Every page module with a prewarm() function is asked to build what it shows for each state.
+#
+#     python -m common.prewarm                  every page
+#     python -m common.prewarm --cancer Breast  only the Breast Cancer pages
+#     python -m common.prewarm --clear          empty the disk cache first
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prewarm the on-disk result cache")
+    parser.add_argument('--cancer', help="only pages whose cancer type contains this text")
+    parser.add_argument('--clear', action='store_true', help="empty the disk cache before warming it")
+    args = parser.parse_args(argv)
+
+    if not disk_cache.enabled():
+        print("RESULT_CACHE_DIR is empty, so the disk cache is turned off; nothing to prewarm")
+        return 1
+    if args.clear:
+        disk_cache.clear_disk_cache()
+
+    failures = 0
+    for route, (module_path, _) in PAGES.items():
+        if args.cancer and args.cancer.lower() not in route[1].lower():
+            continue
+        module = importlib.import_module(module_path)
+        if not hasattr(module, 'prewarm'):
+            continue
+        start = time.perf_counter()
+        try:
+            module.prewarm()
+        except Exception as e:
+            failures += 1
+            print(f"FAILED  {module_path}: {e}")
+            continue
+        print(f"{time.perf_counter() - start:7.2f}s {module_path}")
+
+    stats = disk_cache.disk_cache_stats()
+    print(f"{stats['writes']} results written ({stats['bytes_written']:,} bytes), "
+          f"{stats['hits']} already cached, in {stats['directory']}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+# Column typing shared by the snapshot build (common/snapshot.py) and the CSV fallback in
+# common/datasets.py, so a page sees the same dtypes whichever of the two a frame came from.
+
+# Low-cardinality label columns stored as pandas categoricals
+CATEGORICAL_COLUMNS = {
+    'State/territory', 'States_and_territories', 'State_and_territory', 'Physical State',
+    'SA3 name', 'SA3_name', 'SA2 Name', 'PHN name',
+    'Age group', 'Age_group', 'Age',
+    'Sex', 'Status', 'Month', 'Invitation round', 'Screened in previous invitation round?',
+}
+
+# Columns holding rates rather than counts, always stored as floats
+PERCENT_COLUMNS = {'Participation_Per', 'Crude_rate'}
+PERCENT_MARKERS = ('%', 'Percent', '_perc')
+
+# Placeholders the AIHW tables use for suppressed or not applicable cells
+MISSING_MARKERS = {'n.p.', '.', '. .', '-', '..', ''}
+
+_NUMBER_PATTERN = r'^-?(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?$'
+
+# Monthly files carry the year in one of these columns next to a 'Month' name
+_MONTHLY_YEAR_COLUMNS = ['Year', 'Period (quarter)']
+
+
+def is_percent_column(name):
+    return name in PERCENT_COLUMNS or any(marker in name for marker in PERCENT_MARKERS)
+
+
+# Parse a text column of numbers written with thousands separators ("26,421") and suppression
+# markers ("n.p."). Returns None when the column holds anything else, e.g. postcode lists.
+def parse_number_column(values):
+    text = values.astype(str).str.strip()
+    missing = values.isna() | text.isin(MISSING_MARKERS)
+    if not text[~missing].str.match(_NUMBER_PATTERN).all():
+        return None
+    numbers = pd.to_numeric(text.where(~missing).str.replace(',', ''), errors='coerce')
+    return numbers
+
+
+def _narrow_number_column(name, numbers):
+    if is_percent_column(name):
+        return numbers.astype('float64')
+    # Counts become integers; a count with suppressed cells has to stay float so it can hold NaN
+    if numbers.notna().all() and (numbers % 1 == 0).all():
+        return numbers.astype('int64')
+    return numbers.astype('float64')
+
+
+def apply_types(df):
+    df = df.copy()
+    for name in df.columns:
+        column = df[name]
+        if name in CATEGORICAL_COLUMNS:
+            df[name] = column.astype(str).str.strip().where(column.notna()).astype('category')
+        elif column.dtype == object:
+            numbers = parse_number_column(column)
+            if numbers is not None:
+                df[name] = _narrow_number_column(name, numbers)
+        elif is_percent_column(name):
+            df[name] = column.astype('float64')
+
+    # Financial years such as "2014-2015" or "2015–2016" start with the calendar year used on the x axes
+    if 'Year' in df.columns and df['Year'].dtype == object:
+        df['Start Year'] = pd.to_numeric(df['Year'].str.extract(r'^(\d+)', expand=False))
+        if df['Start Year'].notna().all():
+            df['Start Year'] = df['Start Year'].astype('int64')
+
+    if 'Month' in df.columns:
+        year_column = next((name for name in _MONTHLY_YEAR_COLUMNS if name in df.columns), None)
+        if year_column is not None and np.issubdtype(df[year_column].dtype, np.integer):
+            df['Date'] = pd.to_datetime(df[year_column].astype(str) + ' ' + df['Month'].astype(str), format='%Y %B')
+    return df
@@ -0,0 +1,72 @@
+import threading
+import time
+
+# Deduplicates concurrent cache misses. Streamlit runs every session in its own thread, so after a
+# restart many sessions miss on the same dataset or model at once; with a SingleFlight the first of
+# them (the leader) does the work for a key while the others wait for its result, or its exception,
+# instead of repeating it.
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {'leaders': 0, 'waiters': 0, 'wait_seconds': 0.0, 'max_wait_seconds': 0.0}
+        self._waiters_per_key = {}
+
+    # Result of function() for `key`, computed by one thread however many ask for it at the same time.
+    # The function should re-check the cache it fills: a thread that missed just before the leader
+    # finished becomes a new leader once the previous call is over.
+    def do(self, key, function):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats['leaders'] += 1
+            else:
+                self._stats['waiters'] += 1
+                self._waiters_per_key[key] = self._waiters_per_key.get(key, 0) + 1
+
+        if not leader:
+            start = time.perf_counter()
+            call.done.wait()
+            waited = time.perf_counter() - start
+            with self._lock:
+                self._stats['wait_seconds'] += waited
+                self._stats['max_wait_seconds'] = max(self._stats['max_wait_seconds'], waited)
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    # Leaders are the loads actually done, waiters the misses that shared a leader's result.
+    # `contended` lists the keys other threads have waited on, most waited-on first.
+    def stats(self):
+        with self._lock:
+            contended = sorted(self._waiters_per_key.items(), key=lambda item: -item[1])
+            return dict(self._stats, in_flight=len(self._calls),
+                        contended=[{'key': str(key), 'waiters': waiters} for key, waiters in contended])
+
+    def reset_stats(self):
+        with self._lock:
+            for name in self._stats:
+                self._stats[name] = 0
+            self._waiters_per_key.clear()
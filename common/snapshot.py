@@ -0,0 +1,84 @@
+import glob
+import os
+import re
+import sys
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from common.datasets import SOURCE_HASH_KEY, file_hash, snapshot_path
+from common.schema import apply_types
+
+# Offline build step that converts every CSV the app ships with into a typed Parquet snapshot.
+# Run it from the project root before starting the server:
+#
+#     python -m common.snapshot
+#
+# Snapshots are written next to their CSV in a `columnar/` folder and record the sha256 of the CSV
+# they were built from; common/datasets.py only uses a snapshot whose hash still matches its CSV.
+
+DATA_GLOBS = ['data_visualisation/*/data/*.csv', 'machine_learning/data/*.csv']
+SOURCE_DIRS = ['data_visualisation', 'machine_learning', 'common']
+
+_CSV_LITERAL = re.compile(r"""['"]([\w./ -]+\.csv)['"]""")
+
+
+# Every CSV path written as a string literal in the app's source, i.e. every file a page reads
+def referenced_files():
+    referenced = set()
+    for folder in SOURCE_DIRS:
+        for source in glob.glob(os.path.join(folder, '**', '*.py'), recursive=True):
+            with open(source, encoding='utf-8') as f:
+                for path in _CSV_LITERAL.findall(f.read()):
+                    referenced.add(os.path.normpath(path))
+    return sorted(referenced)
+
+
+def read_source_csv(path):
+    # A few of the exported census tables are Latin-1 rather than UTF-8
+    try:
+        return pd.read_csv(path)
+    except UnicodeDecodeError:
+        return pd.read_csv(path, encoding='ISO-8859-1')
+
+
+def write_snapshot(csv_path):
+    df = apply_types(read_source_csv(csv_path))
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[SOURCE_HASH_KEY] = file_hash(csv_path).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    output = snapshot_path(csv_path)
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    pq.write_table(table, output)
+    return df, output
+
+
+def build_snapshots():
+    sources = sorted({os.path.normpath(path) for pattern in DATA_GLOBS for path in glob.glob(pattern)})
+    missing = [path for path in referenced_files() if not os.path.exists(path)]
+
+    for csv_path in sources:
+        start = time.perf_counter()
+        df, output = write_snapshot(csv_path)
+        elapsed = time.perf_counter() - start
+        print(f"{csv_path} -> {output}  {len(df)} rows, "
+              f"{os.path.getsize(csv_path) // 1024} KB -> {os.path.getsize(output) // 1024} KB, {elapsed:.2f}s")
+
+    return missing
+
+
+def main():
+    missing = build_snapshots()
+    if missing:
+        print("\nThe following files are read by the app but do not exist:", file=sys.stderr)
+        for path in missing:
+            print(f"  {path}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
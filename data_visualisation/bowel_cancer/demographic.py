@@ -2,11 +2,19 @@ import pandas as pd
 import streamlit as st
 import plotly.express as px
 
-def load_data():
-    df = pd.read_csv('data_visualisation/bowel_cancer/data/final_bc_data.csv')
-    # Calculating the percentage of English spoken at home
-    df['Percentage English Spoken'] = df['Language_spoken_at_home_English_only_Persons'] / (df['Language_spoken_at_home_English_only_Persons'] + df['Language_spoken_at_home_Other_Language_Persons']) * 100
-    return df
+from data_visualisation.demographic_index import load_demographic_index
+from data_visualisation.demographic_metrics import add_demographic_metrics, population_totals
+
+# Derived metrics (English-only, higher education, overseas-born and Indigenous shares) are added
+# once when the table is loaded, see data_visualisation/demographic_metrics.py
+
+# The page's table, ordered and indexed by (state, year, participation) for the page filters
+def load_index():
+    return load_demographic_index('data_visualisation/bowel_cancer/data/final_bc_data.csv', prepare=add_demographic_metrics)
+
+# Builds the page's index ahead of the first visit, for the prewarm CLI (python -m common.prewarm)
+def prewarm():
+    load_index()
 
 def create_income_vs_participation_plot(data):
     # Assuming 'Participation (%)' and 'Median_total_household_income_weekly' are present and correctly formatted in data
@@ -28,10 +36,10 @@ def create_income_vs_participation_plot(data):
 
     st.plotly_chart(fig)
 
-def create_language_vs_participation_plot(data):
-    # Calculate total sums for English and Other Languages spoken at home
-    total_english = data['Language_spoken_at_home_English_only_Persons'].sum()
-    total_other = data['Language_spoken_at_home_Other_Language_Persons'].sum()
+def create_language_vs_participation_plot(totals):
+    # Total English and Other Languages spoken at home over the selected rows
+    total_english = totals['Language_spoken_at_home_English_only_Persons']
+    total_other = totals['Language_spoken_at_home_Other_Language_Persons']
 
     # Preparing data for the donut chart
     language_data = {
@@ -47,11 +55,11 @@ def create_language_vs_participation_plot(data):
     st.plotly_chart(fig)
 
 
-def create_birthplace_donut_chart(data):
-    # Summing the columns for the chart
+def create_birthplace_donut_chart(totals):
+    # Birthplace totals over the selected rows
     birthplace_data = {
         'Category': ['Australia', 'Elsewhere'],
-        'Count': [data['Birthplace_Australia_Persons'].sum(), data['Birthplace_Elsewhere_Persons'].sum()]
+        'Count': [totals['Birthplace_Australia_Persons'], totals['Birthplace_Elsewhere_Persons']]
     }
     df_pie = pd.DataFrame(birthplace_data)
 
@@ -62,11 +70,11 @@ def create_birthplace_donut_chart(data):
 
 
 
-def create_donut_chart(data, value, name, title):
+def create_donut_chart(totals, value, name, title):
     # Data preparation for the donut chart
     chart_data = {
         'Category': [name, 'Other'],
-        'Count': [data[value].sum(), data['Total_Persons'].sum() - data[value].sum()]
+        'Count': [totals[value], totals['Total_Persons'] - totals[value]]
     }
     df_chart = pd.DataFrame(chart_data)
     
@@ -75,10 +83,10 @@ def create_donut_chart(data, value, name, title):
     fig.update_traces(textposition='inside', textinfo='percent+label')
     return fig
 
-def create_indigenous_population_chart(data):
-    # Calculate the sum of Indigenous persons and calculate the non-Indigenous count
-    total_indigenous = data['Aboriginal_and_or_Torres_Strait_Islander_Persons'].sum()
-    total_non_indigenous = data['Total_Persons'].sum() - total_indigenous
+def create_indigenous_population_chart(totals):
+    # Indigenous persons and the non-Indigenous remainder over the selected rows
+    total_indigenous = totals['Aboriginal_and_or_Torres_Strait_Islander_Persons']
+    total_non_indigenous = totals['Total_Persons'] - total_indigenous
 
     # Preparing data for the donut chart
     indigenous_data = {
@@ -95,22 +103,7 @@ def create_indigenous_population_chart(data):
 
 
 def create_education_proportion_table(data):
-    # Calculate the total of persons with higher education
-    higher_education_columns = [
-        "Persons_Advanced_and_Associate_Degree",
-        "Persons_Advanced_Diploma",
-        "Persons_Certificate_Level_Certificate_III_and_IV",
-        "Persons_Certificate_Level_Certificate_I_and_II",
-        "Persons_Postgraduate_Degree",
-        "Persons_Graduate_Diploma_and_Graduate_Certificate",
-        "Persons_Bachelor_Degree"
-    ]
-    
-    data['Total_Higher_Education'] = data[higher_education_columns].sum(axis=1)
-    data['% Higher Education'] = data['Total_Higher_Education'] / data['Total_Persons'] * 100
-    data['% Not Higher Education'] = 100 - data['% Higher Education']
-    
-    # Group by year and calculate the mean for each year
+    # Group by year and calculate the mean of the precomputed higher education shares for each year
     education_by_year = data.groupby('Year')[['% Higher Education', '% Not Higher Education']].mean().reset_index()
 
     return education_by_year
@@ -129,29 +122,30 @@ import streamlit as st
 def demographic_page_bc():
     st.title("Bowel Cancer Screening Demographics")
     
-    df = load_data()
+    index = load_index()
 
 
     # User interface row for selecting parameters
     col_state, col_year, col_participation = st.columns(3)
     with col_state:
-        state_option = st.selectbox("Select State:", df['State/territory']. unique())
+        state_option = st.selectbox("Select State:", index.states)
     with col_year:
-        year_option = st.selectbox("Select Year:", df['Year'].unique())
+        year_option = st.selectbox("Select Year:", index.years)
     with col_participation:
         participation_range = st.slider("Select Participation Rate Range:", 0, 100, (0, 100))
 
     # Filter data based on selections
-    filtered_data = df[(df['State/territory'] == state_option) & (df['Year'] == year_option) & (df['Participation (%)'] >= participation_range[0]) & (df['Participation (%)'] <= participation_range[1])]
+    filtered_data = index.select(state_option, year_option, participation_range[0], participation_range[1])
     
-    # First row: Creating columns for the donut charts
+    # First row: Creating columns for the donut charts, all drawn from one pass over the selection
+    totals = population_totals(filtered_data)
     col1, col2, col3 = st.columns(3)
     with col1:
-        create_language_vs_participation_plot(filtered_data)
+        create_language_vs_participation_plot(totals)
     with col2:
-        create_birthplace_donut_chart(filtered_data)
+        create_birthplace_donut_chart(totals)
     with col3:
-        create_indigenous_population_chart(filtered_data)
+        create_indigenous_population_chart(totals)
 
     # Second row: Scatter plot spanning two rows in height, with two smaller columns for tables
     col4, col5 = st.columns([3, 1])  # Adjusting the layout: scatter plot gets more space
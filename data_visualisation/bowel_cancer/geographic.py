@@ -1,125 +1,136 @@
-import pandas as pd
 import streamlit as st
-import pydeck as pdk
 
-# Load and Prepare Data Function
-def load_and_prepare_data():
-    df = pd.read_csv('data_visualisation/bowel_cancer/data/geo_sa3_data.csv')
-    df['Participated'] = pd.to_numeric(df['Participated'].str.replace(',', ''), errors='coerce')
-    df['Invited'] = pd.to_numeric(df['Invited'].str.replace(',', ''), errors='coerce')
-    df['Participation_perc'] = pd.to_numeric(df['Participation (%)'], errors='coerce')
+from common.datasets import load_dataset
+from common.figure_cache import cached_figure
+from common.geo_index import GeoIndex, geo_index
+from data_visualisation.density_grids import DensityGrids, density_grids
+from data_visualisation.facets import FacetIndex, load_facets
+from data_visualisation.sa3_layers import Sa3Map, sa3_map
+
+# Counts and percentages arrive numeric (suppressed "n.p." cells as NaN), see common/schema.py
+def prepare_data(df):
+    df['Participation_perc'] = df['Participation (%)']
     df = df.dropna(subset=['Lat_precise', 'Long_precise'])
     return df
 
-# Create Geographical Map Function
-def create_geographical_map(filtered_data, column_name, color, cell_size=200):
-    if column_name == 'Participation_perc':
-        layer = pdk.Layer(
-            "HeatmapLayer",
-            data=filtered_data,
-            get_position='[Long_precise, Lat_precise]',
-            get_weight=column_name,  # Weight by participation percentage
-            radius=cell_size,  # Radius of each data point for the heatmap
-            intensity=1,  # Intensity of each point
-            color_range=[  # Color from blue (low) to red (high)
-                [0, 0, 255, 25],  # Blue, low
-                [0, 255, 255, 85],  # Cyan
-                [0, 255, 0, 127],  # Green
-                [255, 255, 0, 170],  # Yellow
-                [255, 165, 0, 212],  # Orange
-                [255, 0, 0, 255]  # Red, high
-            ],
-            threshold=0.05,  # Minimum threshold for rendering
-            opacity=0.6
-        )
-    else:
-        scaling_factor = 0.5 if column_name != 'Participation_perc' else 100
-        layer = pdk.Layer(
-            'ScatterplotLayer',
-            filtered_data,
-            get_position='[Long_precise, Lat_precise]',
-            get_color=color,
-            get_radius=f"{column_name} * {scaling_factor}",
-            pickable=True,
-            opacity=0.8
-        )
-
-    view_state = pdk.ViewState(
-        longitude=filtered_data['Long_precise'].mean(),
-        latitude=filtered_data['Lat_precise'].mean(),
-        zoom=6,
-        pitch=0
-    )
-
-    deck = pdk.Deck(
-        layers=[layer],
-        initial_view_state=view_state,
-        map_style='mapbox://styles/mapbox/light-v9'
-    )
-    return deck
-
+# Load and Prepare Data Function
+def load_and_prepare_data():
+    return load_dataset('data_visualisation/bowel_cancer/data/geo_sa3_data.csv', prepare=prepare_data)
+
+# Row bitmaps of every state, SA3 and year in the table, used by the page controls and filters
+def load_facet_index():
+    return load_facets('data_visualisation/bowel_cancer/data/geo_sa3_data.csv', prepare=prepare_data)
+
+# Coordinates of every SA3 code in the table
+def load_geo_index():
+    return geo_index('data_visualisation/bowel_cancer/data/geo_sa3_data.csv', 'SA3 code', 'Lat_precise', 'Long_precise', prepare=prepare_data)
+
+def load_density_grids():
+    return density_grids('data_visualisation/bowel_cancer/data/geo_sa3_data.csv', 'Participation_perc', prepare=prepare_data)
+
+# Layers the map can show: (column, circle color), or for the percentage its precomputed density
+# raster or the heatmap the browser computes, which the raster falls back to
+MAP_LAYERS = {
+    'Invitation': ('Invited', '[0, 116, 217, 160]'),
+    'Participation': ('Participated', '[200, 30, 0, 160]'),
+    'Participation Percentage': ('Participation_perc', 'density'),
+    'Participation Percentage (heatmap)': ('Participation_perc', 'heatmap'),
+}
+
+
+# Create Geographical Map Function, showing `layers` (names in MAP_LAYERS) for the rows of the
+# facet index matching `selections`. Every map of a selection shares its per-SA3 table and view.
+@cached_figure('data_visualisation/bowel_cancer/data/geo_sa3_data.csv', depends=[Sa3Map, DensityGrids, GeoIndex, FacetIndex])
+def create_geographical_map(facets, selections, layers, cell_size=200):
+    columns = list(dict.fromkeys(column for column, _ in MAP_LAYERS.values()))
+    sa3s = sa3_map(facets, load_geo_index(), facets.match(selections), columns)
+    deck_layers = []
+    for name, (column_name, style) in MAP_LAYERS.items():
+        if name not in layers:
+            continue
+        if style == 'density':
+            raster = load_density_grids().bitmap_layer(selections, sa3s.view_state.zoom, f'{column_name} density')
+            if raster is None:
+                raster = sa3s.heatmap_layer(column_name, cell_size, id=f'{column_name} density')
+            deck_layers.append(raster)
+        elif style == 'heatmap':
+            deck_layers.append(sa3s.heatmap_layer(column_name, cell_size))
+        else:
+            deck_layers.append(sa3s.scatter_layer(column_name, style))
+    return sa3s.deck(deck_layers)
 
 
 def geographical_tab_bc():
     st.title('Geographical Trends in Participation')
-    df = load_and_prepare_data()
+    facets = load_facet_index()
 
-    state_option, sa3_code, sa3_name, year = setup_controls(df)
+    state_option, sa3_code, sa3_name, year = setup_controls(facets)
 
-    if state_option:
-        df = df[df['State/territory'].isin(state_option)]
-    if sa3_code:
-        df = df[df['SA3 code'].isin(sa3_code)]
-    if sa3_name:
-        df = df[df['SA3 name'].isin(sa3_name)]
-    if year:
-        df = df[df['Year'].isin(year)]
+    # One bitmap intersection over all four filters, then a single row selection
+    selections = {'State/territory': state_option, 'SA3 code': sa3_code, 'SA3 name': sa3_name, 'Year': year}
+    df = facets.rows(facets.match(selections))
 
     if df.empty:
         st.write("No data available for the selected filters.")
     else:
-        # Display maps
-        col1, col2 = st.columns(2)
+        # One map with the layers picked, and optionally a second one beside it to compare with
+        col1, col2 = st.columns([4, 1])
         with col1:
-            st.subheader("Invitation Map")
-            invited_deck = create_geographical_map(df, 'Invited', '[0, 116, 217, 160]')
-            st.pydeck_chart(invited_deck)
+            layers = st.multiselect("Map layers:", options=list(MAP_LAYERS), default=['Invitation'])
         with col2:
-            st.subheader("Participation Map")
-            participated_deck = create_geographical_map(df, 'Participated', '[200, 30, 0, 160]')
-            st.pydeck_chart(participated_deck)
-        # Heatmap for participation percentage
-        st.subheader("Participation Percentage Map")
-        participation_percent_deck = create_geographical_map(df, 'Participation_perc', None)
-        st.pydeck_chart(participation_percent_deck)
-
-
-def setup_controls(data):
+            side_by_side = st.toggle("Side by side")
+        if side_by_side:
+            compared = st.multiselect("Compare with:", options=list(MAP_LAYERS), default=['Participation'])
+            col1, col2 = st.columns(2)
+            with col1:
+                st.pydeck_chart(create_geographical_map(facets, selections, layers))
+            with col2:
+                st.pydeck_chart(create_geographical_map(facets, selections, compared))
+        else:
+            st.pydeck_chart(create_geographical_map(facets, selections, layers))
+
+
+# Builds each layer's map for the page's opening selection and for each state on its own, so the
+# prewarm CLI (python -m common.prewarm) can fill the figure caches before a release
+def prewarm():
+    facets = load_facet_index()
+    for states in [[]] + [[state] for state in facets.values['State/territory']]:
+        selections = {'State/territory': states, 'SA3 code': [], 'SA3 name': [], 'Year': []}
+        for name in MAP_LAYERS:
+            create_geographical_map(facets, selections, [name])
+
+# Labels each option with the number of records it keeps. Counts are taken over the same rows the
+# option list is built from: Streamlit derives a multiselect's identity from its labels, so labels
+# that changed with unrelated selections would clear what the user had picked.
+def count_label(counts):
+    return lambda value: f"{value} ({counts[value]:,})"
+
+def setup_controls(facets):
     col1, col2, col3, col4 = st.columns(4)
 
     with col2:
         # Select SA3 Code first
-        sa3_code = st.multiselect("Select SA3 Code:", options=data['SA3 code'].unique())
+        counts = facets.counts('SA3 code')
+        sa3_code = st.multiselect("Select SA3 Code:", options=facets.values['SA3 code'], format_func=count_label(counts))
 
-    # Filter the dataframe based on the selected SA3 code for state and SA3 name
-    if sa3_code:
-        filtered_data = data[data['SA3 code'].isin(sa3_code)]
-        state_options = filtered_data['State/territory'].unique()
-        sa3_name_options = filtered_data['SA3 name'].unique()
-    else:
-        state_options = data['State/territory'].unique()
-        sa3_name_options = data['SA3 name'].unique()
+    # Restrict the state and SA3 name options to the selected SA3 codes
+    code_rows = facets.match({'SA3 code': sa3_code})
+    state_options = facets.options('State/territory', code_rows)
+    sa3_name_options = facets.options('SA3 name', code_rows)
 
     with col1:
         # Select State/Territory based on selected SA3 Code
-        state_option = st.multiselect("Select State/Territory:", options=state_options)
+        counts = facets.counts('State/territory', code_rows)
+        state_option = st.multiselect("Select State/Territory:", options=state_options, format_func=count_label(counts))
 
     with col3:
         # Select SA3 Name based on selected SA3 Code
-        sa3_name = st.multiselect("Select SA3 Name:", options=sa3_name_options)
+        counts = facets.counts('SA3 name', code_rows)
+        sa3_name = st.multiselect("Select SA3 Name:", options=sa3_name_options, format_func=count_label(counts))
 
     with col4:
         # Select Year
-        year = st.multiselect("Select Year:", options=data['Year'].unique())
+        counts = facets.counts('Year')
+        year = st.multiselect("Select Year:", options=facets.values['Year'], format_func=count_label(counts))
 
     return state_option, sa3_code, sa3_name, year
@@ -4,24 +4,30 @@ import streamlit as st
 import plotly.graph_objects as go
 
 from pathlib import Path
-import re
 
+from common.datasets import load_dataset
+from common.figure_cache import cached_figure
+from data_visualisation.participation_cube import ParticipationCube, load_cube
+
+# 'Start Year' (the first year of each financial year) and the monthly 'Date' column are
+# derived when the dataset is typed, see common/schema.py
 def load_data():
     try:
         # Assuming 'data_visualisation' is a directory within your project root
         data_path = Path('data_visualisation/bowel_cancer/data/bc_general.csv')
-        df = pd.read_csv(data_path)
-        # Extract the first sequence of digits from the 'Year' column as 'Start Year'
-        df['Start Year'] = df['Year'].apply(lambda x: int(re.match(r'^(\d+)', x).group(1)) if re.match(r'^(\d+)', x) else None)
+        df = load_dataset(data_path)
     except Exception as e:
         st.error(f"Failed to load and process data: {e}")
         return pd.DataFrame()  # Return an empty DataFrame on failure
     return df
 
-def load_monthly_data(state):
-    df = pd.read_csv('data_visualisation/bowel_cancer/data/bc_monthly.csv')
-    df['Date'] = pd.to_datetime(df['Year'].astype(str) + ' ' + df['Month'])
-    
+def load_monthly_data():
+    return load_dataset('data_visualisation/bowel_cancer/data/bc_monthly.csv')
+
+def monthly_screening_data(df, state):
+    # The monthly table spells states in capitals (VIC, QLD, TAS) where the general table has Vic, Qld, Tas
+    state = {column.upper(): column for column in df.columns}.get(state.upper(), state)
+
     # Filtering data based on the selected state and status
     invited_df = df[(df['Status'] == 'Invited') & (df['Sex'] != 'Persons')][['Date', state]].rename(columns={state: 'Count'})
     returned_df = df[(df['Status'] == 'Returned') & (df['Sex'] != 'Persons')][['Date', state]].rename(columns={state: 'Count'})
@@ -37,7 +43,9 @@ def load_monthly_data(state):
 
 
 
-def create_monthly_screening_plot(data):
+@cached_figure('data_visualisation/bowel_cancer/data/bc_monthly.csv')
+def create_monthly_screening_plot(monthly, state):
+    data = monthly_screening_data(monthly, state)
     fig = go.Figure()
     for label, color in zip(['Invited', 'Returned'], ['skyblue', 'orange']):
         df_filtered = data[data['Type'] == label]
@@ -54,16 +62,11 @@ def create_monthly_screening_plot(data):
     return fig
 
 
-def create_temporal_plot(data, sex, state, selected_age_groups):
-    # Filter data based on sex, state, and selected age groups
-    filtered_data = data[
-        (data['Sex'] == sex) &
-        (data['State/territory'] == state) &
-        (data['Age group'].isin(selected_age_groups))
-    ]
-
-    # Group by 'Start Year' and 'Age group' to calculate the mean participation for each group over time
-    grouped_data = filtered_data.groupby(['Start Year', 'Age group'])['Participation (%)'].mean().reset_index()
+@cached_figure('data_visualisation/bowel_cancer/data/bc_general.csv', depends=[ParticipationCube])
+def create_temporal_plot(cube, sex, state, selected_age_groups):
+    # Mean participation for each age group over time, for the selected sex, state, and age groups
+    grouped_data = cube.query(['Start Year', 'Age group'],
+                              {'Sex': [sex], 'State/territory': [state], 'Age group': selected_age_groups})
 
     # Creating the plot with Plotly Express
     colors = px.colors.qualitative.T10
@@ -88,12 +91,10 @@ def create_temporal_plot(data, sex, state, selected_age_groups):
 
 
 
-def create_sex_partition_plot(data, selected_years, selected_state):
-    # Filter data based on selected years and state
-    filtered_data = data[(data['Start Year'].isin(selected_years)) & (data['State/territory'] == selected_state)]
-
-    # Group by Age group and Sex, then calculate the mean participation percentage
-    grouped_data = filtered_data.groupby(['Age group', 'Sex'])['Participation (%)'].mean().reset_index()
+@cached_figure('data_visualisation/bowel_cancer/data/bc_general.csv', depends=[ParticipationCube])
+def create_sex_partition_plot(cube, selected_years, selected_state):
+    # Mean participation percentage by Age group and Sex for the selected years and state
+    grouped_data = cube.query(['Age group', 'Sex'], {'Start Year': selected_years, 'State/territory': [selected_state]})
 
     # Create the plot
     fig = px.bar(grouped_data,
@@ -105,13 +106,10 @@ def create_sex_partition_plot(data, selected_years, selected_state):
     return fig
 
 
-def create_state_participation_plot(data, selected_years):
-    # Filter the data for the selected years first
-    if selected_years:
-        data = data[data['Start Year'].isin(selected_years)]
-        
-    # Group by state and calculate the mean participation rate
-    state_participation = data.groupby('State/territory')['Participation (%)'].mean().reset_index()
+@cached_figure('data_visualisation/bowel_cancer/data/bc_general.csv', depends=[ParticipationCube])
+def create_state_participation_plot(cube, selected_years):
+    # Mean participation rate by state, over the selected years (all years when none are selected)
+    state_participation = cube.query(['State/territory'], {'Start Year': selected_years or None})
     
     # Sort by participation rate
     state_participation = state_participation.sort_values('Participation (%)', ascending=False)
@@ -134,32 +132,49 @@ def create_state_participation_plot(data, selected_years):
 def temporal_page_bc():
     st.title("Temporal Trends in Participation")
     data = load_data()
+    cube = load_cube('bowel')
 
     # Get the filters from setup controls
     sex_option, state_option, selected_years, age_groups = setup_controls(data)
 
-    monthly_data = load_monthly_data(state_option)
+    monthly_data = load_monthly_data()
 
     # Grid layout for plots
     row1_col1, row1_col2 = st.columns(2)
     row2_col1, row2_col2 = st.columns(2)
 
     with row1_col1:
-        fig_temporal = create_temporal_plot(data, sex_option, state_option, age_groups)
+        fig_temporal = create_temporal_plot(cube, sex_option, state_option, age_groups)
         st.plotly_chart(fig_temporal)
 
     with row1_col2:
-        fig_sex_partition = create_sex_partition_plot(data, selected_years, state_option)
+        fig_sex_partition = create_sex_partition_plot(cube, selected_years, state_option)
         st.plotly_chart(fig_sex_partition)
 
     with row2_col1:
-        fig_state_participation = create_state_participation_plot(data, selected_years)
+        fig_state_participation = create_state_participation_plot(cube, selected_years)
         st.plotly_chart(fig_state_participation)
 
     with row2_col2:
-        fig_monthly_screening = create_monthly_screening_plot(monthly_data)
+        fig_monthly_screening = create_monthly_screening_plot(monthly_data, state_option)
         st.plotly_chart(fig_monthly_screening)
 
+
+# Builds what the page shows for every state and sex with its default selections, so the prewarm
+# CLI (python -m common.prewarm) can fill the figure caches before a release
+def prewarm():
+    data = load_data()
+    cube = load_cube('bowel')
+    monthly = load_monthly_data()
+    years = sorted(data['Start Year'].unique())
+    age_groups = sorted(data['Age group'].unique())
+    create_state_participation_plot(cube, years)
+    for state in data['State/territory'].unique():
+        create_sex_partition_plot(cube, years, state)
+        create_monthly_screening_plot(monthly, state)
+        for sex in data['Sex'].unique():
+            create_temporal_plot(cube, sex, state, age_groups)
+
 # Utility function to setup controls
 def setup_controls(data):
     col1, col2, col3, col4 = st.columns(4)
@@ -2,15 +2,17 @@ import pandas as pd
 import plotly.express as px
 import streamlit as st
 import plotly.graph_objects as go
-import re
 
+from common.datasets import load_dataset
+from common.figure_cache import cached_figure
+from data_visualisation.participation_cube import ParticipationCube, load_cube
 
+
+# Participants/Population arrive as integers and 'Start Year' and the monthly 'Date' column are
+# derived when the dataset is typed, see common/schema.py
 def load_data():
     try:
-        df = pd.read_csv('data_visualisation/cervical_cancer/data/cc_general.csv')
-        df['Participants'] = df['Participants'].str.replace(',', '').astype(int)
-        df['Population'] = df['Population'].str.replace(',', '').astype(int)
-        df['Start Year'] = df['Year'].apply(lambda x: int(re.match(r'^(\d+)', x).group(1)) if re.match(r'^(\d+)', x) else None)
+        df = load_dataset('data_visualisation/cervical_cancer/data/cc_general.csv')
     except Exception as e:
         st.error(f"Failed to load and process data: {e}")
         return pd.DataFrame()
@@ -18,17 +20,13 @@ def load_data():
 
 
 def load_monthly_data(state):
-    df = pd.read_csv('data_visualisation/cervical_cancer/data/cc_monthly_screening_performed.csv')
-    df['Date'] = pd.to_datetime(df['Period (quarter)'].astype(str))
+    df = load_dataset('data_visualisation/cervical_cancer/data/cc_monthly_screening_performed.csv')
     df = df[['Date', state]].rename(columns={state: 'Participation (%)'})
     return df
 
-def create_temporal_plot(data, state, selected_age_groups):
-    filtered_data = data[
-        (data['State/territory'] == state) &
-        (data['Age group'].isin(selected_age_groups))
-    ]
-    grouped_data = filtered_data.groupby(['Start Year', 'Age group'])['Participation (%)'].mean().reset_index()
+@cached_figure('data_visualisation/cervical_cancer/data/cc_general.csv', depends=[ParticipationCube])
+def create_temporal_plot(cube, state, selected_age_groups):
+    grouped_data = cube.query(['Start Year', 'Age group'], {'State/territory': [state], 'Age group': selected_age_groups})
     colors = px.colors.qualitative.T10
     fig = px.area(
         grouped_data,
@@ -45,9 +43,9 @@ def create_temporal_plot(data, state, selected_age_groups):
     )
     return fig
 
-def create_age_partition_plot(data, selected_years, selected_state):
-    filtered_data = data[(data['Start Year'].isin(selected_years)) & (data['State/territory'] == selected_state)]
-    grouped_data = filtered_data.groupby(['Age group'])['Participation (%)'].mean().reset_index()
+@cached_figure('data_visualisation/cervical_cancer/data/cc_general.csv', depends=[ParticipationCube])
+def create_age_partition_plot(cube, selected_years, selected_state):
+    grouped_data = cube.query(['Age group'], {'Start Year': selected_years, 'State/territory': [selected_state]})
     fig = px.bar(grouped_data,
                  x='Age group',
                  y='Participation (%)',
@@ -58,19 +56,32 @@ def create_age_partition_plot(data, selected_years, selected_state):
 def temporal_page_cc():
     st.title("Temporal Trends in Participation")
     data = load_data()
+    cube = load_cube('cervical')
     state_option, selected_years, age_groups = setup_controls(data)
 
     # Grid layout for plots
     row1_col1, row1_col2 = st.columns(2)
 
     with row1_col1:
-        fig_temporal = create_temporal_plot(data, state_option, age_groups)
+        fig_temporal = create_temporal_plot(cube, state_option, age_groups)
         st.plotly_chart(fig_temporal)
 
     with row1_col2:
-        fig_age_partition = create_age_partition_plot(data, selected_years, state_option)
+        fig_age_partition = create_age_partition_plot(cube, selected_years, state_option)
         st.plotly_chart(fig_age_partition)
 
+
+# Builds what the page shows for every state with its default selections, so the prewarm CLI
+# (python -m common.prewarm) can fill the figure caches before a release
+def prewarm():
+    data = load_data()
+    cube = load_cube('cervical')
+    years = sorted(data['Start Year'].unique())
+    age_groups = sorted(data['Age group'].unique())
+    for state in data['State/territory'].unique():
+        create_temporal_plot(cube, state, age_groups)
+        create_age_partition_plot(cube, years, state)
+
 def setup_controls(data):
     col1, col2, col3 = st.columns(3)
     with col1:
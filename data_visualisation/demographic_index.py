@@ -0,0 +1,38 @@
+import numpy as np
+
+from common.datasets import load_derived
+
+# Prebuilt index over a final_*_data table for the demographic pages.
+# Rows are ordered by (state, year, participation), so every (state, year) pair owns one
+# contiguous row range and, inside it, the participation slider range is found by binary search.
+# A selection is therefore a plain positional slice of the ordered frame, whatever its size.
+
+STATE = 'State/territory'
+YEAR = 'Year'
+RATE = 'Participation (%)'
+
+
+class DemographicIndex:
+    def __init__(self, df):
+        # Selectbox options keep the order the values first appear in the source file
+        self.states = list(df[STATE].unique())
+        self.years = list(df[YEAR].unique())
+
+        self.frame = df.sort_values([STATE, YEAR, RATE], kind='stable', na_position='last').reset_index(drop=True)
+        self.rates = self.frame[RATE].to_numpy(dtype=float)
+        self.buckets = {}
+        for (state, year), positions in self.frame.groupby([STATE, YEAR], observed=True, sort=False).indices.items():
+            self.buckets[(state, year)] = (int(positions[0]), int(positions[-1]) + 1)
+
+    # Rows of `state` and `year` whose participation lies in [low, high]. Missing rates sort
+    # last within their bucket, so they fall outside every range just as with a boolean mask.
+    def select(self, state, year, low, high):
+        start, stop = self.buckets.get((state, year), (0, 0))
+        rates = self.rates[start:stop]
+        first = start + int(np.searchsorted(rates, low, side='left'))
+        last = start + int(np.searchsorted(rates, high, side='right'))
+        return self.frame.iloc[first:last]
+
+
+def load_demographic_index(path, prepare=None, **read_kwargs):
+    return load_derived('demographic_index', path, DemographicIndex, prepare=prepare, **read_kwargs)
@@ -0,0 +1,49 @@
+# Per SA3-year demographic metrics derived once when a final_*_data table is loaded, so the
+# demographic page charts only read columns and never write into the shared frame.
+
+HIGHER_EDUCATION_COLUMNS = [
+    "Persons_Advanced_and_Associate_Degree",
+    "Persons_Advanced_Diploma",
+    "Persons_Certificate_Level_Certificate_III_and_IV",
+    "Persons_Certificate_Level_Certificate_I_and_II",
+    "Persons_Postgraduate_Degree",
+    "Persons_Graduate_Diploma_and_Graduate_Certificate",
+    "Persons_Bachelor_Degree"
+]
+
+# Population counts the donut charts and gender table add up over the selected rows
+POPULATION_COLUMNS = [
+    'Language_spoken_at_home_English_only_Persons',
+    'Language_spoken_at_home_Other_Language_Persons',
+    'Birthplace_Australia_Persons',
+    'Birthplace_Elsewhere_Persons',
+    'Aboriginal_and_or_Torres_Strait_Islander_Persons',
+    'Total_Persons',
+    'Total_Persons_Males',
+    'Total_Persons_Females',
+]
+
+
+def add_demographic_metrics(df):
+    english = df['Language_spoken_at_home_English_only_Persons']
+    other_language = df['Language_spoken_at_home_Other_Language_Persons']
+    born_australia = df['Birthplace_Australia_Persons']
+    born_elsewhere = df['Birthplace_Elsewhere_Persons']
+
+    # Calculating the percentage of English spoken at home
+    df['Percentage English Spoken'] = english / (english + other_language) * 100
+
+    df['Total_Higher_Education'] = df[HIGHER_EDUCATION_COLUMNS].sum(axis=1)
+    df['% Higher Education'] = df['Total_Higher_Education'] / df['Total_Persons'] * 100
+    df['% Not Higher Education'] = 100 - df['% Higher Education']
+
+    df['% Born Overseas'] = born_elsewhere / (born_australia + born_elsewhere) * 100
+    df['% Indigenous'] = df['Aboriginal_and_or_Torres_Strait_Islander_Persons'] / df['Total_Persons'] * 100
+    df['% Males'] = df['Total_Persons_Males'] / df['Total_Persons'] * 100
+    df['% Females'] = df['Total_Persons_Females'] / df['Total_Persons'] * 100
+    return df
+
+
+# Column totals of the selected rows, computed once per rerun and shared by every donut chart
+def population_totals(data):
+    return data[POPULATION_COLUMNS].sum()
@@ -0,0 +1,173 @@
+import base64
+import math
+import struct
+import zlib
+
+import numpy as np
+import pydeck as pdk
+
+from common.datasets import load_derived
+from data_visualisation.sa3_layers import HEATMAP_COLORS, MAX_ZOOM, MIN_ZOOM
+
+# Participation density rasters of the geographic pages.
+# A HeatmapLayer has the browser estimate the density of its points again on every pan and zoom,
+# which low-end clients struggle with. Here the density of the SA3s' weights is computed once per
+# dataset version, for each (state, year) on its own and at each of GRID_ZOOMS, on a Web Mercator
+# lattice shared by all of them. A density is linear in its weights, so the raster of a selection
+# of states and years is the sum of their blocks; it is coloured as the heatmap colours its
+# density and sent as a PNG drawn by a BitmapLayer. The browser only stretches an image.
+# A selection the blocks do not split by (SA3s) has no raster: the pages draw the heatmap instead.
+
+# Every whole zoom the maps can open at (see sa3_layers.fit_zoom)
+GRID_ZOOMS = tuple(range(MIN_ZOOM, MAX_ZOOM + 1))
+# The HeatmapLayer's default radiusPixels; its kernel is a Gaussian of a sixth of that
+RADIUS_PIXELS = 50
+SIGMA_PIXELS = RADIUS_PIXELS / 6
+# Screen pixels per raster cell at the zoom it was built for
+CELL_PIXELS = 4
+TILE_PIXELS = 256
+# West, south, east, north. SA3s outside (missing coordinates were recorded as 0, 0) are left out.
+EXTENT = (96.0, -56.0, 169.0, -9.0)
+THRESHOLD = 0.05
+OPACITY = 0.6
+
+
+# Lattice coordinates of longitudes and latitudes at `zoom`, in cells
+def _cells(longitudes, latitudes, zoom):
+    scale = TILE_PIXELS * 2 ** zoom / CELL_PIXELS
+    x = (np.asarray(longitudes) + 180) / 360 * scale
+    y = (1 - np.log(np.tan(np.pi / 4 + np.radians(latitudes) / 2)) / np.pi) / 2 * scale
+    return x, y
+
+
+def _degrees(x, y, zoom):
+    scale = TILE_PIXELS * 2 ** zoom / CELL_PIXELS
+    return x / scale * 360 - 180, math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / scale))))
+
+
+def _kernel():
+    reach = math.ceil(3 * SIGMA_PIXELS / CELL_PIXELS)
+    offsets = np.arange(-reach, reach + 1) * CELL_PIXELS / SIGMA_PIXELS
+    return np.exp(-offsets ** 2 / 2).astype(np.float32)
+
+
+# Separable Gaussian blur, the grid holding `reach` empty cells on each side
+def _blur(grid, kernel):
+    reach = len(kernel) // 2
+    for axis in (0, 1):
+        padded = np.pad(grid, [(reach, reach) if a == axis else (0, 0) for a in (0, 1)])
+        blurred = np.zeros_like(grid)
+        for i, weight in enumerate(kernel):
+            window = padded[i:i + grid.shape[0]] if axis == 0 else padded[:, i:i + grid.shape[1]]
+            blurred += weight * window
+        grid = blurred
+    return grid
+
+
+# Density of `weights` at lattice points (x, y), as (first row, first column, grid)
+def _density(x, y, weights, kernel):
+    reach = len(kernel) // 2
+    # Cell c is centred on c + 0.5
+    x, y = x - 0.5, y - 0.5
+    col0 = int(math.floor(x.min())) - reach
+    row0 = int(math.floor(y.min())) - reach
+    grid = np.zeros((int(math.floor(y.max())) + reach + 2 - row0, int(math.floor(x.max())) + reach + 2 - col0),
+                    dtype=np.float32)
+    columns, rows = np.floor(x).astype(np.int64) - col0, np.floor(y).astype(np.int64) - row0
+    dx, dy = x - np.floor(x), y - np.floor(y)
+    # Each point shared between the four cells around it
+    for row_step, col_step, share in [(0, 0, (1 - dx) * (1 - dy)), (0, 1, dx * (1 - dy)),
+                                      (1, 0, (1 - dx) * dy), (1, 1, dx * dy)]:
+        np.add.at(grid, (rows + row_step, columns + col_step), weights * share)
+    return row0, col0, _blur(grid, kernel)
+
+
+def _colorize(density):
+    t = density / density.max()
+    stops = np.linspace(0, 1, len(HEATMAP_COLORS))
+    colors = np.array(HEATMAP_COLORS, dtype=np.float64)
+    rgba = np.stack([np.interp(t, stops, colors[:, channel]) for channel in range(4)], axis=-1)
+    # Fading out below the threshold, as the heatmap does
+    rgba[..., 3] *= np.clip(t / THRESHOLD, 0, 1)
+    return np.round(rgba).astype(np.uint8)
+
+
+def _png(rgba):
+    height, width, _ = rgba.shape
+    # Each scanline starts with its filter type, 0 (none)
+    raw = np.concatenate([np.zeros((height, 1), np.uint8), rgba.reshape(height, -1)], axis=1).tobytes()
+
+    def chunk(kind, body):
+        return struct.pack('>I', len(body)) + kind + body + struct.pack('>I', zlib.crc32(kind + body))
+
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw, 6)) + chunk(b'IEND', b''))
+
+
+class DensityGrids:
+    # Blocks of the density of `column` summed per `key`, one per combination of `groups`
+    def __init__(self, data, column, key='SA3 code', groups=('State/territory', 'Year'),
+                 longitude='Long_precise', latitude='Lat_precise'):
+        self.groups = list(groups)
+        west, south, east, north = EXTENT
+        inside = data[longitude].between(west, east) & data[latitude].between(south, north)
+        data = data[inside & data[column].notna()]
+        points = data.groupby(self.groups + [key], observed=True, sort=False).agg(
+            weight=(column, 'sum'), longitude=(longitude, 'first'), latitude=(latitude, 'first'))
+        points = points[points['weight'] > 0]
+        kernel = _kernel()
+
+        self.blocks = {}
+        for zoom in GRID_ZOOMS:
+            x, y = _cells(points['longitude'].to_numpy(), points['latitude'].to_numpy(), zoom)
+            weights = points['weight'].to_numpy(dtype=np.float64)
+            self.blocks[zoom] = {}
+            for group, positions in points.groupby(level=self.groups, observed=True, sort=False).indices.items():
+                self.blocks[zoom][group] = _density(x[positions], y[positions], weights[positions], kernel)
+
+    # Built zoom used for a map viewed at `zoom`
+    def level(self, zoom):
+        return max([level for level in GRID_ZOOMS if level <= zoom], default=GRID_ZOOMS[0])
+
+    # Density of the rows matching `selections` ({column: values}, none meaning all) at `level`, as
+    # (first row, first column, grid); None when the blocks cannot tell them apart or hold none
+    def density(self, selections, level):
+        if any(values for column, values in selections.items() if column not in self.groups):
+            return None
+        chosen = [block for group, block in self.blocks[level].items()
+                  if all(not selections.get(column) or value in selections[column]
+                         for column, value in zip(self.groups, group))]
+        if not chosen:
+            return None
+        row0 = min(block[0] for block in chosen)
+        col0 = min(block[1] for block in chosen)
+        height = max(block[0] + block[2].shape[0] for block in chosen) - row0
+        width = max(block[1] + block[2].shape[1] for block in chosen) - col0
+        total = np.zeros((height, width), dtype=np.float32)
+        for block_row, block_col, grid in chosen:
+            total[block_row - row0:block_row - row0 + grid.shape[0], block_col - col0:block_col - col0 + grid.shape[1]] += grid
+        return row0, col0, total
+
+    # BitmapLayer of the density of `selections` for a map viewed at `zoom`, or None
+    def bitmap_layer(self, selections, zoom, id):
+        level = self.level(zoom)
+        density = self.density(selections, level)
+        if density is None or not density[2].max() > 0:
+            return None
+        row0, col0, grid = density
+        west, north = _degrees(col0, row0, level)
+        east, south = _degrees(col0 + grid.shape[1], row0 + grid.shape[0], level)
+        image = base64.b64encode(_png(_colorize(grid))).decode()
+        return pdk.Layer(
+            'BitmapLayer',
+            data=None,
+            id=id,
+            image=f'data:image/png;base64,{image}',
+            bounds=[west, south, east, north],
+            opacity=OPACITY
+        )
+
+
+# Density rasters of `column` in `path`
+def density_grids(path, column, prepare=None):
+    return load_derived(f'density_grids:{column}', path, lambda data: DensityGrids(data, column), prepare=prepare)
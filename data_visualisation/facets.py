@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+from common.datasets import load_derived
+
+# Bitmap facet engine behind the geographic page controls.
+# For every value of every facet column it keeps a packed bitmap of the rows holding that value,
+# so cascading option lists, per-option row counts and the final filtered rows all come from
+# bitmap ORs/ANDs rather than isin() scans that allocate a new frame per filter. Per-option
+# counts histogram the value codes of the matching rows, which is cheaper than one popcount per
+# value when a facet has hundreds of values.
+
+FACET_COLUMNS = ['State/territory', 'SA3 code', 'SA3 name', 'Year']
+
+
+class FacetIndex:
+    def __init__(self, df, columns=FACET_COLUMNS):
+        self.frame = df
+        self.n_rows = len(df)
+        self.values = {}
+        self.positions = {}
+        self.bitmaps = {}
+        self.codes = {}
+        rows = np.arange(self.n_rows)
+        for column in columns:
+            # Values keep the order they first appear in, as Series.unique() does for the widgets
+            codes, uniques = pd.factorize(df[column])
+            self.values[column] = list(uniques)
+            self.positions[column] = {value: i for i, value in enumerate(self.values[column])}
+            self.codes[column] = codes
+            bits = np.zeros((len(uniques), self.n_rows), dtype=bool)
+            bits[codes[codes >= 0], rows[codes >= 0]] = True
+            self.bitmaps[column] = np.packbits(bits, axis=1)
+        self.all_rows = np.packbits(np.ones(self.n_rows, dtype=bool))
+
+    # Rows matching every facet in `selections` ({column: selected values}); facets with nothing
+    # selected do not filter, like the `if state_option:` checks they replace
+    def match(self, selections):
+        result = self.all_rows
+        for column, selected in selections.items():
+            if len(selected) == 0:
+                continue
+            wanted = [self.positions[column][value] for value in selected if value in self.positions[column]]
+            if not wanted:
+                return np.zeros_like(self.all_rows)
+            result = result & np.bitwise_or.reduce(self.bitmaps[column][wanted], axis=0)
+        return result
+
+    # How many rows of `within` each value of `column` keeps, in option order
+    def counts(self, column, within=None):
+        codes = self.codes[column] if within is None else self.codes[column][self._row_positions(within)]
+        histogram = np.bincount(codes[codes >= 0], minlength=len(self.values[column]))
+        return dict(zip(self.values[column], histogram.tolist()))
+
+    # Values of `column` present in `within`, in option order
+    def options(self, column, within):
+        return [value for value, count in self.counts(column, within).items() if count > 0]
+
+    def _row_positions(self, bitmap):
+        return np.flatnonzero(np.unpackbits(bitmap, count=self.n_rows))
+
+    def rows(self, bitmap):
+        if bitmap is self.all_rows:
+            return self.frame
+        return self.frame.iloc[self._row_positions(bitmap)]
+
+
+def load_facets(path, prepare=None, **read_kwargs):
+    return load_derived('facet_index', path, FacetIndex, prepare=prepare, **read_kwargs)
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+from common.datasets import dataset_version, load_derived
+
+# Pre-aggregated participation cube behind the temporal pages.
+# Every cell of the cube is one (state, sex, age group, start year) combination of a screening
+# program and holds mergeable partial aggregates, so any mix of selected states, years and age
+# groups is answered by adding cells together instead of filtering and grouping the raw rows.
+
+DIMENSIONS = ['State/territory', 'Sex', 'Age group', 'Start Year']
+
+# sum/count of 'Participation (%)' give the same mean as groupby().mean(); rows keeps groups
+# whose rate is missing, which groupby also keeps
+MEASURES = ['sum', 'count', 'participated', 'invited', 'rows']
+
+# Source table and (participated, invited) count columns of each program
+PROGRAMS = {
+    'bowel': ('data_visualisation/bowel_cancer/data/bc_general.csv', 'Participated', 'Invited'),
+    'breast': ('data_visualisation/breast_cancer/data/brc_general.csv', 'Participants', 'Population'),
+    'cervical': ('data_visualisation/cervical_cancer/data/cc_general.csv', 'Participants', 'Population'),
+}
+
+
+class ParticipationCube:
+    def __init__(self, program, version, values, cells):
+        self.program = program
+        self.version = version
+        self.values = values
+        self.positions = {dim: {value: i for i, value in enumerate(values[dim])} for dim in DIMENSIONS}
+        self.cells = cells
+
+    @classmethod
+    def from_frame(cls, program, version, df, participated_column, invited_column):
+        # Breast and cervical screening are not split by sex
+        if 'Sex' not in df.columns:
+            df = df.assign(Sex='Persons')
+        df = df.dropna(subset=DIMENSIONS)
+
+        values = {dim: sorted(df[dim].unique()) for dim in DIMENSIONS}
+        shape = tuple(len(values[dim]) for dim in DIMENSIONS)
+        codes = [pd.Categorical(df[dim], categories=values[dim]).codes for dim in DIMENSIONS]
+        cell_ids = np.ravel_multi_index(codes, shape)
+        n_cells = int(np.prod(shape))
+
+        rate = df['Participation (%)'].to_numpy(dtype=float)
+        observed = ~np.isnan(rate)
+        measures = [
+            np.where(observed, rate, 0.0),
+            observed.astype(float),
+            np.nan_to_num(df[participated_column].to_numpy(dtype=float)),
+            np.nan_to_num(df[invited_column].to_numpy(dtype=float)),
+            np.ones(len(df)),
+        ]
+        cells = np.stack([np.bincount(cell_ids, weights=weights, minlength=n_cells) for weights in measures], axis=-1)
+        return cls(program, version, values, cells.reshape(shape + (len(MEASURES),)))
+
+    # Cube positions selected by a filter; values the cube has never seen select nothing, just as
+    # they would match no rows in the raw table
+    def _selection(self, dim, wanted):
+        if wanted is None:
+            return np.arange(len(self.values[dim]))
+        positions = self.positions[dim]
+        return np.array(sorted({positions[value] for value in wanted if value in positions}), dtype=int)
+
+    # Equivalent of filtering the raw rows with `filters` ({dimension: allowed values}) and
+    # grouping them by `group_by`. Returns one row per non-empty group, sorted like groupby, with
+    # the group columns, the merged measures and the mean 'Participation (%)'.
+    def query(self, group_by, filters=None):
+        filters = filters or {}
+        selections = [self._selection(dim, filters.get(dim)) for dim in DIMENSIONS]
+        block = self.cells[np.ix_(*selections, np.arange(len(MEASURES)))]
+
+        kept = [dim for dim in DIMENSIONS if dim in group_by]
+        block = block.sum(axis=tuple(axis for axis, dim in enumerate(DIMENSIONS) if dim not in group_by))
+        block = np.moveaxis(block, [kept.index(dim) for dim in group_by], list(range(len(group_by))))
+
+        merged = block.reshape(-1, len(MEASURES))
+        non_empty = merged[:, MEASURES.index('rows')] > 0
+        group_values = [np.asarray(self.values[dim])[selections[DIMENSIONS.index(dim)]] for dim in group_by]
+        grid = np.meshgrid(*[np.arange(len(values)) for values in group_values], indexing='ij')
+
+        result = {dim: values[positions.ravel()[non_empty]] for dim, values, positions in zip(group_by, group_values, grid)}
+        for i, measure in enumerate(MEASURES):
+            result[measure] = merged[non_empty, i]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result['Participation (%)'] = np.where(result['count'] > 0, result['sum'] / result['count'], np.nan)
+        return pd.DataFrame(result)
+
+
+# Cube of a program, rebuilt only when its source table changes
+def load_cube(program):
+    path, participated_column, invited_column = PROGRAMS[program]
+    version = dataset_version(path)
+    return load_derived('participation_cube', path,
+                        lambda df: ParticipationCube.from_frame(program, version, df, participated_column, invited_column))
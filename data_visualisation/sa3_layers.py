@@ -0,0 +1,152 @@
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import pydeck as pdk
+
+# Layers of the geographic pages' map.
+# st.pydeck_chart sends a deck as JSON, with every row of a layer's data written out as a record of
+# all its columns. The pages gave each layer every SA3 x year x age group row of the selection, with
+# all of the table's columns; a layer now gets one record per SA3, holding only its position and the
+# value the layer draws, with the digits a map can show.
+# pydeck's binary attribute transport would avoid the JSON altogether, but only its Jupyter widget
+# sends binary attributes: Deck.to_json(), which is all Streamlit passes to the browser, leaves
+# them out.
+#
+# The pages draw one map (a second beside it on request) showing the layers picked over it, rather
+# than a map per layer. The per-SA3 table of a selection, holding every layer's column, and the view
+# over it are built once and shared by all its layers and maps: switching layers or opening the
+# second map only builds the layers. Streamlit's deck component passes deck.gl neither views nor
+# layer filters, so the two maps stay separate charts, opened on the same view.
+# That view is zoomed to fit the SA3s shown, from the whole country (MIN_ZOOM) to the zoom the maps
+# always opened at before (MAX_ZOOM).
+
+# About a metre
+POSITION_DECIMALS = 5
+VALUE_DECIMALS = 2
+# Selections whose table is kept, least recently used dropped first
+SA3_MAP_ENTRIES = 8
+MIN_ZOOM = 4
+MAX_ZOOM = 6
+# Size of the chart the view is fitted in, in pixels (st.pydeck_chart is 500 high)
+MAP_WIDTH = 600
+MAP_HEIGHT = 500
+MAP_STYLE = 'mapbox://styles/mapbox/light-v9'
+HEATMAP_COLORS = [  # Color from blue (low) to red (high)
+    [0, 0, 255, 25],  # Blue, low
+    [0, 255, 255, 85],  # Cyan
+    [0, 255, 0, 127],  # Green
+    [255, 255, 0, 170],  # Yellow
+    [255, 165, 0, 212],  # Orange
+    [255, 0, 0, 255]  # Red, high
+]
+
+_lock = threading.Lock()
+_entries = OrderedDict()
+
+
+# One record per SA3 code among the rows of `facets` in `bitmap`: its name, its position from `geo`
+# (the page's geo index by SA3 code) and the total of each of `columns` over those rows, SA3s with
+# no position left out. Also returns the mean number of rows per SA3, to size a marker like the
+# marker of one row.
+def sa3_totals(facets, geo, bitmap, columns):
+    frame = facets.rows(bitmap)
+    grouped = frame.groupby('SA3 code', sort=False)
+    totals = grouped[columns].sum(min_count=1)
+    positions = [geo.positions[code] for code in totals.index]
+    data = pd.DataFrame({
+        'SA3 name': grouped['SA3 name'].first().to_numpy(),
+        'Long_precise': geo.longitude[positions].round(POSITION_DECIMALS),
+        'Lat_precise': geo.latitude[positions].round(POSITION_DECIMALS),
+    })
+    for column in columns:
+        data[column] = totals[column].to_numpy().round(VALUE_DECIMALS)
+    data = data.dropna(subset=['Long_precise', 'Lat_precise'])
+    return data, len(frame) / max(grouped.ngroups, 1)
+
+
+# Zoom, between MIN_ZOOM and MAX_ZOOM in half steps, showing every position within a map centred
+# on `center`. Positions at 0, 0 are SA3s whose coordinates were missing and are not fitted.
+def fit_zoom(longitudes, latitudes, center):
+    latitude, longitude = center
+    known = (longitudes != 0) | (latitudes != 0)
+    if not known.any() or math.isnan(latitude):
+        return MAX_ZOOM
+    # Web Mercator: the world is 256 * 2**zoom pixels wide, x linear in longitude
+    x_span = 2 * np.abs(longitudes[known] - longitude).max() / 360
+    mercator = lambda degrees: np.log(np.tan(np.pi / 4 + np.radians(degrees) / 2)) / (2 * np.pi)
+    y_span = 2 * np.abs(mercator(latitudes[known]) - mercator(latitude)).max()
+    with np.errstate(divide='ignore'):
+        zoom = min(np.log2(MAP_WIDTH / 256 / x_span), np.log2(MAP_HEIGHT / 256 / y_span))
+    return float(min(max(math.floor(zoom * 2) / 2, MIN_ZOOM), MAX_ZOOM))
+
+
+# The per-SA3 table of the rows in `bitmap`, with the view over them, shared by every map of that
+# selection
+class Sa3Map:
+    def __init__(self, facets, geo, bitmap, columns):
+        self.data, self.rows_per_sa3 = sa3_totals(facets, geo, bitmap, columns)
+        # Centred on the SA3s shown, each weighted by its number of rows (the mean of the rows' positions)
+        latitude, longitude = geo.center(facets.counts('SA3 code', bitmap))
+        zoom = fit_zoom(self.data['Long_precise'].to_numpy(), self.data['Lat_precise'].to_numpy(), (latitude, longitude))
+        self.view_state = pdk.ViewState(longitude=longitude, latitude=latitude, zoom=zoom, pitch=0)
+
+    # Position and `column` of the SA3s that have a value for it, after the `extra` columns
+    def records(self, column, extra=()):
+        return self.data[list(extra) + ['Long_precise', 'Lat_precise', column]].dropna(subset=[column])
+
+    # Heatmap weights at one position add up, so a point per SA3 weighted by the total of its rows
+    # draws the same heatmap as a point per row
+    def heatmap_layer(self, column, cell_size, id=None):
+        return pdk.Layer(
+            "HeatmapLayer",
+            data=self.records(column),
+            id=id or column,
+            get_position='[Long_precise, Lat_precise]',
+            get_weight=column,
+            radius=cell_size,  # Radius of each data point for the heatmap
+            intensity=1,  # Intensity of each point
+            color_range=HEATMAP_COLORS,
+            threshold=0.05,  # Minimum threshold for rendering
+            opacity=0.6
+        )
+
+    # A circle per SA3 for the total of its rows, sized like the circle of one of its rows was
+    def scatter_layer(self, column, color):
+        scaling_factor = float(f"{0.5 / self.rows_per_sa3:.6g}")
+        return pdk.Layer(
+            'ScatterplotLayer',
+            self.records(column, extra=['SA3 name']),
+            id=column,
+            get_position='[Long_precise, Lat_precise]',
+            get_color=color,
+            get_radius=f"{column} * {scaling_factor}",
+            pickable=True,
+            opacity=0.8
+        )
+
+    def deck(self, layers):
+        return pdk.Deck(layers=layers, initial_view_state=self.view_state, map_style=MAP_STYLE)
+
+
+# Sa3Map of the rows of `facets` in `bitmap`, built on its first use
+def sa3_map(facets, geo, bitmap, columns):
+    key = (facets, geo, bitmap.tobytes(), tuple(columns))
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            _entries.move_to_end(key)
+            return entry
+    entry = Sa3Map(facets, geo, bitmap, columns)
+    with _lock:
+        _entries[key] = entry
+        while len(_entries) > SA3_MAP_ENTRIES:
+            _entries.popitem(last=False)
+    return entry
+
+
+def clear_sa3_maps():
+    with _lock:
+        _entries.clear()
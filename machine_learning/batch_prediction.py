@@ -0,0 +1,127 @@
+import itertools
+import threading
+import time
+
+import pandas as pd
+
+from common.datasets import load_dataset
+from machine_learning.model_registry import get_model
+
+# Batch scoring for the prediction pages.
+# Instead of one model.predict per selected (state, year, age) row, a page asks for the cross
+# product of every location of a program, its ten future years and the age groups it needs, and
+# scores all of them with a single vectorized predict call. Each row is built exactly like the
+# page's one-row input, so a row of the batch predicts the same value the one-row call did.
+
+FUTURE_YEARS = 10
+
+# How each program's model describes a scenario. `location` is the SA3 column of the programs
+# modelled per SA3, `age` is None for models without an age input, and `per_state` is how the SA3
+# predictions of a state are combined into one figure for the state chart.
+PROGRAMS = {
+    'cervical': {
+        'model': 'cervical',
+        'data': 'machine_learning/data/Cervical_Cancer_last.csv',
+        'state': 'States_and_territories', 'location': None, 'year': 'Year', 'age': 'Age',
+        'per_state': None,
+    },
+    'breast': {
+        'model': 'breast',
+        'data': 'machine_learning/data/Breast_Cancer_Participants.csv',
+        'state': 'State_and_territory', 'location': 'SA3_name', 'year': 'Year', 'age': 'Age_group',
+        'per_state': 'sum',
+    },
+    'bowel': {
+        'model': 'bowel',
+        'data': 'machine_learning/data/Bowel_Cancer1.csv',
+        'state': 'State_and_territory', 'location': 'SA3_name', 'year': 'Year', 'age': None,
+        'per_state': 'mean',
+    },
+}
+
+_lock = threading.Lock()
+_stats = {}
+
+
+def future_years(program):
+    spec = PROGRAMS[program]
+    current_max_year = int(load_dataset(spec['data'])[spec['year']].max())
+    return list(range(current_max_year + 1, current_max_year + FUTURE_YEARS + 1))
+
+
+# (state, SA3) pairs of the training data for SA3 programs, or (state,) for state programs.
+# `include` adds locations the data does not pair up, such as an SA3 picked with another state.
+def locations(program, states=None, sa3s=None, include=()):
+    spec = PROGRAMS[program]
+    columns = [spec['state']] + ([spec['location']] if spec['location'] else [])
+    pairs = load_dataset(spec['data'])[columns].drop_duplicates()
+    if states is not None:
+        pairs = pairs[pairs[spec['state']].isin(states)]
+    if sa3s is not None and spec['location']:
+        pairs = pairs[pairs[spec['location']].isin(sa3s)]
+    places = [tuple(row) for row in pairs.sort_values(columns).itertuples(index=False)]
+    return places + [tuple(place) for place in include if tuple(place) not in set(places)]
+
+
+# Model input rows for every combination of location, year and age group. Values are plain
+# Python strings and ints, the same types as the one-row DataFrames the pages used to build.
+def scenario_grid(program, states=None, sa3s=None, years=None, age_groups=None, include=()):
+    spec = PROGRAMS[program]
+    years = future_years(program) if years is None else list(years)
+    places = locations(program, states, sa3s, include)
+    location_columns = [spec['state']] + ([spec['location']] if spec['location'] else [])
+    if spec['age'] is None:
+        rows = [place + (year,) for place, year in itertools.product(places, years)]
+        columns = location_columns + [spec['year']]
+    else:
+        if age_groups is None:
+            age_groups = sorted(str(age) for age in load_dataset(spec['data'])[spec['age']].unique())
+        rows = [place + (year, age) for place, year, age in itertools.product(places, years, age_groups)]
+        columns = location_columns + [spec['year'], spec['age']]
+    grid = pd.DataFrame(rows, columns=columns)
+    for column in location_columns + ([spec['age']] if spec['age'] else []):
+        grid[column] = grid[column].astype(str).astype(object)
+    grid[spec['year']] = grid[spec['year']].astype(int)
+    return grid
+
+
+# Scores the scenario grid with one predict call. Returns the grid with a 'Prediction' column and
+# the seconds the predict call took.
+def predict_batch(program, states=None, sa3s=None, years=None, age_groups=None, include=()):
+    grid = scenario_grid(program, states, sa3s, years, age_groups, include)
+    model = get_model(PROGRAMS[program]['model'])
+    start = time.perf_counter()
+    predictions = model.predict(grid)
+    seconds = time.perf_counter() - start
+    grid['Prediction'] = predictions
+    _record(program, len(grid), seconds)
+    return grid, seconds
+
+
+# One value per state for `year`, combining the SA3 predictions of SA3 programs
+def per_state(program, predictions, year):
+    spec = PROGRAMS[program]
+    rows = predictions[predictions[spec['year']] == year]
+    if spec['per_state'] is None:
+        return rows.groupby(spec['state'], sort=True)['Prediction'].mean()
+    return rows.groupby(spec['state'], sort=True)['Prediction'].agg(spec['per_state'])
+
+
+def _record(program, rows, seconds):
+    with _lock:
+        stats = _stats.setdefault(program, {'batches': 0, 'rows': 0, 'seconds': 0.0, 'last_ms': 0.0, 'max_ms': 0.0})
+        stats['batches'] += 1
+        stats['rows'] += rows
+        stats['seconds'] += seconds
+        stats['last_ms'] = seconds * 1000
+        stats['max_ms'] = max(stats['max_ms'], seconds * 1000)
+
+
+# Batches, rows and predict latency per program, for the Diagnostics expander
+def batch_stats():
+    with _lock:
+        return [
+            dict(program=program, mean_ms=stats['seconds'] / stats['batches'] * 1000,
+                 **{name: value for name, value in stats.items() if name != 'seconds'})
+            for program, stats in _stats.items()
+        ]
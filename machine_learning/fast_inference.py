@@ -0,0 +1,186 @@
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder
+
+from common.datasets import dataset_version
+from machine_learning.flat_forest import flatten, load_shared
+from machine_learning.model_registry import MODELS, SHARED_MODELS, get_model
+
+# Inference fast path for the saved prediction pipelines.
+# The pipelines one-hot encode a few categorical inputs and feed the result to a random forest or
+# to XGBoost. Going through pipeline.predict costs milliseconds even for one row: a DataFrame is
+# validated, the ColumnTransformer runs one encoder per column, and the forest dispatches every
+# tree through joblib. FastPipeline reads the encoders once and keeps, for every input column, the
+# feature position each category switches on. A row's feature vector is then assembled directly
+# in a NumPy array and handed to the trees.
+#
+# The results are bit-identical to pipeline.predict:
+# - the forest adds its trees' predictions in estimator order into a float64 sum and divides by
+#   the number of trees, as RandomForestRegressor.predict does with its default single job;
+# - XGBoost gets NaN where the pipeline's sparse output has no entry, which it treats as missing
+#   in the same way.
+#
+# XGBoost predicts with XGBOOST_NTHREAD threads (default 1, 0 for one per core), on its own copy of
+# the booster. Its default of one thread per core would have every session's prediction compete
+# with the other sessions' threads for the same cores.
+
+# Batches up to this many rows go through the flattened forest (machine_learning/flat_forest.py),
+# larger ones through scikit-learn's per-tree loop, which is faster from a few dozen rows on
+FLAT_FOREST_MAX_ROWS = 32
+XGBOOST_NTHREAD = int(os.environ.get('XGBOOST_NTHREAD', '1'))
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_fast_pipelines = {}
+
+
+class FastPipeline:
+    def __init__(self, pipeline, nthread=XGBOOST_NTHREAD):
+        if not isinstance(pipeline, Pipeline) or len(pipeline.steps) != 2:
+            raise ValueError("only (preprocessor, regressor) pipelines have a fast path")
+        self._read_encoders(pipeline.steps[0][1])
+        regressor = pipeline.steps[1][1]
+        if isinstance(regressor, RandomForestRegressor) and regressor.n_outputs_ == 1:
+            self.kind = 'forest'
+            self.trees = [estimator.tree_ for estimator in regressor.estimators_]
+            self.flat_forest = flatten(regressor)
+        elif type(regressor).__name__ == 'XGBRegressor':
+            self.kind = 'xgboost'
+            self.booster = regressor.get_booster().copy()
+            self.booster.set_param({'nthread': nthread})
+            self.missing = regressor.missing
+            # Same trees as XGBRegressor.predict uses (all of them unless it was early-stopped)
+            self.iteration_range = regressor._get_iteration_range(None)
+        else:
+            raise ValueError(f"no fast path for {type(regressor).__name__}")
+        # What the encoded matrix holds for the features a row does not switch on
+        self.absent = 0.0 if self.kind == 'forest' else np.nan
+
+    # Fast path over the memory-mapped preprocessing steps and trees written by
+    # machine_learning/flat_forest.py; every batch is scored by the flattened trees
+    @classmethod
+    def shared(cls, preprocessor, flat_forest):
+        if not isinstance(preprocessor, Pipeline) or len(preprocessor.steps) != 1:
+            raise ValueError("only (preprocessor, regressor) pipelines have a fast path")
+        fast = cls.__new__(cls)
+        fast._read_encoders(preprocessor.steps[0][1])
+        fast.kind = 'flat'
+        fast.flat_forest = flat_forest
+        fast.absent = 0.0 if flat_forest.base_score is None else np.nan
+        return fast
+
+    def _read_encoders(self, preprocessor):
+        if preprocessor.remainder != 'drop':
+            raise ValueError("the preprocessor must drop the columns it does not encode")
+
+        self.columns = list(preprocessor.feature_names_in_)
+        self.n_features = sum(indices.stop - indices.start for indices in preprocessor.output_indices_.values())
+        # column -> {category: feature position}, and column -> value imputed for missing inputs
+        self.encodings = {}
+        self.fill_values = {}
+        for name, transformer, columns in preprocessor.transformers_:
+            if name == 'remainder':
+                continue
+            steps = [step for _, step in transformer.steps] if isinstance(transformer, Pipeline) else [transformer]
+            encoder = steps[-1]
+            imputers = steps[:-1]
+            if (not isinstance(encoder, OneHotEncoder) or encoder.drop_idx_ is not None or
+                    encoder._infrequent_enabled or encoder.handle_unknown != 'ignore'):
+                raise ValueError(f"transformer {name!r} is not a plain one-hot encoder ignoring unknown values")
+            if any(not isinstance(imputer, SimpleImputer) or not _imputes_nan(imputer) for imputer in imputers):
+                raise ValueError(f"transformer {name!r} has steps other than a NaN imputer before its encoder")
+
+            position = preprocessor.output_indices_[name].start
+            for i, column in enumerate(columns):
+                categories = encoder.categories_[i]
+                self.encodings[column] = {_python_value(category): position + j for j, category in enumerate(categories)}
+                if imputers:
+                    self.fill_values[column] = _python_value(imputers[-1].statistics_[i])
+                position += len(categories)
+
+    # Feature positions switched on by `values` of `column`; -1 for categories the encoder ignores
+    def _positions(self, column, values):
+        encoding = self.encodings[column]
+        fill = self.fill_values.get(column)
+        if fill is not None:
+            values = [fill if value != value else value for value in values]
+        return np.fromiter((encoding.get(value, -1) for value in values), dtype=np.int64, count=len(values))
+
+    # Encoded feature matrix of the rows given as {column: values}, written to `out` when given (a
+    # float32 array of shape (rows, features))
+    def encode(self, columns, out=None):
+        n_rows = len(columns[self.columns[0]])
+        features = np.empty((n_rows, self.n_features), dtype=np.float32) if out is None else out
+        features.fill(self.absent)
+        rows = np.arange(n_rows)
+        for column in self.columns:
+            positions = self._positions(column, list(columns[column]))
+            known = positions >= 0
+            features[rows[known], positions[known]] = 1.0
+        return features
+
+    def predict_features(self, features):
+        if self.kind == 'flat' or (self.kind == 'forest' and features.shape[0] <= FLAT_FOREST_MAX_ROWS):
+            return self.flat_forest.predict(features)
+        if self.kind == 'forest':
+            predictions = np.zeros(features.shape[0], dtype=np.float64)
+            for tree in self.trees:
+                predictions += tree.predict(features)[:, 0]
+            predictions /= len(self.trees)
+            return predictions
+        return self.booster.inplace_predict(features, iteration_range=self.iteration_range,
+                                            missing=self.missing, validate_features=False)
+
+    # Same as pipeline.predict, for a DataFrame or a {column: values} mapping
+    def predict(self, rows):
+        if isinstance(rows, pd.DataFrame):
+            rows = {column: rows[column].tolist() for column in self.columns}
+        return self.predict_features(self.encode(rows))
+
+    def predict_one(self, **values):
+        return self.predict({column: [values[column]] for column in self.columns})[0]
+
+
+def _imputes_nan(imputer):
+    missing = imputer.missing_values
+    return isinstance(missing, float) and missing != missing
+
+
+def _python_value(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+# Fast path of the model registered under `name`, rebuilt when the artifact changes. None when the
+# pipeline has steps FastPipeline does not reproduce. With SHARED_MODELS it is built from the
+# memory-mapped flat form of the model, without unpickling the artifact in this process.
+def fast_pipeline(name):
+    version = dataset_version(MODELS[name])
+    with _lock:
+        cached = _fast_pipelines.get(name)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+    try:
+        fast = FastPipeline.shared(*load_shared(name)) if SHARED_MODELS else FastPipeline(get_model(name))
+    except ValueError as error:
+        logger.warning("No inference fast path for the %s model: %s", name, error)
+        fast = None
+    with _lock:
+        _fast_pipelines[name] = (version, fast)
+    return fast
+
+
+# Predictions of the model registered under `name` for `rows` (a DataFrame of its input columns),
+# through the fast path when there is one
+def predict(name, rows):
+    fast = fast_pipeline(name)
+    if fast is None:
+        return get_model(name).predict(rows)
+    return fast.predict(rows)
@@ -0,0 +1,325 @@
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+
+import numpy as np
+
+from common.datasets import dataset_version
+from common.single_flight import SingleFlight
+from machine_learning.model_registry import MODELS, model_available
+
+# Tree ensembles flattened into plain NumPy arrays.
+# flatten() copies every tree of a fitted RandomForestRegressor or XGBRegressor into one set of
+# contiguous node arrays (feature, threshold, left, right, value), numbered across the whole
+# ensemble. Leaves point to themselves, so FlatForest.predict moves the rows of a batch through all
+# trees at once, one level per step, for as many steps as the deepest tree, with a handful of NumPy
+# operations per step instead of a Python call per tree.
+#
+# Predictions are bit-identical to the model's own predict:
+# - thresholds are float32 and a row goes left when its value is <= the threshold. scikit-learn's
+#   float64 thresholds are rounded down to float32, which splits float32 inputs the same way, and
+#   XGBoost's "value < threshold" becomes "value <= the float32 just below the threshold";
+# - NaN goes the way the node's missing_left says (missing_go_to_left / default_left);
+# - a random forest sums its trees' leaf values in estimator order into float64 and divides by the
+#   number of trees; a booster starts from its base_score and adds its trees' leaf values in order
+#   in float32, as XGBoost does for reg:squarederror.
+#
+# The walk costs a few NumPy calls per level over every (tree, row) pair, so it beats scikit-learn's
+# per-tree compiled loop on small batches (a single row takes less than half the time) and loses on
+# large ones; benchmarks/flat_forest.py shows where they cross.
+#
+# export() saves a model as one .npy file per array plus its preprocessing steps, pickled without
+# compression, in machine_learning/flat_models/<model>/, tagged with the sha256 of the artifact it
+# was exported from. load_shared() opens them memory-mapped: the arrays are pages of the OS page
+# cache that every process serving the app shares, instead of trees each process unpickles into
+# its own memory. To export every model ahead of time:
+#
+#     python -m machine_learning.flat_forest
+
+FLAT_DIR = 'machine_learning/flat_models'
+ARRAYS = ['feature', 'threshold', 'left', 'right', 'missing_left', 'value', 'roots']
+PREPROCESSOR = 'preprocessor.joblib'
+# Rows walked at once; the walk keeps a few buffers of (trees x rows) entries, which stay in cache
+BLOCK_ROWS = 256
+
+_lock = threading.Lock()
+_shared = {}
+_flights = SingleFlight()
+
+
+class FlatForest:
+    # base_score is None for random forests (leaf values averaged) and the starting margin for
+    # boosters (leaf values added to it)
+    def __init__(self, arrays, n_features, max_depth, base_score=None, model_hash=None):
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+        self.n_features = n_features
+        self.max_depth = max_depth
+        self.base_score = base_score
+        self.model_hash = model_hash
+        self.n_trees = len(self.roots)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in ARRAYS)
+
+    def predict(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"expected rows of {self.n_features} features, got an array of shape {X.shape}")
+        predictions = np.empty(X.shape[0], dtype=self.value.dtype)
+        for start in range(0, X.shape[0], BLOCK_ROWS):
+            predictions[start:start + BLOCK_ROWS] = self._predict_block(X[start:start + BLOCK_ROWS])
+        return predictions
+
+    # Walks the (tree, row) pairs of a block one level per step, into preallocated buffers
+    def _predict_block(self, X):
+        n_rows = X.shape[0]
+        flat_X = X.ravel()
+        has_nan = bool(np.isnan(flat_X).any())
+        nodes = np.repeat(np.asarray(self.roots), n_rows)
+        row_offsets = np.tile(np.arange(n_rows, dtype=self.feature.dtype) * self.n_features, self.n_trees)
+        positions = np.empty_like(nodes)
+        values = np.empty(len(nodes), dtype=np.float32)
+        thresholds = np.empty(len(nodes), dtype=np.float32)
+        go_left = np.empty(len(nodes), dtype=bool)
+        left = np.empty_like(nodes)
+        for _ in range(self.max_depth):
+            np.take(self.feature, nodes, out=positions)
+            np.add(positions, row_offsets, out=positions)
+            np.take(flat_X, positions, out=values)
+            np.take(self.threshold, nodes, out=thresholds)
+            np.less_equal(values, thresholds, out=go_left)
+            if has_nan:
+                go_left = np.where(np.isnan(values), np.take(self.missing_left, nodes), go_left)
+            np.take(self.left, nodes, out=left)
+            np.take(self.right, nodes, out=nodes)
+            np.copyto(nodes, left, where=go_left)
+
+        leaf_values = np.take(self.value, nodes).reshape(self.n_trees, n_rows)
+        if self.base_score is None:
+            predictions = np.zeros(n_rows, dtype=np.float64)
+        else:
+            predictions = np.full(n_rows, self.base_score, dtype=np.float32)
+        for tree_values in leaf_values:
+            predictions += tree_values
+        if self.base_score is None:
+            predictions /= self.n_trees
+        return predictions
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for name in ARRAYS:
+            np.save(os.path.join(directory, f'{name}.npy'), getattr(self, name))
+        with open(os.path.join(directory, 'forest.json'), 'w') as f:
+            json.dump({'n_features': self.n_features, 'max_depth': self.max_depth, 'n_trees': self.n_trees,
+                       'base_score': None if self.base_score is None else float(self.base_score),
+                       'model_sha256': self.model_hash}, f)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        with open(os.path.join(directory, 'forest.json')) as f:
+            meta = json.load(f)
+        # Plain ndarray views of the mapped files: they still read the shared pages, without the
+        # overhead np.memmap adds to every array taken from them
+        arrays = {name: np.asarray(np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode))
+                  for name in ARRAYS}
+        base_score = None if meta['base_score'] is None else np.float32(meta['base_score'])
+        return cls(arrays, meta['n_features'], meta['max_depth'], base_score, meta['model_sha256'])
+
+
+# FlatForest of a fitted single-output RandomForestRegressor or XGBRegressor (or of a pipeline
+# ending in one)
+def flatten(model, model_hash=None):
+    if hasattr(model, 'steps'):
+        model = model.steps[-1][1]
+    if type(model).__name__ == 'XGBRegressor':
+        return _flatten_booster(model, model_hash)
+    if type(model).__name__ != 'RandomForestRegressor' or model.n_outputs_ != 1:
+        raise ValueError(f"only random forests and XGBoost regressors can be flattened, not {type(model).__name__}")
+    return _flatten_forest(model, model_hash)
+
+
+def _flatten_forest(forest, model_hash):
+    trees = [estimator.tree_ for estimator in forest.estimators_]
+    sizes = np.array([tree.node_count for tree in trees], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    index_type = np.int32 if sizes.sum() < 2 ** 31 else np.int64
+
+    parts = {name: [] for name in ARRAYS if name != 'roots'}
+    for tree, offset in zip(trees, offsets):
+        nodes = np.arange(tree.node_count, dtype=np.int64) + offset
+        leaf = tree.children_left < 0
+        parts['feature'].append(np.where(leaf, 0, tree.feature))
+        parts['threshold'].append(_round_down(np.where(leaf, np.inf, tree.threshold)))
+        parts['left'].append(np.where(leaf, nodes, tree.children_left + offset))
+        parts['right'].append(np.where(leaf, nodes, tree.children_right + offset))
+        parts['missing_left'].append(tree.missing_go_to_left.astype(bool))
+        parts['value'].append(tree.value[:, 0, 0])
+
+    arrays = {
+        'feature': np.concatenate(parts['feature']).astype(index_type),
+        'threshold': np.concatenate(parts['threshold']),
+        'left': np.concatenate(parts['left']).astype(index_type),
+        'right': np.concatenate(parts['right']).astype(index_type),
+        'missing_left': np.concatenate(parts['missing_left']),
+        'value': np.concatenate(parts['value']).astype(np.float64),
+        'roots': offsets.astype(index_type),
+    }
+    max_depth = max(tree.max_depth for tree in trees)
+    return FlatForest(arrays, forest.n_features_in_, max_depth, None, model_hash)
+
+
+# Trees of an XGBRegressor, read from the booster's JSON model
+def _flatten_booster(regressor, model_hash):
+    learner = json.loads(regressor.get_booster().save_raw('json'))['learner']
+    booster = learner['gradient_booster']
+    if (booster['name'] != 'gbtree' or learner['objective']['name'] != 'reg:squarederror' or
+            int(learner['learner_model_param']['num_target']) != 1):
+        raise ValueError("only single-target reg:squarederror tree boosters can be flattened")
+    # The trees XGBRegressor.predict uses (all of them unless it was early-stopped)
+    begin, end = regressor._get_iteration_range(None)
+    trees_per_round = int(booster['model']['gbtree_model_param']['num_parallel_tree'])
+    trees = booster['model']['trees'][begin * trees_per_round:end * trees_per_round or None]
+    if any(any(tree['split_type']) for tree in trees):
+        raise ValueError("boosters with categorical splits cannot be flattened")
+
+    parts = {name: [] for name in ARRAYS}
+    offset = 0
+    max_depth = 0
+    for tree in trees:
+        left = np.array(tree['left_children'], dtype=np.int64)
+        right = np.array(tree['right_children'], dtype=np.int64)
+        conditions = np.array(tree['split_conditions'], dtype=np.float32)
+        nodes = np.arange(len(left), dtype=np.int64) + offset
+        leaf = left < 0
+        parts['roots'].append(offset)
+        parts['feature'].append(np.where(leaf, 0, tree['split_indices']))
+        parts['threshold'].append(np.where(leaf, np.inf, np.nextafter(conditions, np.float32(-np.inf))).astype(np.float32))
+        parts['left'].append(np.where(leaf, nodes, left + offset))
+        parts['right'].append(np.where(leaf, nodes, right + offset))
+        parts['missing_left'].append(np.array(tree['default_left'], dtype=bool))
+        # Leaves keep their value where split nodes keep their threshold
+        parts['value'].append(np.where(leaf, conditions, 0).astype(np.float32))
+        max_depth = max(max_depth, _depth(left, right))
+        offset += len(left)
+
+    index_type = np.int32 if offset < 2 ** 31 else np.int64
+    arrays = {name: np.concatenate(values) if name != 'roots' else np.array(values) for name, values in parts.items()}
+    for name in ('feature', 'left', 'right', 'roots'):
+        arrays[name] = arrays[name].astype(index_type)
+    n_features = int(learner['learner_model_param']['num_feature'])
+    base_score = np.float32(float(learner['learner_model_param']['base_score']))
+    return FlatForest(arrays, n_features, max_depth, base_score, model_hash)
+
+
+def _depth(left, right):
+    depth = 0
+    level = [0]
+    while True:
+        level = [child for node in level if left[node] >= 0 for child in (left[node], right[node])]
+        if not level:
+            return depth
+        depth += 1
+
+
+# float32 thresholds that split float32 inputs exactly as the float64 ones do: each threshold is
+# rounded down to the largest float32 not above it
+def _round_down(thresholds):
+    rounded = thresholds.astype(np.float32)
+    above = rounded.astype(np.float64) > thresholds
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+def flat_path(name):
+    return os.path.join(FLAT_DIR, name)
+
+
+# Writes the flat form of the model registered under `name`: its trees, and its preprocessing steps
+# pickled uncompressed. The artifact is unpickled here rather than through the registry, so the
+# exporting process does not keep a private copy of the trees afterwards.
+def export(name):
+    from joblib import dump, load
+
+    model_hash = dataset_version(MODELS[name])
+    pipeline = load(MODELS[name])
+    forest = flatten(pipeline, model_hash)
+    # Written to a temporary directory and renamed, so a reader never sees half a model. Processes
+    # still mapping the files of the directory replaced keep reading them until they reload.
+    temporary = f'{flat_path(name)}.{os.getpid()}.tmp'
+    shutil.rmtree(temporary, ignore_errors=True)
+    forest.save(temporary)
+    if hasattr(pipeline, 'steps'):
+        dump(pipeline[:-1], os.path.join(temporary, PREPROCESSOR), compress=0)
+    shutil.rmtree(flat_path(name), ignore_errors=True)
+    os.replace(temporary, flat_path(name))
+    return forest
+
+
+def _read_shared(name, model_hash):
+    from joblib import load
+
+    try:
+        forest = FlatForest.load(flat_path(name))
+        if forest.model_hash != model_hash:
+            return None
+        preprocessor_path = os.path.join(flat_path(name), PREPROCESSOR)
+        preprocessor = load(preprocessor_path, mmap_mode='r') if os.path.exists(preprocessor_path) else None
+    except (OSError, ValueError, KeyError):
+        return None
+    return preprocessor, forest
+
+
+# (preprocessing steps, flattened trees) of the model registered under `name`, memory-mapped from
+# disk, or exported again when the artifact changed since it was written
+def load_shared(name):
+    model_hash = dataset_version(MODELS[name])
+    with _lock:
+        shared = _shared.get(name)
+        if shared is not None and shared[1].model_hash == model_hash:
+            return shared
+
+    def load():
+        with _lock:
+            shared = _shared.get(name)
+            if shared is not None and shared[1].model_hash == model_hash:
+                return shared
+        shared = _read_shared(name, model_hash)
+        if shared is None:
+            export(name)
+            shared = _read_shared(name, model_hash)
+        with _lock:
+            _shared[name] = shared
+        return shared
+
+    return _flights.do((name, model_hash), load)
+
+
+def load_flat_forest(name):
+    return load_shared(name)[1]
+
+
+def main():
+    failures = 0
+    for name, path in MODELS.items():
+        if not model_available(name):
+            failures += 1
+            print(f"{name:>9}: model artifact {path} is missing, not exported")
+            continue
+        start = time.perf_counter()
+        try:
+            forest = export(name)
+        except ValueError as error:
+            print(f"{name:>9}: {error}")
+            continue
+        print(f"{name:>9}: {forest.n_trees} trees, {len(forest.value):,} nodes, depth {forest.max_depth} in "
+              f"{time.perf_counter() - start:.2f}s -> {flat_path(name)} ({forest.nbytes:,} bytes)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+import hashlib
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from common.datasets import dataset_version, load_derived
+from common.single_flight import SingleFlight
+from machine_learning.batch_prediction import PROGRAMS, future_years, scenario_grid
+from machine_learning import inference_pool
+from machine_learning.model_registry import MODELS, model_available
+
+# Materialized forecasts of the prediction models.
+# Every model input is categorical and finite (state, SA3, one of the ten future years, age group),
+# so a program's whole prediction space is enumerated once and stored in
+# machine_learning/forecasts/<program>.parquet, tagged with the sha256 of the model artifact and of
+# the input vocabulary it was computed for. Rows are laid out in mixed-radix order over the
+# dimensions, so the prediction of a scenario is found by arithmetic on the positions of its values
+# rather than by searching or by running the model.
+#
+# load_forecasts() rebuilds the file when the model or the vocabulary no longer match its tags.
+# To build every grid ahead of time:
+#
+#     python -m machine_learning.forecast_grid
+
+FORECAST_DIR = 'machine_learning/forecasts'
+MODEL_HASH_KEY = b'forecast_model_sha256'
+VOCABULARY_HASH_KEY = b'forecast_vocabulary_sha256'
+DIMENSIONS_KEY = b'forecast_dimensions'
+
+_lock = threading.Lock()
+_grids = {}
+_flights = SingleFlight()
+_stats = {'hits': 0, 'file_reads': 0, 'builds': 0, 'lookups': 0, 'fallback_rows': 0}
+
+
+def forecast_path(program):
+    return os.path.join(FORECAST_DIR, f'{program}.parquet')
+
+
+# [(column, values)] of a program's inputs, in the order the grid is laid out. Derived from the
+# program's data file, so it is only worked out again when that file changes.
+def vocabulary(program):
+    return load_derived('forecast_vocabulary', PROGRAMS[program]['data'], lambda data: _vocabulary(program, data))
+
+
+def _vocabulary(program, data):
+    spec = PROGRAMS[program]
+    dimensions = [(spec['state'], sorted(str(value) for value in data[spec['state']].unique()))]
+    if spec['location']:
+        dimensions.append((spec['location'], sorted(str(value) for value in data[spec['location']].unique())))
+    dimensions.append((spec['year'], future_years(program)))
+    if spec['age']:
+        dimensions.append((spec['age'], sorted(str(value) for value in data[spec['age']].unique())))
+    return dimensions
+
+
+def vocabulary_hash(dimensions):
+    return hashlib.sha256(json.dumps(dimensions).encode()).hexdigest()
+
+
+class ForecastGrid:
+    def __init__(self, program, dimensions, predictions, model_hash):
+        self.program = program
+        self.dimensions = dimensions
+        self.columns = [column for column, _ in dimensions]
+        self.shape = tuple(len(values) for _, values in dimensions)
+        self.positions = [{value: i for i, value in enumerate(values)} for _, values in dimensions]
+        self.predictions = predictions
+        self.model_hash = model_hash
+        self.vocabulary_hash = vocabulary_hash(dimensions)
+
+    # Every scenario of the grid as model input rows, in grid order
+    @staticmethod
+    def scenarios(dimensions):
+        rows = list(itertools.product(*[values for _, values in dimensions]))
+        frame = pd.DataFrame(rows, columns=[column for column, _ in dimensions])
+        for column in frame.columns:
+            frame[column] = frame[column].astype(object) if frame[column].dtype == object else frame[column].astype(int)
+        return frame
+
+    # Prediction of one scenario, given as {column: value}; None outside the vocabulary
+    def lookup(self, **values):
+        offset = 0
+        for column, size, positions in zip(self.columns, self.shape, self.positions):
+            position = positions.get(values[column])
+            if position is None:
+                return None
+            offset = offset * size + position
+        with _lock:
+            _stats['lookups'] += 1
+        return self.predictions[offset]
+
+    # Predictions of every row of `frame` (which has the grid's columns), NaN outside the vocabulary
+    def lookup_frame(self, frame):
+        codes = []
+        for column, (_, values) in zip(self.columns, self.dimensions):
+            codes.append(pd.Categorical(frame[column], categories=values).codes.astype(np.int64))
+        known = np.all(np.stack(codes) >= 0, axis=0) if codes else np.ones(len(frame), dtype=bool)
+        result = np.full(len(frame), np.nan, dtype=self.predictions.dtype)
+        offsets = np.ravel_multi_index([code[known] for code in codes], self.shape)
+        result[known] = self.predictions[offsets]
+        with _lock:
+            _stats['lookups'] += len(frame)
+        return result, known
+
+
+def _read_grid(program, model_hash, vocabulary_digest):
+    path = forecast_path(program)
+    if not os.path.exists(path):
+        return None
+    metadata = pq.read_schema(path).metadata or {}
+    if (metadata.get(MODEL_HASH_KEY, b'').decode() != model_hash or
+            metadata.get(VOCABULARY_HASH_KEY, b'').decode() != vocabulary_digest):
+        return None
+    dimensions = [tuple(dimension) for dimension in json.loads(metadata[DIMENSIONS_KEY])]
+    predictions = pq.read_table(path, columns=['Prediction']).column('Prediction').to_numpy()
+    with _lock:
+        _stats['file_reads'] += 1
+    return ForecastGrid(program, dimensions, predictions, model_hash)
+
+
+def build_grid(program, dimensions=None, model_hash=None):
+    dimensions = dimensions or vocabulary(program)
+    model_path = MODELS[PROGRAMS[program]['model']]
+    model_hash = model_hash or dataset_version(model_path)
+    scenarios = ForecastGrid.scenarios(dimensions)
+    predictions = np.asarray(inference_pool.predict(PROGRAMS[program]['model'], scenarios))
+    grid = ForecastGrid(program, dimensions, predictions, model_hash)
+
+    # Scenario columns are written dictionary encoded, so the file stays small and readable
+    table = pa.Table.from_pandas(scenarios.assign(**{
+        column: scenarios[column].astype('category') for column in scenarios.columns if scenarios[column].dtype == object
+    }, Prediction=predictions), preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        MODEL_HASH_KEY: model_hash.encode(),
+        VOCABULARY_HASH_KEY: grid.vocabulary_hash.encode(),
+        DIMENSIONS_KEY: json.dumps(dimensions).encode(),
+    })
+    os.makedirs(FORECAST_DIR, exist_ok=True)
+    # Written under a temporary name and renamed, so a reader never sees half a file
+    temporary = forecast_path(program) + f'.{os.getpid()}.tmp'
+    pq.write_table(table, temporary)
+    os.replace(temporary, forecast_path(program))
+    with _lock:
+        _stats['builds'] += 1
+    return grid
+
+
+# Forecast grid of a program, read from disk or rebuilt when the model artifact or the input
+# vocabulary changed since it was written
+def load_forecasts(program):
+    model_hash = dataset_version(MODELS[PROGRAMS[program]['model']])
+    dimensions = vocabulary(program)
+    vocabulary_digest = vocabulary_hash(dimensions)
+    with _lock:
+        grid = _grids.get(program)
+        if grid is not None and grid.model_hash == model_hash and grid.vocabulary_hash == vocabulary_digest:
+            _stats['hits'] += 1
+            return grid
+
+    def load():
+        with _lock:
+            grid = _grids.get(program)
+            if grid is not None and grid.model_hash == model_hash and grid.vocabulary_hash == vocabulary_digest:
+                return grid
+        grid = _read_grid(program, model_hash, vocabulary_digest) or build_grid(program, dimensions, model_hash)
+        with _lock:
+            _grids[program] = grid
+        return grid
+
+    return _flights.do((program, model_hash, vocabulary_digest), load)
+
+
+# Same as predict_batch, answered from the forecast grid. Scenarios outside the grid's vocabulary
+# are scored by the model. Returns the scenarios with a 'Prediction' column and the lookup seconds.
+def forecast_batch(program, states=None, sa3s=None, years=None, age_groups=None, include=()):
+    grid = scenario_grid(program, states, sa3s, years, age_groups, include)
+    forecasts = load_forecasts(program)
+    start = time.perf_counter()
+    predictions, known = forecasts.lookup_frame(grid)
+    if not known.all():
+        predictions[~known] = inference_pool.predict(PROGRAMS[program]['model'], grid[~known].reset_index(drop=True))
+        with _lock:
+            _stats['fallback_rows'] += int((~known).sum())
+    seconds = time.perf_counter() - start
+    grid['Prediction'] = predictions
+    return grid, seconds
+
+
+def forecast_stats():
+    with _lock:
+        grids = [{'program': program, 'scenarios': len(grid.predictions), 'model_sha256': grid.model_hash[:12],
+                  'vocabulary_sha256': grid.vocabulary_hash[:12]} for program, grid in _grids.items()]
+        return dict(_stats, grids=grids)
+
+
+def main():
+    failures = 0
+    for program, spec in PROGRAMS.items():
+        if not model_available(spec['model']):
+            failures += 1
+            print(f"{program:>9}: model artifact {MODELS[spec['model']]} is missing, not built")
+            continue
+        start = time.perf_counter()
+        grid = build_grid(program)
+        print(f"{program:>9}: {len(grid.predictions):,} scenarios in {time.perf_counter() - start:.2f}s "
+              f"-> {forecast_path(program)} ({os.path.getsize(forecast_path(program)):,} bytes)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
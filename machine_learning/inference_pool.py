@@ -0,0 +1,187 @@
+import collections
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+# Process pool the prediction pages score their models in.
+# Scoring inline would run in the session's script thread and hold the GIL while the trees walk a
+# batch, stalling every other session's rerun meanwhile. Instead a page submits the rows and gets
+# a future; its thread waits on it without holding the GIL while a worker process does the work.
+#
+# - INFERENCE_WORKERS processes (default 0, which scores inline in the calling thread), each
+#   loading the models once (through machine_learning/fast_inference.py, so SHARED_MODELS=1 applies
+#   to them too). They are started with 'spawn', as forking a server with threads running is
+#   unsafe; a spawned worker imports the main script again, which fails every request of a script
+#   whose entry point is not under `if __name__ == "__main__":`. app.py and the command line tools
+#   have that guard, so set INFERENCE_WORKERS for them only;
+# - at most INFERENCE_QUEUE_DEPTH requests queued or running at once (default 8). Past that,
+#   submit() raises InferenceBusy straight away rather than letting requests pile up;
+# - a request not answered within INFERENCE_TIMEOUT seconds (default 30) raises TimeoutError in
+#   the page. The worker still finishes it, and it keeps its place in the queue until it does.
+#
+# inference_stats() reports how long requests waited for a worker and how long they computed.
+
+INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', '0'))
+INFERENCE_QUEUE_DEPTH = int(os.environ.get('INFERENCE_QUEUE_DEPTH', '8'))
+INFERENCE_TIMEOUT = float(os.environ.get('INFERENCE_TIMEOUT', '30'))
+# Requests kept for the latency percentiles
+SAMPLES = 1000
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_executor = None
+_started = False
+_slots = threading.BoundedSemaphore(max(INFERENCE_QUEUE_DEPTH, 1))
+_stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'rejected': 0, 'timeouts': 0, 'in_flight': 0,
+          'max_in_flight': 0}
+_samples = {'queue_wait': collections.deque(maxlen=SAMPLES), 'compute': collections.deque(maxlen=SAMPLES)}
+
+
+class InferenceBusy(RuntimeError):
+    pass
+
+
+def enabled():
+    return INFERENCE_WORKERS > 0
+
+
+# Runs in a worker: loads the fast path of every available model
+def _warm_up():
+    from machine_learning.fast_inference import fast_pipeline
+    from machine_learning.model_registry import MODELS, model_available
+
+    for name in MODELS:
+        if model_available(name):
+            fast_pipeline(name)
+
+
+# Runs in a worker: scores `rows`, returning when it started (wall clock, comparable with the
+# submitting process) and how long it computed
+def _score(name, rows):
+    started = time.time()
+    start = time.perf_counter()
+    from machine_learning.fast_inference import predict
+
+    predictions = predict(name, rows)
+    return predictions, started, time.perf_counter() - start
+
+
+def _pool():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=INFERENCE_WORKERS, mp_context=multiprocessing.get_context('spawn'), initializer=_warm_up)
+        return _executor
+
+
+def _reset_pool(broken):
+    global _executor
+    with _lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+# Future of the predictions of the model registered under `name` for `rows` (a DataFrame of its
+# input columns). Raises InferenceBusy when INFERENCE_QUEUE_DEPTH requests are already waiting.
+def submit(name, rows):
+    if not _slots.acquire(blocking=False):
+        with _lock:
+            _stats['rejected'] += 1
+        raise InferenceBusy(f"the inference pool already has {INFERENCE_QUEUE_DEPTH} requests queued, try again shortly")
+    with _lock:
+        _stats['submitted'] += 1
+        _stats['in_flight'] += 1
+        _stats['max_in_flight'] = max(_stats['max_in_flight'], _stats['in_flight'])
+
+    submitted = time.time()
+    result = concurrent.futures.Future()
+
+    def finish(future):
+        _slots.release()
+        with _lock:
+            _stats['in_flight'] -= 1
+            if future.exception() is not None:
+                _stats['failed'] += 1
+            else:
+                _stats['completed'] += 1
+                predictions, started, compute = future.result()
+                _samples['queue_wait'].append(max(started - submitted, 0.0))
+                _samples['compute'].append(compute)
+        if future.exception() is not None:
+            result.set_exception(future.exception())
+        else:
+            result.set_result(future.result()[0])
+
+    try:
+        if not enabled():
+            future = concurrent.futures.Future()
+            future.set_result(_score(name, rows))
+        else:
+            executor = _pool()
+            try:
+                future = executor.submit(_score, name, rows)
+            except concurrent.futures.process.BrokenProcessPool:
+                logger.warning("The inference pool lost a worker; starting a new one")
+                _reset_pool(executor)
+                future = _pool().submit(_score, name, rows)
+    except BaseException as error:
+        future = concurrent.futures.Future()
+        future.set_exception(error)
+    future.add_done_callback(finish)
+    return result
+
+
+# Predictions of the model registered under `name` for `rows`, computed in the pool and waited for
+# up to INFERENCE_TIMEOUT seconds
+def predict(name, rows, timeout=None):
+    timeout = INFERENCE_TIMEOUT if timeout is None else timeout
+    future = submit(name, rows)
+    try:
+        return future.result(timeout=timeout)
+    except concurrent.futures.TimeoutError:
+        with _lock:
+            _stats['timeouts'] += 1
+        raise TimeoutError(f"the {name} model did not answer within {timeout:g}s")
+
+
+# Once per process: starts the workers and has them load the models before the first request
+def start():
+    global _started
+    with _lock:
+        if _started or not enabled():
+            return
+        _started = True
+    executor = _pool()
+    for _ in range(INFERENCE_WORKERS):
+        executor.submit(_warm_up)
+
+
+def _percentiles(samples):
+    ordered = sorted(samples)
+    if not ordered:
+        return {'p50_ms': None, 'p99_ms': None, 'max_ms': None}
+    return {'p50_ms': ordered[len(ordered) // 2] * 1000,
+            'p99_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+            'max_ms': ordered[-1] * 1000}
+
+
+# Requests, rejections, timeouts and queue wait against compute time, for the Diagnostics expander
+def inference_stats():
+    with _lock:
+        return dict(_stats, workers=INFERENCE_WORKERS, queue_depth=INFERENCE_QUEUE_DEPTH, timeout_s=INFERENCE_TIMEOUT,
+                    queue_wait=_percentiles(_samples['queue_wait']), compute=_percentiles(_samples['compute']))
+
+
+def reset_inference_stats():
+    with _lock:
+        for name in _stats:
+            if name != 'in_flight':
+                _stats[name] = 0
+        for samples in _samples.values():
+            samples.clear()
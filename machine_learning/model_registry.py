@@ -0,0 +1,155 @@
+import logging
+import os
+import threading
+import time
+
+from common.datasets import dataset_version
+from common.single_flight import SingleFlight
+
+# Process-wide registry of the fitted models behind the prediction pages.
+# Each artifact is unpickled once, lazily on first use, and shared by every session (predicting does
+# not modify a fitted pipeline); it is only reloaded when the file's content changes. Concurrent
+# first loads of the same artifact are single-flighted, so a burst of sessions after a restart
+# loads it once.
+#
+# start() is called by the app when the server starts: it reports artifacts that are missing and,
+# unless MODEL_WARM_UP=0, loads the others in a background thread before anyone asks for them.
+#
+# With SHARED_MODELS=1 the prediction pages score through the memory-mapped flat form of each model
+# (machine_learning/flat_forest.py) instead of an unpickled copy, so several server processes on one
+# machine share the trees through the OS page cache; warm-up then opens those files instead.
+
+MODELS = {
+    'cervical': 'machine_learning/models_joblib/cervical_RandomForestR_pipeline.joblib',
+    'breast': 'machine_learning/models_joblib/Breast_Cancer_Participants_XGBRegressor.joblib',
+    'bowel': 'machine_learning/models_joblib/Bowel_Cancer_RandomForestR_1.joblib',
+}
+
+MODEL_WARM_UP = os.environ.get('MODEL_WARM_UP', '1') != '0'
+SHARED_MODELS = os.environ.get('SHARED_MODELS', '0') == '1'
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_models = {}
+_flights = SingleFlight()
+_stats = {'hits': 0, 'misses': 0, 'loads': 0}
+_started = False
+
+
+class _LoadedModel:
+    def __init__(self, model, content_hash, size, seconds):
+        self.model = model
+        self.content_hash = content_hash
+        self.size = size
+        self.seconds = seconds
+
+
+def missing_artifacts():
+    return {name: path for name, path in MODELS.items() if not os.path.exists(path)}
+
+
+def model_available(name):
+    return os.path.exists(MODELS[name])
+
+
+def load_model(path):
+    path = os.path.normpath(path)
+    version = dataset_version(path)
+    with _lock:
+        cached = _models.get(path)
+        if cached is not None and cached.content_hash == version:
+            _stats['hits'] += 1
+            return cached.model
+        _stats['misses'] += 1
+    return _flights.do((path, version), lambda: _load(path, version))
+
+
+# Model registered under `name` (see MODELS)
+def get_model(name):
+    return load_model(MODELS[name])
+
+
+def _load(path, version):
+    with _lock:
+        cached = _models.get(path)
+        if cached is not None and cached.content_hash == version:
+            return cached.model
+    # Imported here so the app can start the registry without paying for joblib on the Home page
+    from joblib import load
+
+    start = time.perf_counter()
+    model = load(path)
+    seconds = time.perf_counter() - start
+    with _lock:
+        _stats['loads'] += 1
+        _models[path] = _LoadedModel(model, version, os.path.getsize(path), seconds)
+    logger.info("Loaded %s in %.2fs", path, seconds)
+    return model
+
+
+# Loads every available model that is not loaded yet. With background=True this happens in a
+# daemon thread, which is returned; sessions asking for a model meanwhile wait for that load.
+def warm_up(names=None, background=True):
+    names = [name for name in (names or MODELS) if model_available(name)]
+
+    def load_all():
+        # Imported here: the fast path is built on this registry
+        from machine_learning.fast_inference import fast_pipeline
+
+        for name in names:
+            try:
+                fast_pipeline(name) if SHARED_MODELS else get_model(name)
+            except Exception:
+                logger.exception("Could not warm up the %s model", name)
+
+    if not background:
+        load_all()
+        return None
+    thread = threading.Thread(target=load_all, name='model-warm-up', daemon=True)
+    thread.start()
+    return thread
+
+
+# Once per process: report missing artifacts and, unless warm is False, start warming up the rest
+def start(warm=True):
+    global _started
+    with _lock:
+        if _started:
+            return
+        _started = True
+    for name, path in missing_artifacts().items():
+        logger.warning("The %s model artifact %s is missing; its prediction page is disabled", name, path)
+    if MODEL_WARM_UP and warm:
+        warm_up()
+
+
+# One row per registered artifact, for the Diagnostics expander
+def registry_report():
+    rows = []
+    with _lock:
+        for name, path in MODELS.items():
+            loaded = _models.get(os.path.normpath(path))
+            rows.append({
+                'model': name,
+                'path': path,
+                'present': os.path.exists(path),
+                'loaded': loaded is not None,
+                'sha256': loaded.content_hash[:12] if loaded else None,
+                'bytes': loaded.size if loaded else None,
+                'load_seconds': round(loaded.seconds, 3) if loaded else None,
+            })
+    return rows
+
+
+def model_stats():
+    with _lock:
+        return dict(_stats, models=len(_models), single_flight=_flights.stats())
+
+
+def clear_models():
+    with _lock:
+        _models.clear()
+        for name in _stats:
+            _stats[name] = 0
+    _flights.reset_stats()
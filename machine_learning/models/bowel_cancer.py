@@ -1,25 +1,32 @@
 import streamlit as st
-import pandas as pd
-import pickle
-from joblib import load
-from sklearn.preprocessing import StandardScaler
-import pydeck as pdk
-import numpy as np
-import matplotlib.pyplot as plt
-import altair as alt
-import folium
-from sklearn.ensemble import RandomForestRegressor
-from folium.plugins import MarkerCluster
-from streamlit_folium import folium_static
+from common.datasets import load_dataset
+from common.geo_index import geo_index
+from machine_learning.batch_prediction import per_state
+from machine_learning.forecast_grid import forecast_batch, load_forecasts
+from machine_learning.model_registry import MODELS, model_available
+from machine_learning.prediction_charts import state_bar_chart, trajectory_chart
+from machine_learning.prediction_maps import show_prediction_map
 from machine_learning.models.bowel_cancer_inputvalues import bowelCan_input_values
 
+# Coordinates of every SA3 the prediction map can be centred on
+SA3_COORDINATES = 'machine_learning/data/Bowel_cancer.csv'
+
+# Reads (or builds) the forecast grid and the coordinate index ahead of the first visit, for the
+# prewarm CLI (python -m common.prewarm)
+def prewarm():
+    geo_index(SA3_COORDINATES, 'SA3_name')
+    if model_available('bowel'):
+        load_forecasts('bowel')
+
 def bowel_cancer(): 
-# Load your model
- model = load('machine_learning/models_joblib/Bowel_Cancer_RandomForestR_1.joblib')
+# Predictions need the model artifact
+ if not model_available('bowel'):
+     st.error(f"The bowel cancer model is not available: {MODELS['bowel']} is missing.")
+     return
 
 # Load your data
  
- df = pd.read_csv('machine_learning/data/Bowel_cancer1.csv')
+ df = load_dataset('machine_learning/data/Bowel_Cancer1.csv')
 
  bowelCan_input_values()
 
@@ -35,102 +42,42 @@ def bowel_cancer():
  year_options = sorted(list(set(future_years)))
  selected_year = st.selectbox("Year", options=year_options, key="year_selectbox3")
 
- # function to get the latitude and longitude against a given sa3 name
- def get_coordinates_for_sa3(sa3_name, csv_file_path):
-    # Read the CSV file containing SA3 names, longitude, and latitude
-    sa3_data1 = pd.read_csv(csv_file_path)
-    sa3_data = sa3_data1.drop_duplicates(subset=['SA3_name', 'Latitude', 'Longitude'])
-    
-    # Filter the DataFrame to get the row for the specified SA3 name
-    sa3_row = sa3_data[sa3_data['SA3_name'] == sa3_name]
-    
-    # If SA3 name not found, return None for latitude and longitude
-    if sa3_row.empty:
-        return None, None
-    
-    # Extract latitude and longitude from the DataFrame
-    latitude = sa3_row['Latitude'].values[0]
-    longitude = sa3_row['Longitude'].values[0]
-    
-    return latitude, longitude
-
-
 
 # Create a button to trigger prediction
  if st.button('Predict', key="predict_button3"):
     try:
-        # Create input features DataFrame
-        input_features = pd.DataFrame({
-            'State_and_territory': [selected_state1],
-            'SA3_name': [selected_SA3_name],
-            'Year': [selected_year]
-        })
-        
-
-        # Predict for the selected state, year, age, latitude, and longitude
-        prediction = model.predict(input_features)
-
+        # Look up every SA3 over the ten future years in the forecast grid
+        predictions, seconds = forecast_batch('bowel', include=[(selected_state1, selected_SA3_name)])
+        trajectory = predictions[(predictions['State_and_territory'] == selected_state1) &
+                                 (predictions['SA3_name'] == selected_SA3_name)]
+        selected_rows = trajectory[trajectory['Year'] == selected_year]
+        prediction = selected_rows['Prediction'].to_numpy()
 
         # Visualize predicted values on a map
-        predicted_df = input_features.copy()
+        predicted_df = selected_rows.drop(columns='Prediction')
         predicted_df['Prediction'] = prediction.astype(int)
 
         # Display the prediction
         st.write("Predicted Bowel Cancer Nos. participants:", predicted_df)
         
-        sa3_name = selected_SA3_name  # Specify the SA3 name you want to get coordinates for
-        csv_file_path = 'machine_learning/data/Bowel_cancer.csv'  # Specify the path to your CSV file
-        selected_lat, selected_long = get_coordinates_for_sa3(sa3_name, csv_file_path)
+        selected_lat, selected_long = geo_index(SA3_COORDINATES, 'SA3_name').coordinates(selected_SA3_name)
 
         # Create a map centered around the selected latitude and longitude
          
         #map = folium.Map(location=[selected_lat, selected_long], zoom_start=5)
          # Create the Folium map with a custom tile layer and attribution
-        map = folium.Map(
-             location=[selected_lat, selected_long],
-             zoom_start=6,
-             tiles='https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png',  # Example custom tile layer
-             attr='Map data &copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
-        )
-        # Add a marker for the selected state with the predicted value as tooltip
-        folium.Marker(
-            location=[selected_lat, selected_long],
-            popup=f"SA3 Name: {selected_SA3_name}<br>State: {selected_state1}<br>Predicted Nos. participants: {prediction.astype(int)}",
-            icon=folium.Icon(color='blue', icon='info-sign')
-        ).add_to(map)
-
-        # Display the map
-        folium_static(map) #display the map
+        # Marker on the SA3 with the prediction in its popup; the map's HTML is cached per SA3 and value
+        show_prediction_map('bowel', {'SA3 Name': selected_SA3_name, 'State': selected_state1}, selected_lat, selected_long,
+                            prediction[0], zoom=6)
 
         
-        def predict_graph(selected_state1 , prediction):
-       
-            # Define the state abbreviations
-              state_abbreviations = ['NSW', 'QLD', 'Vic', 'WA', 'NT', 'ACT', 'SA', 'Tas']
-
-            # Create the bar chart
-              fig, ax = plt.subplots()
-              bar_width = 0.1  # Adjust the bar width as needed
-
-            # Plot bars for all states
-              ax.bar(range(len(state_abbreviations)), prediction, width=bar_width, color='lightgrey')
-
-            # Move the bar to the selected state
-              selected_index = state_abbreviations.index(selected_state1)
-              selected_prediction_value = prediction  # Use the first (and only) prediction value
-              ax.bar(selected_index, selected_prediction_value, color='purple')
-
-            # Annotate the prediction value on the bar
-              ax.text(selected_index, selected_prediction_value, f'{prediction.astype(int)}', ha='center', va='bottom', color='blue', fontsize=8)
-
-              ax.set_xticks(range(len(state_abbreviations)))
-              ax.set_xticklabels(state_abbreviations, rotation=45, ha='right')
-              ax.set_ylabel('Cancer Screening Predicted Nos. participants')
-
-              st.pyplot(fig)
-
-       # Call the function with appropriate arguments after obtaining the prediction
-        predict_graph(selected_state1, prediction) # display the graph
+        # Predictions of every state (the mean of its SA3s), and the selected SA3 over the future years
+        st.pyplot(state_bar_chart(per_state('bowel', predictions, selected_year), selected_state1, 'purple',
+                                  'Cancer Screening Predicted Nos. participants'))
+        st.pyplot(trajectory_chart(trajectory['Year'], trajectory['Prediction'], selected_year, 'purple',
+                                   f'Predictions for {selected_SA3_name}, {selected_state1}',
+                                   'Cancer Screening Predicted Nos. participants'))
+        st.caption(f"{len(predictions)} scenarios looked up in the forecast grid in {seconds * 1000:.1f} ms")
 
 
 
@@ -1,10 +1,12 @@
 import streamlit as st
 import pandas as pd 
 
+from common.datasets import load_dataset
+
 
 def bowelCan_input_values():
     
-    df = pd.read_csv('machine_learning/data/Bowel_cancer.csv')
+    df = load_dataset('machine_learning/data/Bowel_cancer.csv')
     
     states = df["State_and_territory"].tolist()
     SA3_names = df["SA3_name"].tolist()
@@ -1,26 +1,33 @@
 import streamlit as st
-import pandas as pd
-import pickle
-from joblib import load
-from sklearn.preprocessing import StandardScaler
-import pydeck as pdk
-import numpy as np
-import matplotlib.pyplot as plt
-import altair as alt
-import folium
-from xgboost import XGBRegressor
-from folium.plugins import MarkerCluster
-from streamlit_folium import folium_static
+from common.datasets import load_dataset
+from common.geo_index import geo_index
+from machine_learning.batch_prediction import per_state
+from machine_learning.forecast_grid import forecast_batch, load_forecasts
+from machine_learning.model_registry import MODELS, model_available
+from machine_learning.prediction_charts import state_bar_chart, trajectory_chart
+from machine_learning.prediction_maps import show_prediction_map
 from machine_learning.models.breast_cancer_inputvalues import breastCan_input_values
 
+# Coordinates of every SA3 the prediction map can be centred on
+SA3_COORDINATES = 'machine_learning/data/cleaned_final_breastcancer__data1.csv'
+
+# Reads (or builds) the forecast grid and the coordinate index ahead of the first visit, for the
+# prewarm CLI (python -m common.prewarm)
+def prewarm():
+    geo_index(SA3_COORDINATES, 'SA3_name')
+    if model_available('breast'):
+        load_forecasts('breast')
+
 def breast_cancer():
-# Load your model
+# Predictions need the model artifact
 
- model = load('machine_learning/models_joblib/Breast_Cancer_Participants_XGBRegressor.joblib')
+ if not model_available('breast'):
+     st.error(f"The breast cancer model is not available: {MODELS['breast']} is missing.")
+     return
 
 # Load your data
 
- df = pd.read_csv('machine_learning/data/Breast_Cancer_participants.csv')
+ df = load_dataset('machine_learning/data/Breast_Cancer_Participants.csv')
  df
 
  breastCan_input_values()
@@ -37,47 +44,20 @@ def breast_cancer():
  selected_year = st.selectbox("Year", options=year_options, key="year_selectbox2")
  unique_age = sorted([str(age) for age in df['Age_group'].unique()])
  selected_age = st.selectbox("Select Age_group", unique_age, key="age_group_selectbox2")
- 
- # get the latitude and longitude against the sa3 name
- def get_coordinates_for_sa3(sa3_name, csv_file_path):
-    # Read the CSV file containing SA3 names, longitude, and latitude
-    sa3_data1 = pd.read_csv(csv_file_path)
-    sa3_data = sa3_data1.drop_duplicates(subset=['SA3_name', 'Latitude', 'Longitude'])
-    
-    # Filter the DataFrame to get the row for the specified SA3 name
-    sa3_row = sa3_data[sa3_data['SA3_name'] == sa3_name]
-    
-    # If SA3 name not found, return None for latitude and longitude
-    if sa3_row.empty:
-        return None, None
-    
-    # Extract latitude and longitude from the DataFrame
-    latitude = sa3_row['Latitude'].values[0]
-    longitude = sa3_row['Longitude'].values[0]
-    
-    return latitude, longitude
-
-
 
 
 # Create a button to trigger prediction
  if st.button('Predict', key="predict_button2"):
     try:
-        # Create input features DataFrame
-        input_features = pd.DataFrame({
-            'State_and_territory': [selected_state2],
-            'SA3_name': [selected_SA3_name],
-            'Year': [selected_year],
-            'Age_group' :[selected_age]
-            
-        })
-
-
-        # Predict for the selected state, year, age, latitude, and longitude
-        prediction = model.predict(input_features)
+        # Look up every SA3 over the ten future years for the selected age group in the forecast grid
+        predictions, seconds = forecast_batch('breast', age_groups=[selected_age], include=[(selected_state2, selected_SA3_name)])
+        trajectory = predictions[(predictions['State_and_territory'] == selected_state2) &
+                                 (predictions['SA3_name'] == selected_SA3_name)]
+        selected_rows = trajectory[trajectory['Year'] == selected_year]
+        prediction = selected_rows['Prediction'].to_numpy()
 
         # Visualize predicted values on a map
-        predicted_df = input_features.copy()
+        predicted_df = selected_rows.drop(columns='Prediction')
         predicted_df['Prediction'] = prediction.astype(int)
 
         # Display the prediction
@@ -85,58 +65,20 @@ def breast_cancer():
          
         #map = folium.Map(location=[selected_lat, selected_long], zoom_start=5)
          # Create the Folium map with a custom tile layer and attribution
-        sa3_name = selected_SA3_name  # Specify the SA3 name you want to get coordinates for
-        csv_file_path = 'machine_learning/data/cleaned_final_breastcancer__data1.csv'  # Specify the path to your CSV file
-        selected_lat, selected_long = get_coordinates_for_sa3(sa3_name, csv_file_path)
+        selected_lat, selected_long = geo_index(SA3_COORDINATES, 'SA3_name').coordinates(selected_SA3_name)
         #st.write(f'Latitude: {sa3_name}, Longitude: {sa3_name}')
  
-        map = folium.Map(
-             location=[selected_lat, selected_long],
-             zoom_start=6,
-             tiles='https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png',  # Example custom tile layer
-             attr='Map data &copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
-        )
-        # Add a marker for the selected state with the predicted value as tooltip
-        folium.Marker(
-            location=[selected_lat, selected_long],
-            popup=f"SA3 Name: {selected_SA3_name}<br>State: {selected_state2}<br>Predicted Nos. participants: {prediction.astype(int)}",
-            icon=folium.Icon(color='blue', icon='info-sign')
-        ).add_to(map)
-
-        # Display the map
-        folium_static(map) 
+        # Marker on the SA3 with the prediction in its popup; the map's HTML is cached per SA3 and value
+        show_prediction_map('breast', {'SA3 Name': selected_SA3_name, 'State': selected_state2}, selected_lat, selected_long,
+                            prediction[0], zoom=6)
         
-        def predict_graph(selected_state2, prediction):
-            # Create input features DataFrame
-
-
-            # Define the state abbreviations
-     
-            state_abbreviations = ['NSW', 'Qld', 'Vic', 'WA', 'NT', 'ACT', 'SA', 'Tas']
-
-            # Create the bar chart
-            fig, ax = plt.subplots()
-            bar_width = 0.1  # Adjust the bar width as needed
-
-            # Plot bars for all states
-            ax.bar(range(len(state_abbreviations)), prediction, width=bar_width, color='lightgrey')
-
-            # Move the bar to the selected state
-            selected_index = state_abbreviations.index(selected_state2)
-            selected_prediction_value = prediction  # Use the first (and only) prediction value
-            ax.bar(selected_index, selected_prediction_value, color='green')
-
-            # Annotate the prediction value on the bar
-            ax.text(selected_index, selected_prediction_value, f'{prediction.astype(int)}', ha='center', va='bottom', color='blue', fontsize=8)
-
-            ax.set_xticks(range(len(state_abbreviations)))
-            ax.set_xticklabels(state_abbreviations, rotation=45, ha='right')
-            ax.set_ylabel('Cancer Screening Predicted Nos. participants')
-
-            st.pyplot(fig)    
-
-            # Call the function with the selected parameters
-        predict_graph(selected_state2, prediction)
+        # Predictions of every state (the total of its SA3s), and the selected SA3 over the future years
+        st.pyplot(state_bar_chart(per_state('breast', predictions, selected_year), selected_state2, 'green',
+                                  'Cancer Screening Predicted Nos. participants'))
+        st.pyplot(trajectory_chart(trajectory['Year'], trajectory['Prediction'], selected_year, 'green',
+                                   f'Predictions for {selected_SA3_name}, {selected_state2}',
+                                   'Cancer Screening Predicted Nos. participants'))
+        st.caption(f"{len(predictions)} scenarios looked up in the forecast grid in {seconds * 1000:.1f} ms")
 
 
 
@@ -1,12 +1,14 @@
 import streamlit as st
 import pandas as pd 
 
+from common.datasets import load_dataset
+
 # Check if the attribute is already initialized, if not, initialize it
 
 
 def breastCan_input_values():
     
-    df = pd.read_csv('machine_learning/data/Breast_Cancer_Participants.csv')
+    df = load_dataset('machine_learning/data/Breast_Cancer_Participants.csv')
 
     states = df["State_and_territory"].tolist()
     SA3_names = df["SA3_name"].tolist()
@@ -1,27 +1,34 @@
 import streamlit as st
-import pandas as pd
-import pickle
-import joblib
-from sklearn.preprocessing import StandardScaler
-from joblib import load
-import pydeck as pdk
-import numpy as np
-import matplotlib.pyplot as plt
-import altair as alt
-import folium
-from folium.plugins import MarkerCluster
-from streamlit_folium import folium_static
+from common.datasets import load_dataset
+from common.geo_index import geo_index
+from machine_learning.batch_prediction import per_state
+from machine_learning.forecast_grid import forecast_batch, load_forecasts
+from machine_learning.model_registry import MODELS, model_available
+from machine_learning.prediction_charts import state_bar_chart, trajectory_chart
+from machine_learning.prediction_maps import show_prediction_map
 from machine_learning.models.cervical_cancer_inputvalues import cervical_input_values
 from machine_learning.models.cervical_cancer_invited import invited
 
+# Coordinates of every state the prediction map can be centred on
+STATE_COORDINATES = 'machine_learning/data/2_cervical_abnormality_primary_screening_tests_2018_2022.csv'
+
+# Reads (or builds) the forecast grid and the coordinate index ahead of the first visit, for the
+# prewarm CLI (python -m common.prewarm)
+def prewarm():
+    geo_index(STATE_COORDINATES, 'States_and_territories')
+    if model_available('cervical'):
+        load_forecasts('cervical')
+
 def cervical_cancer():
 
-# Load your model
- model = load('machine_learning/models_joblib/cervical_RandomForestR_pipeline.joblib')
+# Predictions need the model artifact
+ if not model_available('cervical'):
+     st.error(f"The cervical cancer model is not available: {MODELS['cervical']} is missing.")
+     return
 
 # Load your data
 
- df = pd.read_csv('machine_learning/data/Cervical_Cancer_last.csv')
+ df = load_dataset('machine_learning/data/Cervical_Cancer_last.csv')
 
 
  # Setting up the session state for click_button
@@ -49,99 +56,36 @@ def cervical_cancer():
  year_options = sorted(list(set(future_years)))
  selected_year = st.selectbox("Year", options=year_options, key="year_selectbox1")
 
- # The below methods pull the latitude, and langitude information against the selected state from CSV.
- def get_coordinates_for_sa3(state_name, csv_file_path):
-    # Read the CSV file containing States_and_territories names, longitude, and latitude
-    state_data1 = pd.read_csv(csv_file_path)
-    state_data = state_data1.drop_duplicates(subset=['States_and_territories', 'Latitude', 'Longitude'])
-    
-    # Filter the DataFrame to get the row for the specified SA3 name
-    state_row = state_data[state_data['States_and_territories'] == state_name]
-    
-    # If SA3 name not found, return None for latitude and longitude
-    if state_row.empty:
-        return None, None
-    
-    # Extract latitude and longitude from the DataFrame
-    latitude = state_row['Latitude'].values[0]
-    longitude = state_row['Longitude'].values[0]
-    
-    return latitude, longitude
-
-
 
  if st.button('Predict', key="predict_button1"):
     try:
-        # Prepare input data as a dictionary
-        input_data = {
-            'States_and_territories': [selected_state],
-            'Year': [selected_year],
-            'Age': [selected_age]
-        }
-
-        # Convert input data to a DataFrame
-        input_features = pd.DataFrame(input_data)
-
-        # Predict using the model
-        prediction = model.predict(input_features)
-        
+        # Look up every state over the ten future years for the selected age in the forecast grid
+        predictions, seconds = forecast_batch('cervical', age_groups=[selected_age])
+        selected_rows = predictions[(predictions['States_and_territories'] == selected_state) &
+                                    (predictions['Year'] == selected_year)]
+        prediction = selected_rows['Prediction'].to_numpy()
+
         # Visualize predicted values on a map
-        predicted_df = input_features.copy()
+        predicted_df = selected_rows[['States_and_territories', 'Year', 'Age']].copy()
         predicted_df['Prediction'] = prediction.astype(int)
 
         # Display the prediction
         st.write("Predicted Cervical Cancer Nos. participants:", predicted_df)
         
-        state_name = selected_state  # Specify the SA3 name you want to get coordinates for
-        csv_file_path = 'machine_learning/data/2_cervical_abnormality_primary_screening_tests_2018_2022.csv'  # Specify the path to your CSV file
-        selected_lat, selected_long = get_coordinates_for_sa3(state_name, csv_file_path)
-
-        # This method helps in displaying the prediction on the map.
-        def predict_map(selected_state, selected_lat, selected_long, prediction):
-
-                m = folium.Map(location=[selected_lat, selected_long], zoom_start=10)
+        selected_lat, selected_long = geo_index(STATE_COORDINATES, 'States_and_territories').coordinates(selected_state)
 
-                # Add marker with suburb name and predicted value
-                popup_content = f'State: {selected_state}<br>Predicted Nos. participants : {prediction.astype(int)}'
-                folium.Marker(location=[selected_lat, selected_long], popup=popup_content).add_to(m)
-
-                return m
-        
-        m = predict_map(selected_state, selected_lat, selected_long, prediction)
-        folium_static(m) # display the map
+        # Marker on the state with the prediction in its popup; the map's HTML is cached per state and value
+        show_prediction_map('cervical', {'State': selected_state}, selected_lat, selected_long, prediction[0], zoom=10)
         
         
-        ### Plotting a prediction graph
-
-        def predict_graph(selected_state, prediction):
-
-           # Define the state abbreviations
-     
-            state_abbreviations = ['NSW', 'QLD', 'Vic', 'WA', 'NT', 'ACT', 'SA', 'Tas']
-
-            # Create the bar chart
-            fig, ax = plt.subplots()
-            bar_width = 0.1  # Adjust the bar width as needed
-
-            # Plot bars for all states
-            ax.bar(range(len(state_abbreviations)), prediction, width=bar_width, color='lightgrey')
-
-            # Move the bar to the selected state
-            selected_index = state_abbreviations.index(selected_state)
-            selected_prediction_value = prediction  # Use the first (and only) prediction value
-            ax.bar(selected_index, selected_prediction_value, color='red')
-
-            # Annotate the prediction value on the bar
-            ax.text(selected_index, selected_prediction_value, f'{prediction.astype(int)}', ha='center', va='bottom', color='blue', fontsize=8)
-
-            ax.set_xticks(range(len(state_abbreviations)))
-            ax.set_xticklabels(state_abbreviations, rotation=45, ha='right')
-            ax.set_ylabel('Cancer Screening Predicted Nos. participants')
-
-            st.pyplot(fig)    
-
-        #Call the function with appropriate arguments after obtaining the prediction
-        predict_graph(selected_state, prediction )
+        ### Plotting the predictions of every state, and the selected state over the future years
+        st.pyplot(state_bar_chart(per_state('cervical', predictions, selected_year), selected_state, 'red',
+                                  'Cancer Screening Predicted Nos. participants'))
+        trajectory = predictions[predictions['States_and_territories'] == selected_state]
+        st.pyplot(trajectory_chart(trajectory['Year'], trajectory['Prediction'], selected_year, 'red',
+                                   f'Predicted participants in {selected_state}, {selected_age}',
+                                   'Cancer Screening Predicted Nos. participants'))
+        st.caption(f"{len(predictions)} scenarios looked up in the forecast grid in {seconds * 1000:.1f} ms")
         
 
 
@@ -1,9 +1,11 @@
 import streamlit as st
 import pandas as pd 
 
+from common.datasets import load_dataset
+
 def cervical_input_values():
     #load the csv to display input values so the users can get help with data entry.
-    df = pd.read_csv('machine_learning/data/Cervical_Cancer_last.csv')
+    df = load_dataset('machine_learning/data/Cervical_Cancer_last.csv')
     
     states = df["States_and_territories"].tolist()
     age = df["Age"].tolist()
@@ -2,9 +2,11 @@ import streamlit as st
 import pandas as pd
 import altair as alt
 
+from common.datasets import load_dataset
+
 def invited():
     # Load the CSV file directly
-    df = pd.read_csv('machine_learning/data/cervical_invites_2019_2022.csv')
+    df = load_dataset('machine_learning/data/cervical_invites_2019_2022.csv')
     
     # Get unique years from the DataFrame
     years = sorted(df['Year'].unique())
@@ -16,7 +18,7 @@ def invited():
     df_selected_year = df[df['Year'] == selected_year]
     
     # Pivot the DataFrame to have states as rows and invited as columns
-    pivot_df = df_selected_year.pivot_table(index='States_and_territories', values='Invited', aggfunc='sum').reset_index()
+    pivot_df = df_selected_year.pivot_table(index='States_and_territories', values='Invited', aggfunc='sum', observed=True).reset_index()
     
     # Plot the bar chart using Altair
     bar_chart = alt.Chart(pivot_df).mark_bar().encode(
@@ -0,0 +1,39 @@
+from matplotlib.figure import Figure
+
+# Charts drawn from a batch of predictions (see machine_learning/batch_prediction.py), shared by
+# the three prediction pages. The figures are built outside pyplot, which would keep every one
+# of them open for the life of the server.
+
+
+# One bar per state with its own predicted value, the selected state highlighted
+def state_bar_chart(values, selected_state, color, ylabel):
+    fig = Figure()
+    ax = fig.subplots()
+    states = list(values.index)
+    colors = [color if state == selected_state else 'lightgrey' for state in states]
+    ax.bar(range(len(states)), values.to_numpy(), color=colors)
+
+    if selected_state in states:
+        selected_index = states.index(selected_state)
+        selected_value = values[selected_state]
+        ax.text(selected_index, selected_value, f'{int(selected_value)}', ha='center', va='bottom', color='blue', fontsize=8)
+
+    ax.set_xticks(range(len(states)))
+    ax.set_xticklabels(states, rotation=45, ha='right')
+    ax.set_ylabel(ylabel)
+    return fig
+
+
+# Prediction of one scenario over the future years, the selected year marked
+def trajectory_chart(years, values, selected_year, color, title, ylabel):
+    fig = Figure()
+    ax = fig.subplots()
+    ax.plot(years, values, marker='o', color=color)
+    for year, value in zip(years, values):
+        if year == selected_year:
+            ax.annotate(f'{int(value)}', (year, value), textcoords='offset points', xytext=(0, 6), ha='center', color='blue', fontsize=8)
+    ax.set_xticks(list(years))
+    ax.set_xticklabels([str(year) for year in years], rotation=45, ha='right')
+    ax.set_title(title)
+    ax.set_ylabel(ylabel)
+    return fig
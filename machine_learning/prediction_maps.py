@@ -0,0 +1,190 @@
+import argparse
+import os
+import sys
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+
+import folium
+import streamlit.components.v1 as components
+from branca.element import MacroElement
+from jinja2 import Template
+
+# Location maps of the prediction pages.
+# A Predict click used to build a new folium map and send folium's whole Leaflet document to the
+# browser, along with links to jQuery, Bootstrap 3 and 5, Font Awesome and the awesome-markers
+# plugin, all loaded from CDNs for the one marker it draws. The document of a map is now:
+# - cached per (program, location, predicted value bucket), so a repeated prediction sends the same
+#   HTML without building the map again;
+# - Leaflet only: the marker and its popup are Leaflet's own, so neither jQuery (which folium's
+#   popups are built with) nor any icon library is linked;
+# - configurable for a machine with no network:
+#     PREDICTION_MAP_TILES        tile URL template ({z}/{x}/{y}, optionally {s}), such as a local
+#                                 tile server or folder of tiles; `none` draws the marker on a blank
+#                                 background. Default: OpenStreetMap's tiles
+#     PREDICTION_MAP_ATTRIBUTION  attribution shown for those tiles
+#     PREDICTION_MAP_ASSETS       URL of a folder holding leaflet.js, leaflet.css and images/, to use
+#                                 instead of the CDN; `python -m machine_learning.prediction_maps
+#                                 static/leaflet` downloads them once into static/leaflet, which
+#                                 Streamlit serves as app/static/leaflet with
+#                                 server.enableStaticServing
+#     PREDICTION_MAP_BUCKET       predictions are shown (and cached) rounded down to this many
+#                                 participants; 1 (default) shows them exactly
+#
+# map_stats() reports the bytes of HTML sent per rerun showing a map, against the size of the
+# document the pages used to build for the same map.
+
+DEFAULT_TILES = 'https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png'
+DEFAULT_ATTRIBUTION = 'Map data &copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
+LEAFLET_CDN = 'https://cdn.jsdelivr.net/npm/leaflet@1.9.3/dist'
+LEAFLET_FILES = ['leaflet.js', 'leaflet.css', 'images/marker-icon.png', 'images/marker-icon-2x.png',
+                 'images/marker-shadow.png', 'images/layers.png', 'images/layers-2x.png']
+
+PREDICTION_MAP_TILES = os.environ.get('PREDICTION_MAP_TILES', DEFAULT_TILES)
+PREDICTION_MAP_ATTRIBUTION = os.environ.get('PREDICTION_MAP_ATTRIBUTION', DEFAULT_ATTRIBUTION)
+PREDICTION_MAP_ASSETS = os.environ.get('PREDICTION_MAP_ASSETS', LEAFLET_CDN).rstrip('/')
+PREDICTION_MAP_BUCKET = max(int(os.environ.get('PREDICTION_MAP_BUCKET', '1')), 1)
+# Documents kept, least recently used dropped first
+MAP_CACHE_ENTRIES = int(os.environ.get('MAP_CACHE_ENTRIES', '1024'))
+# Size folium_static showed the maps at
+WIDTH = 700
+HEIGHT = 500
+
+_lock = threading.Lock()
+_entries = OrderedDict()
+_stats = {'reruns': 0, 'hits': 0, 'misses': 0, 'bytes_sent': 0, 'legacy_bytes': 0, 'build_seconds': 0.0}
+_legacy_extra = None
+
+
+# Predicted value as the popup shows it, and the bucket it is cached under
+def _bucket(value):
+    value = int(value)
+    if PREDICTION_MAP_BUCKET == 1:
+        return value, str(value)
+    low = value // PREDICTION_MAP_BUCKET * PREDICTION_MAP_BUCKET
+    return low, f"{low:,}–{low + PREDICTION_MAP_BUCKET - 1:,}"
+
+
+def _tiles():
+    if PREDICTION_MAP_TILES.lower() == 'none':
+        return {'tiles': None}
+    return {'tiles': PREDICTION_MAP_TILES, 'attr': PREDICTION_MAP_ATTRIBUTION}
+
+
+# Leaflet marker opening `popup` (HTML) when clicked
+class _PopupMarker(MacroElement):
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            L.marker({{ this.location|tojson }}).addTo({{ this._parent.get_name() }}).bindPopup({{ this.popup|tojson }});
+        {% endmacro %}
+    """)
+
+    def __init__(self, location, popup):
+        super().__init__()
+        self._name = 'PopupMarker'
+        self.location = location
+        self.popup = popup
+
+
+def build_map_html(latitude, longitude, zoom, popup):
+    location = [float(latitude), float(longitude)]
+    m = folium.Map(location=location, zoom_start=zoom, **_tiles())
+    m.default_js = [('leaflet', f'{PREDICTION_MAP_ASSETS}/leaflet.js')]
+    m.default_css = [('leaflet_css', f'{PREDICTION_MAP_ASSETS}/leaflet.css')]
+    _PopupMarker(location, popup).add_to(m)
+    return folium.Figure().add_child(m).render()
+
+
+# The document the pages built before: folium's default assets, OpenStreetMap tiles and an
+# awesome-markers icon
+def build_legacy_map_html(latitude, longitude, zoom, popup):
+    location = [float(latitude), float(longitude)]
+    m = folium.Map(location=location, zoom_start=zoom, tiles=DEFAULT_TILES, attr=DEFAULT_ATTRIBUTION)
+    folium.Marker(location=location, popup=popup, icon=folium.Icon(color='blue', icon='info-sign')).add_to(m)
+    return folium.Figure().add_child(m).render()
+
+
+# How many more bytes the pages' old document took than this one, for the bytes report. Both embed
+# the same location and popup, so it is measured once on a sample map.
+def _legacy_bytes():
+    global _legacy_extra
+    if _legacy_extra is None:
+        args = (-35.28, 149.13, 6, 'State: ACT<br>Predicted Nos. participants: 1000')
+        _legacy_extra = len(build_legacy_map_html(*args).encode()) - len(build_map_html(*args).encode())
+    return _legacy_extra
+
+
+# HTML of the map of `place` ({label: value}, e.g. {'SA3 Name': ..., 'State': ...}) at (latitude,
+# longitude), with the prediction for it in the marker's popup
+def prediction_map_html(program, place, latitude, longitude, value, zoom=6):
+    bucket, shown = _bucket(value)
+    key = (program, tuple(place.items()), float(latitude), float(longitude), bucket, zoom)
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            _entries.move_to_end(key)
+            _stats['hits'] += 1
+    if entry is None:
+        popup = '<br>'.join(f'{label}: {name}' for label, name in place.items())
+        popup += f'<br>Predicted Nos. participants: {shown}'
+        start = time.perf_counter()
+        html = build_map_html(latitude, longitude, zoom, popup)
+        seconds = time.perf_counter() - start
+        entry = (html, len(html.encode()), len(html.encode()) + _legacy_bytes())
+        with _lock:
+            _stats['misses'] += 1
+            _stats['build_seconds'] += seconds
+            _entries[key] = entry
+            while len(_entries) > MAP_CACHE_ENTRIES:
+                _entries.popitem(last=False)
+    with _lock:
+        _stats['reruns'] += 1
+        _stats['bytes_sent'] += entry[1]
+        _stats['legacy_bytes'] += entry[2]
+    return entry[0]
+
+
+# Shows the map in the page, where folium_static used to
+def show_prediction_map(program, place, latitude, longitude, value, zoom=6):
+    components.html(prediction_map_html(program, place, latitude, longitude, value, zoom), height=HEIGHT + 10, width=WIDTH)
+
+
+def map_stats():
+    with _lock:
+        reruns = _stats['reruns']
+        lookups = _stats['hits'] + _stats['misses']
+        return dict(_stats, entries=len(_entries), tiles=PREDICTION_MAP_TILES, assets=PREDICTION_MAP_ASSETS,
+                    bytes_per_rerun=_stats['bytes_sent'] / reruns if reruns else None,
+                    legacy_bytes_per_rerun=_stats['legacy_bytes'] / reruns if reruns else None,
+                    hit_rate=_stats['hits'] / lookups if lookups else 0.0)
+
+
+def clear_map_cache():
+    with _lock:
+        _entries.clear()
+        for name in _stats:
+            _stats[name] = 0
+
+
+# Downloads Leaflet into `folder`, for PREDICTION_MAP_ASSETS on a machine that will have no network
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Download the Leaflet files the prediction maps load")
+    parser.add_argument('folder', help="where to put them, e.g. static/leaflet")
+    args = parser.parse_args(argv)
+
+    for name in LEAFLET_FILES:
+        path = os.path.join(args.folder, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            with urllib.request.urlopen(f'{LEAFLET_CDN}/{name}', timeout=30) as response, open(path, 'wb') as f:
+                f.write(response.read())
+        except OSError as error:
+            print(f"Could not download {name}: {error}")
+            return 1
+        print(f"{name} -> {path} ({os.path.getsize(path):,} bytes)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
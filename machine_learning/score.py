@@ -0,0 +1,233 @@
+import argparse
+import collections
+import concurrent.futures
+import multiprocessing
+import os
+import sys
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from machine_learning.batch_prediction import PROGRAMS, future_years
+from machine_learning.fast_inference import fast_pipeline
+from machine_learning.fast_inference import predict as fast_predict
+from machine_learning.model_registry import MODELS, model_available
+
+# Bulk scoring of scenario files too large for the prediction pages, such as every (state, SA3,
+# year, age group) combination of a planning exercise.
+#
+#     python -m machine_learning.score breast scenarios.csv predictions.csv
+#     python -m machine_learning.score cervical scenarios.parquet predictions.parquet --chunk-rows 200000
+#
+# The input (CSV or Parquet) is read CHUNK_ROWS rows at a time and each chunk is scored in a pool of
+# --workers processes, at most two chunks per worker in flight, so memory stays the same however
+# large the file is. By default there is a worker per core but one, which is left to this process
+# reading and writing the chunks; on a single core the chunks are scored inline, as shipping them
+# to a worker would cost more than it saves. The output gets the input's columns plus `prediction`, in input order, written
+# chunk by chunk to `<output>.partial` and renamed to the output once every row is scored.
+#
+# Every chunk is checked against the model's vocabulary, the categories its encoders were fitted
+# on. The encoders ignore values they never saw (a misspelt SA3), so such a row is scored as if that
+# input were blank. --unknown picks what happens to those rows: `warn` (default) scores them and
+# reports how many there were, `drop` leaves them out of the output, `fail` stops at the first one.
+# Years are checked against the training years plus the program's forecast years
+# (batch_prediction.future_years), since future years are what scenarios are made of. The model
+# ignores those it never saw too, which is reported on its own but never drops or fails a row.
+
+CHUNK_ROWS = 50_000
+# Unknown values quoted per column in the report
+EXAMPLES = 5
+
+
+# Runs in a worker: loads the model's fast path before the first chunk arrives
+def _warm_up(name):
+    fast_pipeline(name)
+
+
+def _score(name, rows):
+    return fast_predict(name, rows)
+
+
+# {column: known values} of the model's inputs, and the columns whose missing values it imputes
+def model_vocabulary(name):
+    fast = fast_pipeline(name)
+    if fast is None:
+        raise ValueError(f"the {name} model has no one-hot vocabulary to validate against")
+    return {column: set(encoding) for column, encoding in fast.encodings.items()}, set(fast.fill_values)
+
+
+def read_chunks(path, chunk_rows):
+    if path.endswith('.parquet'):
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_rows)
+
+
+class ChunkWriter:
+    def __init__(self, path):
+        self.path = path
+        self.partial = path + '.partial'
+        self.parquet = path.endswith('.parquet')
+        self._writer = None
+        self._header = True
+
+    def write(self, frame):
+        if self.parquet:
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.partial, table.schema)
+            self._writer.write_table(table.cast(self._writer.schema))
+        else:
+            frame.to_csv(self.partial, mode='w' if self._header else 'a', header=self._header, index=False)
+            self._header = False
+
+    def close(self):
+        if self.parquet and self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if os.path.exists(self.partial):
+            os.replace(self.partial, self.path)
+
+    # Removes what was written of an output that will not be completed
+    def discard(self):
+        if self._writer is not None:
+            self._writer.close()
+        if os.path.exists(self.partial):
+            os.remove(self.partial)
+
+
+class Validator:
+    def __init__(self, name):
+        self.vocabulary, self.imputed = model_vocabulary(name)
+        self.columns = list(self.vocabulary)
+        self.unknown_rows = 0
+        self.unknown = {column: 0 for column in self.columns}
+        self.examples = {column: [] for column in self.columns}
+        year = PROGRAMS[name]['year']
+        self.year = year if year in self.vocabulary else None
+        self.forecast_years = set(future_years(name)) if self.year else set()
+        self.ignored_years = collections.Counter()
+
+    # Mask of the chunk's rows with a value outside the vocabulary (or, for the year, outside the
+    # training and forecast years); ValueError when a column is missing
+    def check(self, chunk):
+        missing = [column for column in self.columns if column not in chunk.columns]
+        if missing:
+            raise ValueError(f"the input has no {', '.join(missing)} column (the model needs {', '.join(self.columns)})")
+        unknown_rows = pd.Series(False, index=chunk.index)
+        for column in self.columns:
+            values = chunk[column]
+            unknown = ~values.isin(self.vocabulary[column])
+            if column == self.year:
+                ignored = unknown & values.isin(self.forecast_years)
+                self.ignored_years.update(values[ignored].tolist())
+                unknown &= ~ignored
+            if column in self.imputed:
+                unknown &= values.notna()
+            if unknown.any():
+                self.unknown[column] += int(unknown.sum())
+                for value in values[unknown].unique()[:EXAMPLES]:
+                    if len(self.examples[column]) < EXAMPLES and value not in self.examples[column]:
+                        self.examples[column].append(value)
+                unknown_rows |= unknown
+        self.unknown_rows += int(unknown_rows.sum())
+        return unknown_rows.to_numpy()
+
+    def report(self):
+        return [f"{column}: {count:,} rows with values the model never saw, e.g. "
+                f"{', '.join(repr(value) for value in self.examples[column])}"
+                for column, count in self.unknown.items() if count]
+
+    # Inputs within range that the model scores as if blank
+    def ignored_report(self):
+        if not self.ignored_years:
+            return []
+        years = ', '.join(str(year) for year in sorted(self.ignored_years))
+        return [f"{self.year}: {sum(self.ignored_years.values()):,} rows in forecast years the model was not "
+                f"trained on ({years}), scored as if the year were blank"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a CSV or Parquet file of scenarios with a prediction model")
+    parser.add_argument('model', choices=list(MODELS))
+    parser.add_argument('input', help="CSV or Parquet file with the model's input columns")
+    parser.add_argument('output', help="where to write the predictions (.csv or .parquet)")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help="rows read and scored at a time")
+    parser.add_argument('--workers', type=int, default=(os.cpu_count() or 1) - 1,
+                        help="scoring processes (0 scores in this process)")
+    parser.add_argument('--unknown', choices=['warn', 'drop', 'fail'], default='warn',
+                        help="what to do with rows holding values outside the model's vocabulary")
+    args = parser.parse_args(argv)
+
+    if not model_available(args.model):
+        print(f"The {args.model} model artifact {MODELS[args.model]} is missing")
+        return 1
+    try:
+        validator = Validator(args.model)
+    except ValueError as error:
+        print(error)
+        return 1
+
+    executor = None
+    if args.workers > 0:
+        executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=args.workers, mp_context=multiprocessing.get_context('spawn'),
+            initializer=_warm_up, initargs=(args.model,))
+    writer = ChunkWriter(args.output)
+    pending = collections.deque()
+    scored = dropped = 0
+    start = last_report = time.perf_counter()
+
+    def write_oldest():
+        nonlocal scored, last_report
+        chunk, future = pending.popleft()
+        predictions = future.result() if isinstance(future, concurrent.futures.Future) else future
+        writer.write(chunk.assign(prediction=predictions))
+        scored += len(chunk)
+        if time.perf_counter() - last_report >= 5:
+            last_report = time.perf_counter()
+            print(f"{scored:,} rows scored, {scored / (last_report - start):,.0f} rows/s", flush=True)
+
+    try:
+        for chunk in read_chunks(args.input, args.chunk_rows):
+            unknown = validator.check(chunk)
+            if unknown.any():
+                if args.unknown == 'fail':
+                    raise ValueError("; ".join(validator.report()))
+                if args.unknown == 'drop':
+                    dropped += int(unknown.sum())
+                    chunk = chunk[~unknown]
+                    if chunk.empty:
+                        continue
+            rows = chunk[validator.columns]
+            if executor is None:
+                pending.append((chunk, fast_predict(args.model, rows)))
+            else:
+                pending.append((chunk, executor.submit(_score, args.model, rows)))
+            while len(pending) > 2 * max(args.workers, 1):
+                write_oldest()
+        while pending:
+            write_oldest()
+        writer.close()
+    except ValueError as error:
+        print(f"Stopped after {scored:,} rows: {error}")
+        return 1
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        writer.discard()
+
+    elapsed = time.perf_counter() - start
+    print(f"{scored:,} rows scored in {elapsed:.2f}s ({scored / elapsed:,.0f} rows/s) -> {args.output}")
+    for line in validator.report() + validator.ignored_report():
+        print(f"  {line}")
+    if dropped:
+        print(f"  {dropped:,} rows with unknown values left out of the output (--unknown drop)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
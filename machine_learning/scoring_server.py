@@ -0,0 +1,260 @@
+import argparse
+import bisect
+import json
+import queue
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from machine_learning.fast_inference import fast_pipeline
+from machine_learning.model_registry import MODELS, get_model, model_available
+
+# Local HTTP/JSON scoring service for the screening models, for tools that want the participation
+# forecasts without going through the Streamlit app.
+#
+#     python -m machine_learning.scoring_server [--port 8765] [--window-ms 5] [--max-batch-rows 4096]
+#
+#     GET  /models                 the models served and the input columns each one expects
+#     POST /predict/<model>        {"rows": [{"State_and_territory": "NSW", ...}, ...]}
+#                                  -> {"predictions": [...], "batch_rows": rows scored together}
+#     GET  /metrics                request latency and batch size histograms, throughput
+#     GET  /health
+#
+# Requests for a model are coalesced: the first one to arrive opens a batch, which collects the
+# rows of every request arriving within the next --window-ms milliseconds (or until it holds
+# --max-batch-rows rows), and the whole batch is scored with one predict call. A window of 0
+# scores each request on its own. A batch whose predict call fails is scored again request by
+# request, so only the request that fails gets the error. Each model's batches are scored on its batcher's one thread,
+# which encodes them into the same feature array every time rather than allocating one per batch.
+#
+# Bound to 127.0.0.1 by default; it has no authentication.
+
+LATENCY_BUCKETS_MS = [0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+BATCH_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384]
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, value)] += 1
+            self.total += value
+            self.count += 1
+
+    # Cumulative counts per upper bound, as Prometheus lays out histograms
+    def snapshot(self):
+        with self._lock:
+            buckets, running = {}, 0
+            for bound, count in zip(self.bounds + ['+Inf'], self.counts):
+                running += count
+                buckets[str(bound)] = running
+            return {'buckets': buckets, 'count': self.count, 'sum': self.total,
+                    'mean': self.total / self.count if self.count else None}
+
+
+class MicroBatcher:
+    def __init__(self, name, window, max_rows, metrics):
+        self.name = name
+        self.window = window
+        self.max_rows = max_rows
+        self.metrics = metrics
+        fast = fast_pipeline(name)
+        self.columns = fast.columns if fast is not None else list(get_model(name).feature_names_in_)
+        self._requests = queue.Queue()
+        # Encoded features of the batch being scored, reallocated only when a batch outgrows it
+        self._features = None
+        threading.Thread(target=self._run, name=f'batcher-{name}', daemon=True).start()
+
+    # Predictions for `rows` (a list of {column: value}), scored with whatever other requests arrive
+    # within the window. Raises ValueError for rows missing an input column or whose inputs are not
+    # strings, numbers or null, before they can join a batch.
+    def predict(self, rows):
+        for row in rows:
+            missing = [column for column in self.columns if column not in row]
+            if missing:
+                raise ValueError(f"row {row!r} is missing {', '.join(missing)}")
+            invalid = [column for column in self.columns
+                       if row[column] is not None and not isinstance(row[column], (str, int, float))]
+            if invalid:
+                raise ValueError(f"row {row!r} has values other than a string, number or null for {', '.join(invalid)}")
+        done = threading.Event()
+        request = {'rows': rows, 'done': done}
+        self._requests.put(request)
+        done.wait()
+        if 'error' in request:
+            raise request['error']
+        return request['predictions'], request['batch_rows']
+
+    def _run(self):
+        while True:
+            batch = [self._requests.get()]
+            n_rows = len(batch[0]['rows'])
+            deadline = time.perf_counter() + self.window
+            while n_rows < self.max_rows:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                n_rows += len(request['rows'])
+            self._score(batch, n_rows)
+
+    def _score(self, batch, n_rows):
+        columns = {column: [row[column] for request in batch for row in request['rows']] for column in self.columns}
+        start = time.perf_counter()
+        try:
+            predictions = self._predict(columns, n_rows)
+        except Exception as error:
+            if len(batch) == 1:
+                batch[0]['error'] = error
+                batch[0]['done'].set()
+                return
+            for request in batch:
+                self._score([request], len(request['rows']))
+            return
+        self.metrics['predict_ms'].observe((time.perf_counter() - start) * 1000)
+        self.metrics['batch_rows'].observe(n_rows)
+        self.metrics['batch_requests'].observe(len(batch))
+        offset = 0
+        for request in batch:
+            request['predictions'] = predictions[offset:offset + len(request['rows'])]
+            request['batch_rows'] = n_rows
+            offset += len(request['rows'])
+            request['done'].set()
+
+    def _predict(self, columns, n_rows):
+        # Looked up per batch, so a replaced artifact is picked up like the pages pick it up
+        fast = fast_pipeline(self.name)
+        if fast is None:
+            return get_model(self.name).predict(pd.DataFrame(columns)).tolist()
+        if (self._features is None or self._features.shape[0] < n_rows or
+                self._features.shape[1] != fast.n_features):
+            self._features = np.empty((max(n_rows, self.max_rows), fast.n_features), dtype=np.float32)
+        return fast.predict_features(fast.encode(columns, out=self._features[:n_rows])).tolist()
+
+
+class ScoringServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Pending connections the listening socket holds; the default of 5 resets clients that connect together
+    request_queue_size = 128
+
+    def __init__(self, address, window, max_rows):
+        super().__init__(address, ScoringHandler)
+        self.started = time.time()
+        self.window = window
+        self.metrics = {
+            'latency_ms': Histogram(LATENCY_BUCKETS_MS),
+            'predict_ms': Histogram(LATENCY_BUCKETS_MS),
+            'batch_rows': Histogram(BATCH_BUCKETS),
+            'batch_requests': Histogram(BATCH_BUCKETS),
+        }
+        self.counters = {'requests': 0, 'rows': 0, 'errors': 0}
+        self.counters_lock = threading.Lock()
+        self.batchers = {name: MicroBatcher(name, window, max_rows, self.metrics)
+                         for name in MODELS if model_available(name)}
+
+    def metrics_report(self):
+        uptime = time.time() - self.started
+        with self.counters_lock:
+            counters = dict(self.counters)
+        return dict(counters, uptime_s=uptime, requests_per_s=counters['requests'] / uptime,
+                    rows_per_s=counters['rows'] / uptime, window_ms=self.window * 1000,
+                    **{name: histogram.snapshot() for name, histogram in self.metrics.items()})
+
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send(200, {'status': 'ok'})
+        elif self.path == '/models':
+            self._send(200, {name: {'columns': batcher.columns} for name, batcher in self.server.batchers.items()})
+        elif self.path == '/metrics':
+            self._send(200, self.server.metrics_report())
+        else:
+            self._send(404, {'error': f"no such endpoint {self.path}"})
+
+    def do_POST(self):
+        start = time.perf_counter()
+        status, body = self._predict()
+        with self.server.counters_lock:
+            self.server.counters['requests'] += 1
+            if status == 200:
+                self.server.counters['rows'] += len(body['predictions'])
+            else:
+                self.server.counters['errors'] += 1
+        self.server.metrics['latency_ms'].observe((time.perf_counter() - start) * 1000)
+        self._send(status, body)
+
+    def _predict(self):
+        prefix = '/predict/'
+        if not self.path.startswith(prefix):
+            return 404, {'error': f"no such endpoint {self.path}"}
+        name = self.path[len(prefix):]
+        if name not in MODELS:
+            return 404, {'error': f"unknown model {name!r}, expected one of {', '.join(MODELS)}"}
+        if name not in self.server.batchers:
+            return 503, {'error': f"the {name} model artifact {MODELS[name]} is missing"}
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            rows = request['rows']
+            if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+                raise ValueError("'rows' must be a list of objects")
+            predictions, batch_rows = self.server.batchers[name].predict(rows)
+        except (ValueError, KeyError, TypeError) as error:
+            return 400, {'error': str(error)}
+        except Exception as error:
+            return 500, {'error': str(error)}
+        return 200, {'model': name, 'predictions': predictions, 'batch_rows': batch_rows}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the screening models over HTTP/JSON")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--window-ms', type=float, default=5.0, help="how long a batch waits for more requests")
+    parser.add_argument('--max-batch-rows', type=int, default=4096, help="rows that close a batch early")
+    args = parser.parse_args(argv)
+
+    server = ScoringServer((args.host, args.port), args.window_ms / 1000, args.max_batch_rows)
+    for name, path in MODELS.items():
+        if name not in server.batchers:
+            print(f"{name:>9}: model artifact {path} is missing, not served")
+    print(f"Serving {', '.join(server.batchers)} on http://{args.host}:{server.server_port} "
+          f"(batch window {args.window_ms:g} ms)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+import importlib
+import subprocess
+import sys
+import time
+
+# Every page the app can navigate to, keyed by its (top menu, cancer type, analysis type) route.
+# Each route points at a module path and the function that renders it, so the module (and the
+# heavy libraries it pulls in) is only imported the first time somebody opens that page.
+PAGES = {
+    ("Data Visualisation", "Bowel Cancer", "Temporal"): ("data_visualisation.bowel_cancer.temporal", "temporal_page_bc"),
+    ("Data Visualisation", "Bowel Cancer", "Demographic"): ("data_visualisation.bowel_cancer.demographic", "demographic_page_bc"),
+    ("Data Visualisation", "Bowel Cancer", "Geographic"): ("data_visualisation.bowel_cancer.geographic", "geographical_tab_bc"),
+    ("Data Visualisation", "Breast Cancer", "Temporal"): ("data_visualisation.breast_cancer.temporal", "temporal_page_brc"),
+    ("Data Visualisation", "Breast Cancer", "Demographic"): ("data_visualisation.breast_cancer.demographic", "demographic_page_brc"),
+    ("Data Visualisation", "Breast Cancer", "Geographic"): ("data_visualisation.breast_cancer.geographic", "geographical_tab_brc"),
+    ("Data Visualisation", "Cervical Cancer", "Temporal"): ("data_visualisation.cervical_cancer.temporal", "temporal_page_cc"),
+    ("Data Visualisation", "Cervical Cancer", "Demographic"): ("data_visualisation.cervical_cancer.demographic", "demographic_page_cc"),
+    ("Data Visualisation", "Cervical Cancer", "Geographic"): ("data_visualisation.cervical_cancer.geographic", "geographical_tab_cc"),
+    ("Machine Learning Prediction", "Cervical Cancer", None): ("machine_learning.models.cervical_cancer", "cervical_cancer"),
+    ("Machine Learning Prediction", "Breast Cancer", None): ("machine_learning.models.breast_cancer", "breast_cancer"),
+    ("Machine Learning Prediction", "Bowel Cancer", None): ("machine_learning.models.bowel_cancer", "bowel_cancer"),
+}
+
+# Libraries that are expensive to import, used by the startup report to show what each page drags in
+HEAVY_MODULES = ['xgboost', 'sklearn', 'folium', 'pydeck', 'matplotlib', 'altair', 'plotly.express',
+                 'plotly.graph_objects', 'pandas', 'pyarrow']
+
+# What the Home page imports, i.e. the cost every cold start pays before anything is rendered: the
+# app module itself, so whatever it imports at the top is counted
+HOME_MODULES = ['app']
+
+_page_functions = {}
+import_times = {}
+
+
+def get_page(top_menu, cancer_type, analysis_type=None):
+    route = (top_menu, cancer_type, analysis_type)
+    if route not in _page_functions:
+        module_path, function_name = PAGES[route]
+        already_imported = module_path in sys.modules
+        start = time.perf_counter()
+        module = importlib.import_module(module_path)
+        if not already_imported:
+            import_times[module_path] = time.perf_counter() - start
+        _page_functions[route] = getattr(module, function_name)
+    return _page_functions[route]
+
+
+def render_page(top_menu, cancer_type, analysis_type=None):
+    get_page(top_menu, cancer_type, analysis_type)()
+
+
+# Import a set of modules in a fresh interpreter and return (seconds, heavy libraries loaded).
+# A fresh process is needed because anything already in sys.modules would be free to import again.
+def _measure_import(modules):
+    script = (
+        "import importlib, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"for name in {modules!r}:\n"
+        "    importlib.import_module(name)\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"heavy = [name for name in {HEAVY_MODULES!r} if name in sys.modules]\n"
+        "print(elapsed, ','.join(heavy))\n"
+    )
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {modules} failed:\n{result.stderr}")
+    last_line = result.stdout.strip().split('\n')[-1]
+    elapsed, _, heavy = last_line.partition(' ')
+    return float(elapsed), [name for name in heavy.split(',') if name]
+
+
+def startup_report():
+    # Cost of rendering Home: the app and what it imports
+    home_time, home_heavy = _measure_import(HOME_MODULES)
+    rows = [("Home", home_time, 0.0, home_heavy)]
+
+    # Cost of opening each page for the first time on top of what Home already loaded
+    for module_path in sorted({module_path for module_path, _ in PAGES.values()}):
+        total_time, heavy = _measure_import(HOME_MODULES + [module_path])
+        rows.append((module_path, total_time, total_time - home_time, heavy))
+    return rows
+
+
+def print_startup_report():
+    rows = startup_report()
+    print(f"{'module':<50} {'total (s)':>10} {'extra (s)':>10}  heavy imports")
+    for name, total_time, extra_time, heavy in rows:
+        print(f"{name:<50} {total_time:>10.3f} {extra_time:>10.3f}  {', '.join(heavy) or '-'}")
+
+
+if __name__ == "__main__":
+    print_startup_report()